@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
+from importlib.util import find_spec
 from pathlib import Path
+import os
+
+from .database import parse_database_url
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -45,12 +49,18 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    # Query count / SQL time / serialization time per view, see /api/metrics/
+    'rides.middleware.RequestStatsMiddleware',
+    # gzip/br/zstd by Accept-Encoding, see rides/compression.py
+    'rides.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    # Read-replica routing for RIDES_REPLICA_VIEWS, see rides/routers.py
+    'rides.middleware.ReplicaMiddleware',
 ]
 
 ROOT_URLCONF = 'config.urls'
@@ -76,13 +86,55 @@ WSGI_APPLICATION = 'config.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/6.0/ref/settings/#databases
 
+# DATABASE_URL picks the backend (default: db.sqlite3). SQLite connections use the
+# SQLITE_PROFILE tuning from config/database.py ('tuned': WAL, busy_timeout, BEGIN IMMEDIATE).
+# CONN_MAX_AGE keeps connections open between requests (seconds, 0 = per request);
+# under ASGI set CONN_MAX_AGE=0, or DATABASE_POOL=1 for psycopg's pool on PostgreSQL.
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': parse_database_url(
+        os.environ.get('DATABASE_URL', 'sqlite:///db.sqlite3'),
+        BASE_DIR,
+        conn_max_age=int(os.environ.get('CONN_MAX_AGE', 60)),
+        pool=os.environ.get('DATABASE_POOL') == '1',
+        sqlite_profile=os.environ.get('SQLITE_PROFILE', 'tuned'),
+    ),
 }
 
+# Read replicas: DATABASE_REPLICA_URLS=url1,url2 adds aliases replica1, replica2, ...
+# Tests use the primary (TEST MIRROR). For a local stand-in, point a replica at a second
+# SQLite file and copy the primary into it with `manage.py sync_replica`.
+RIDES_READ_REPLICAS = []
+for number, url in enumerate(filter(None, os.environ.get('DATABASE_REPLICA_URLS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = parse_database_url(
+        url,
+        BASE_DIR,
+        conn_max_age=DATABASES['default']['CONN_MAX_AGE'],
+        pool=os.environ.get('DATABASE_POOL') == '1',
+        sqlite_profile=os.environ.get('SQLITE_PROFILE', 'tuned'),
+    )
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    RIDES_READ_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['rides.routers.ReplicaRouter']
+
+# Views whose safe-method requests read from a replica (names as in RIDES_QUERY_BUDGET)
+RIDES_REPLICA_VIEWS = [
+    'RideViewSet.list',
+    'RideViewSet.retrieve',
+    'RideViewSet.export',
+    'RideEventViewSet.list',
+    'RideEventViewSet.export',
+    'trip_duration_report',
+]
+# 'round_robin', or 'least_lag' (skips replicas more than RIDES_REPLICA_MAX_LAG seconds behind)
+RIDES_REPLICA_STRATEGY = os.environ.get('RIDES_REPLICA_STRATEGY', 'round_robin')
+RIDES_REPLICA_MAX_LAG = 30
+# Reads stay on the primary this long after a client writes (read-your-writes).
+# Pins live in this cache; use a shared backend (RIDES_CACHE=redis) with several workers.
+RIDES_REPLICA_PIN_SECONDS = 5
+RIDES_REPLICA_PIN_CACHE = 'rides'
+
 
 # Password validation
 # https://docs.djangoproject.com/en/6.0/ref/settings/#auth-password-validators
@@ -122,15 +174,94 @@ STATIC_URL = 'static/'
 
 AUTH_USER_MODEL = 'rides.User'
 
+# Caches
+# https://docs.djangoproject.com/en/6.0/topics/cache/
+# The 'rides' cache backs the ride list/detail response cache (rides/response_cache.py),
+# picked with RIDES_CACHE=locmem|file|redis. locmem is per process (LRU eviction past
+# MAX_ENTRIES); file and redis share entries and invalidations between workers.
+# redis needs `pip install redis`. MAX_ENTRIES only goes to locmem and file: the
+# redis backend passes OPTIONS on to its connection pool.
+RIDES_CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'rides-responses',
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('RIDES_CACHE_LOCATION', BASE_DIR / '.cache' / 'rides'),
+        'OPTIONS': {'MAX_ENTRIES': 1000},
+    },
+    'redis': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ.get('RIDES_CACHE_LOCATION', 'redis://127.0.0.1:6379/1'),
+    },
+}
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'rides': {
+        **RIDES_CACHE_BACKENDS[os.environ.get('RIDES_CACHE', 'locmem')],
+        # Also bounds how stale the 24h todays_events window can get
+        'TIMEOUT': 60,
+    },
+}
+
+# Set to None to disable the response cache
+RIDES_RESPONSE_CACHE_ALIAS = 'rides'
+
+# Response compression (rides/compression.py). Encodings in server preference order;
+# br needs the brotli package and zstd the zstandard package, missing ones are skipped.
+# Levels trade CPU for bytes, see the `compression` section of bench_api.
+RIDES_COMPRESSION_ENCODINGS = ['zstd', 'br', 'gzip']
+RIDES_COMPRESSION_LEVELS = {'gzip': 6, 'br': 4, 'zstd': 3}
+# Smaller bodies go out uncompressed (headers and CPU would outweigh the savings)
+RIDES_COMPRESSION_MIN_SIZE = 1024
+# No text/html: the browsable API reflects the request URL next to the CSRF token,
+# and compressing both exposes the token to BREACH
+RIDES_COMPRESSION_CONTENT_TYPES = [
+    'application/json',
+    'application/msgpack',
+    'application/x-ndjson',
+    'text/csv',
+    'text/plain',
+]
+
+# JSON encoder behind rides.renderers.FastJSONRenderer: 'orjson' (when installed) or
+# 'json' for DRF's stock json.dumps; both produce the same bytes
+RIDES_JSON_RENDERER = os.environ.get('RIDES_JSON_RENDERER', 'orjson')
+
+# Events nested in ride list/detail responses (?events_since=, ?events_limit=, ?events=count):
+# the newest RIDES_EVENTS_LIMIT per ride by default, at most RIDES_EVENTS_MAX_LIMIT on request
+RIDES_EVENTS_LIMIT = 100
+RIDES_EVENTS_MAX_LIMIT = 1000
+
+# `manage.py archive_ride_events` moves non-trip events older than this many days into
+# monthly archive tables (rides/archive.py); ?archived=true on /api/ride-events/ reads them
+RIDES_EVENT_ARCHIVE_DAYS = 90
+
 REST_FRAMEWORK = {
     # Authentication - who can access the API?
     # SessionAuthentication: Uses Django's session (good for browsable API)
     # BasicAuthentication: Username/password in headers (good for testing)
+    # ApiTokenAuthentication: `Authorization: Token <key>` for services, no password hashing
     'DEFAULT_AUTHENTICATION_CLASSES': [
         'rest_framework.authentication.SessionAuthentication',
+        'rides.authentication.ApiTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
     ],
     
+    # Renderers - picked by the Accept header or ?format=
+    # FastJSONRenderer: same JSON as DRF's JSONRenderer, encoded with orjson
+    # MessagePackRenderer: application/msgpack, when the msgpack package is installed
+    'DEFAULT_RENDERER_CLASSES': [
+        'rides.renderers.FastJSONRenderer',
+        *(['rides.renderers.MessagePackRenderer'] if find_spec('msgpack') else []),
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    
     # Default permission - require authenticated users
     # Our ViewSets add IsAdminRole on top of this
     'DEFAULT_PERMISSION_CLASSES': [
@@ -149,4 +280,30 @@ REST_FRAMEWORK = {
         'django_filters.rest_framework.DjangoFilterBackend',
         'rest_framework.filters.OrderingFilter',
     ],
-}
\ No newline at end of file
+}
+
+# ApiTokenAuthentication's in-process principal cache (rides/authentication.py): entries
+# per worker, and seconds before a cached token/user is reloaded (bounds how long other
+# workers honour a revoked token or a changed role)
+RIDES_TOKEN_CACHE_SIZE = 10000
+RIDES_TOKEN_CACHE_TTL = 60
+
+# Query budgets per view for RequestStatsMiddleware (rides/middleware.py)
+# Requests over budget log an N+1 warning and bump rides_query_budget_exceeded_total.
+# Budgets include authentication: +2 for SessionAuthentication, +1 for BasicAuthentication,
+# +1 for a token missing from the principal cache (0 once cached).
+RIDES_QUERY_BUDGET = {
+    'default': 20,
+    'RideViewSet.list': 6,      # rides + events prefetch + pagination count (+ users with ?serializer=fast)
+    'RideViewSet.retrieve': 4,  # ride + events prefetch
+    'RideEventViewSet.list': 4,  # events (ride joined) + pagination count
+    'trip_duration_report': 3,  # single rollup query
+    'RideEventViewSet.bulk': None,  # grows with batch size and rollup updates
+}
+# Added to a view's budget for browsable API (text/html) pages, whose forms load
+# the choices of each related field once per page
+RIDES_QUERY_BUDGET_BROWSABLE = {
+    'RideViewSet.list': 2,       # id_rider + id_driver choices in the POST form
+    'RideViewSet.retrieve': 2,   # the same in the PUT form
+    'RideEventViewSet.list': 1,  # id_ride choices, riders joined
+}
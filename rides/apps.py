@@ -3,3 +3,7 @@ from django.apps import AppConfig
 
 class RideConfig(AppConfig):
     name = 'rides'
+
+    def ready(self):
+        from . import signals  # noqa: F401 - registers the receivers
+        from . import middleware  # noqa: F401 - query counting on new DB connections
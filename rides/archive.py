@@ -0,0 +1,189 @@
+"""
+Hot/cold storage for ride events.
+
+Like a Laravel prunable model that moves rows instead of deleting them:
+`manage.py archive_ride_events` moves events older than
+RIDES_EVENT_ARCHIVE_DAYS out of ride_event into monthly partition tables
+(`ride_event_YYYY_MM`, same columns and indexes), in batches. The hot table
+then holds only recent events plus every pickup/dropoff event, which stay hot
+because ride timing and the trip duration report are rebuilt from them
+(rollups.py). The todays_events prefetch and the report never need the
+archive.
+
+all_events() is the unified query interface: a RideEvent queryset over the
+hot table UNION ALL the partitions for the requested months, returning
+RideEvent instances. /api/ride-events/?archived=true and the export use it.
+
+Partitions are plain tables described by unmanaged models in a private app
+registry, so migrations and delete cascades never see them: archived events
+keep their ride id after the ride is deleted.
+"""
+from collections import defaultdict
+from datetime import timedelta, timezone as dt_timezone
+
+from django.apps.registry import Apps
+from django.conf import settings
+from django.db import connections, models, router, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import RideEvent, RideEventArchive
+from .rollups import TRIP_EVENT_TYPES
+
+# Partition models live here, not in django.apps.apps
+partition_apps = Apps(installed_apps=())
+
+COLUMNS = ['id', 'id_ride', 'description', 'event_type', 'created_at']
+
+
+def month_key(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y-%m')
+
+
+def partition_model(month):
+    """
+    Unmanaged model for the partition table of `month` ('YYYY-MM').
+
+    Same field order as RideEvent, so a union of both returns RideEvent rows.
+    """
+    table = 'ride_event_{}'.format(month.replace('-', '_'))
+    name = 'RideEvent' + month.replace('-', '')
+    # all_models, not get_model(): the registry has no app configs
+    model = partition_apps.all_models['rides'].get(name.lower())
+    if model is not None:
+        return model
+
+    meta = type('Meta', (), {
+        'app_label': 'rides',
+        'apps': partition_apps,
+        'db_table': table,
+        'managed': False,
+        'indexes': [
+            models.Index(fields=['id_ride', 'created_at'], name=f'{table}_ride'),
+            models.Index(fields=['created_at'], name=f'{table}_time'),
+        ],
+    })
+    return type(name, (models.Model,), {
+        '__module__': __name__,
+        'Meta': meta,
+        # Ids are copied from ride_event; auto only so SQLite makes it the rowid
+        'id': models.BigAutoField(primary_key=True),
+        'id_ride': models.BigIntegerField(db_column='id_ride'),
+        'description': models.CharField(max_length=255),
+        'event_type': models.PositiveSmallIntegerField(),
+        'created_at': models.DateTimeField(),
+    })
+
+
+def get_partition(month, using):
+    """
+    Return the partition model for `month`, creating its table on first use.
+    """
+    model = partition_model(month)
+    if not RideEventArchive.objects.using(using).filter(month=month).exists():
+        # One transaction for the table and its registry row
+        with connections[using].schema_editor() as schema_editor:
+            schema_editor.create_model(model)
+            # create_model() skips the indexes of unmanaged models
+            for index in model._meta.indexes:
+                schema_editor.add_index(model, index)
+            RideEventArchive.objects.using(using).create(month=month, table_name=model._meta.db_table)
+    return model
+
+
+def archive_events(before=None, batch_size=5000, using=None):
+    """
+    Move non-trip events created before `before` into their monthly partitions.
+
+    `before` defaults to RIDES_EVENT_ARCHIVE_DAYS ago. Each batch is copied and
+    deleted in one transaction, oldest first, so an interrupted run loses
+    nothing and can simply be rerun. Run one archiver at a time.
+
+    Returns {month: events moved}; callers bump the 'ride_event' response
+    cache version.
+    """
+    if before is None:
+        before = timezone.now() - timedelta(days=settings.RIDES_EVENT_ARCHIVE_DAYS)
+    using = using or router.db_for_write(RideEvent)
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    hot_table = quote(RideEvent._meta.db_table)
+    columns = ', '.join(quote(column) for column in COLUMNS)
+    # Copied and deleted in SQL: bulk_create() spent most of its time converting values
+    copy_sql = 'INSERT INTO {{}} ({columns}) SELECT {columns} FROM {hot} WHERE id IN ({{}})'.format(
+        columns=columns, hot=hot_table
+    )
+    delete_sql = f'DELETE FROM {hot_table} WHERE id IN ({{}})'
+
+    pending = RideEvent.objects.using(using).filter(
+        created_at__lt=before
+    ).exclude(
+        event_type__in=TRIP_EVENT_TYPES
+    ).order_by('created_at', 'id').values_list('id', 'created_at')
+
+    moved = defaultdict(int)
+    batch = pending
+    while True:
+        rows = list(batch[:batch_size])
+        if not rows:
+            break
+        # Moved rows are deleted, so the next batch can start at this one's last
+        # timestamp instead of rescanning every trip event skipped so far
+        batch = pending.filter(created_at__gte=rows[-1][1])
+
+        by_month = defaultdict(list)
+        for event_id, created_at in rows:
+            by_month[month_key(created_at)].append(event_id)
+        # Outside the transaction: SQLite can't create tables inside one
+        partitions = {month: get_partition(month, using) for month in by_month}
+
+        with transaction.atomic(using=using), connection.cursor() as cursor:
+            for month, ids in by_month.items():
+                table = quote(partitions[month]._meta.db_table)
+                cursor.execute(copy_sql.format(table, ', '.join(['%s'] * len(ids))), ids)
+                RideEventArchive.objects.using(using).filter(month=month).update(
+                    row_count=F('row_count') + len(ids)
+                )
+                moved[month] += len(ids)
+
+            # Raw DELETE: RideEvent's delete signals would touch rides and log changes
+            ids = [event_id for event_id, _ in rows]
+            cursor.execute(delete_sql.format(', '.join(['%s'] * len(ids))), ids)
+    return dict(moved)
+
+
+def get_partitions(since=None, until=None, using=None):
+    """
+    Partition models whose month overlaps [since, until).
+    """
+    months = RideEventArchive.objects.using(using or router.db_for_read(RideEventArchive))
+    if since is not None:
+        months = months.filter(month__gte=month_key(since))
+    if until is not None:
+        months = months.filter(month__lte=month_key(until))
+    return [partition_model(month) for month in months.values_list('month', flat=True)]
+
+
+def all_events(q=None, since=None, until=None):
+    """
+    Hot and archived events matching `q` (a Q on RideEvent field names), as one queryset.
+
+    `since`/`until` bound created_at and skip partitions outside that range.
+    The result is a UNION ALL: order it, slice it, count() it or call values()
+    on it, but filter through `q`, not afterwards.
+    """
+    q = q or Q()
+    if since is not None:
+        q &= Q(created_at__gte=since)
+    if until is not None:
+        q &= Q(created_at__lt=until)
+
+    # Same columns in the same order on both sides, so union rows load as RideEvent
+    hot = RideEvent.objects.filter(q).order_by()
+    archived = [
+        model.objects.filter(q)
+        for model in get_partitions(since, until, using=hot.db)
+    ]
+    if not archived:
+        return hot
+    return hot.union(*archived, all=True)
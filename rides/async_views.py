@@ -0,0 +1,273 @@
+"""
+Async (ASGI-native) endpoints.
+
+DRF views are synchronous, so these are plain Django async views. They run
+the same authentication classes and IsAdminRole check as the API through
+sync_to_async; run under an ASGI server (`uvicorn config.asgi:application`)
+so waiting clients hold no worker thread.
+
+The ride list/detail and report views reuse RideViewSet's queryset, filter
+and pagination code and render the same JSON as the DRF endpoints, but await
+every query (acount, aget, async iteration) instead of blocking a thread.
+"""
+from functools import wraps
+import asyncio
+import json
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from rest_framework import exceptions
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .changes import get_feed, serialize_change
+from .models import Ride
+from .permissions import IsAdminRole
+from .renderers import FastJSONRenderer
+from .response_cache import add_etag, conditional_response
+from .serializers import FastRideSerializer
+from .views import RideViewSet, TRIP_DURATION_REPORT_TITLE, trip_duration_rows
+
+LONG_POLL_DEFAULT_WAIT = 25  # seconds
+LONG_POLL_MAX_WAIT = 30
+HEARTBEAT_SECONDS = 15
+
+
+def json_response(data, status=200):
+    """
+    Render with the sync endpoints' JSON renderer, so bodies match them byte for byte.
+    """
+    return HttpResponse(FastJSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def error_response(exc):
+    """
+    Same body as DRF's exception handler for an APIException.
+    """
+    detail = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    return json_response(detail, status=exc.status_code)
+
+
+def authenticate(request):
+    """
+    Sync: authenticate like the DRF views; return an error JsonResponse or None.
+    """
+    drf_request = Request(
+        request,
+        authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+    )
+    try:
+        user = drf_request.user
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+    if not (user and user.is_authenticated):
+        response = error_response(exceptions.NotAuthenticated())
+        header = drf_request.authenticators[-1].authenticate_header(drf_request)
+        if header:
+            response['WWW-Authenticate'] = header
+        return response
+
+    permission = IsAdminRole()
+    if not permission.has_permission(drf_request, None):
+        return error_response(exceptions.PermissionDenied(permission.message))
+
+    request.user = user
+    return None
+
+
+def admin_required(view):
+    """
+    Async equivalent of permission_classes([IsAuthenticated, IsAdminRole]).
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        error = await sync_to_async(authenticate)(request)
+        if error is not None:
+            return error
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+
+def int_param(request, name, default=None, minimum=0):
+    """
+    Read a non-negative integer query param; raises ValueError with a message.
+    """
+    value = request.GET.get(name)
+    if value in (None, ''):
+        return default
+    try:
+        number = int(value)
+    except ValueError:
+        raise ValueError(f'{name} must be an integer.')
+    if number < minimum:
+        raise ValueError(f'{name} must be at least {minimum}.')
+    return number
+
+
+def change_feed_params(request):
+    """
+    Return (after, ride) from ?after= (or Last-Event-ID) and ?ride=.
+    """
+    after = int_param(request, 'after')
+    last_event_id = request.headers.get('Last-Event-ID')
+    if last_event_id:
+        try:
+            after = int(last_event_id)
+        except ValueError:
+            raise ValueError('Last-Event-ID must be an integer.')
+    return after, int_param(request, 'ride', minimum=1)
+
+
+def ride_view(request, action, **kwargs):
+    """
+    A RideViewSet bound to this request, for its queryset, filter and pagination code.
+    """
+    drf_request = Request(request)
+    drf_request.user = request.user
+    return RideViewSet(request=drf_request, action=action, args=(), kwargs=kwargs, format_kwarg=None)
+
+
+async def attach_related(view, rows):
+    """
+    Async RideViewSet.attach_related: users and todays_events in up to 2 queries.
+    """
+    if rows:
+        users, events = view.get_related_querysets(rows)
+        if users is not None:
+            users = [user async for user in users]
+        if events is not None:
+            events = [event async for event in events]
+        view.merge_related(rows, users, events)
+
+
+@admin_required
+async def async_ride_list(request):
+    """
+    GET /api/async/rides/ - async RideViewSet.list.
+
+    Same filters, sorting, page/cursor pagination and JSON as /api/rides/.
+    Uncached: every request runs its queries, but none of them blocks a thread.
+    """
+    view = ride_view(request, 'list')
+    try:
+        queryset = view.get_fast_rows(view.filter_queryset(view.get_queryset()))
+        page = await view.paginator.apaginate_queryset(queryset, view.request, view)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+
+    rows = page if page is not None else [row async for row in queryset]
+    await attach_related(view, rows)
+    data = FastRideSerializer(rows, many=True, context=view.get_serializer_context()).data
+    if page is not None:
+        data = view.paginator.get_paginated_response(data).data
+
+    response = view.set_last_modified(json_response(data), rows)
+    # Like RideViewSet.list, lists revalidate by ETag only
+    return conditional_response(request, add_etag(response), use_last_modified=False)
+
+
+@admin_required
+async def async_ride_detail(request, pk):
+    """
+    GET /api/async/rides/<id>/ - async RideViewSet.retrieve.
+    """
+    view = ride_view(request, 'retrieve', pk=pk)
+    try:
+        queryset = view.get_fast_rows(view.filter_queryset(view.get_queryset()))
+        row = await queryset.aget(pk=pk)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+    except Ride.DoesNotExist:
+        return error_response(exceptions.NotFound('No Ride matches the given query.'))
+
+    await attach_related(view, [row])
+    response = view.set_last_modified(json_response(FastRideSerializer(row, context=view.get_serializer_context()).data), [row])
+    return conditional_response(request, add_etag(response))
+
+
+@admin_required
+async def async_trip_duration_report(request):
+    """
+    GET /api/async/reports/trip-duration/ - async trip_duration_report.
+    """
+    rows = [row async for row in trip_duration_rows()]
+    return json_response({'report': TRIP_DURATION_REPORT_TITLE, 'data': rows})
+
+
+@admin_required
+async def ride_changes(request):
+    """
+    GET /api/rides/changes/ - long-poll the ride change feed.
+
+    Returns the changes after ?after=<id> at once if there are any, otherwise
+    waits up to ?wait= seconds for new ones. Pass the returned `cursor` as the
+    next ?after=. Without ?after= the wait starts from the newest change.
+    """
+    try:
+        after, ride = change_feed_params(request)
+        wait = min(int_param(request, 'wait', LONG_POLL_DEFAULT_WAIT), LONG_POLL_MAX_WAIT)
+    except ValueError as exc:
+        return json_response({'detail': str(exc)}, status=400)
+
+    subscription = await get_feed().subscribe(after)
+    try:
+        loop_time = asyncio.get_running_loop().time
+        deadline = loop_time() + wait
+        results = []
+        while not results:
+            batch = await subscription.next_batch(timeout=max(deadline - loop_time(), 0))
+            if not batch:
+                break
+            results = [serialize_change(c) for c in batch if ride is None or c.id_ride == ride]
+    finally:
+        subscription.close()
+
+    return json_response({'changes': results, 'cursor': subscription.after})
+
+
+@admin_required
+async def ride_changes_stream(request):
+    """
+    GET /api/rides/changes/stream/ - the ride change feed as Server-Sent Events.
+
+    Each change is sent with its sequence id, so a reconnecting EventSource
+    resumes from Last-Event-ID. Accepts ?after= and ?ride= like the long-poll
+    endpoint; comment lines keep idle connections open.
+
+    ASGI only: a WSGI server (runserver) reads an async stream into memory
+    before sending anything, so this endless one would never be sent.
+    """
+    if not isinstance(request, ASGIRequest):
+        return json_response(
+            {'detail': 'The change stream needs an ASGI server (uvicorn config.asgi:application); '
+                       'use /api/rides/changes/ to long-poll instead.'},
+            status=501
+        )
+    try:
+        after, ride = change_feed_params(request)
+    except ValueError as exc:
+        return json_response({'detail': str(exc)}, status=400)
+
+    async def events():
+        # Subscribe lazily: on the event loop that streams the response
+        subscription = await get_feed().subscribe(after)
+        try:
+            yield 'retry: 3000\n\n'
+            while True:
+                batch = await subscription.next_batch(timeout=HEARTBEAT_SECONDS)
+                if not batch:
+                    yield ': keepalive\n\n'
+                    continue
+                for change in batch:
+                    if ride is None or change.id_ride == ride:
+                        data = json.dumps(serialize_change(change))
+                        yield f'id: {change.id}\nevent: {change.kind}\ndata: {data}\n\n'
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
@@ -0,0 +1,110 @@
+"""
+Token authentication for service clients (REST_FRAMEWORK in settings.py).
+
+Basic auth runs the full password hasher (PBKDF2, on purpose slow) plus a
+user query on every request. ApiTokenAuthentication hashes the presented key
+with SHA-256 instead and looks the token, its user and role up in
+`principal_cache`, a bounded in-process LRU, so a warm request costs
+microseconds and no queries.
+
+Cache entries live at most RIDES_TOKEN_CACHE_TTL seconds. Saving or deleting
+a User or ApiToken evicts its entries in this process (see signals.py); other
+workers see a revocation or role change within the TTL. Expiry is checked on
+every request, cached or not.
+"""
+from collections import OrderedDict
+import threading
+import time
+
+from django.conf import settings
+from django.db import router
+from rest_framework import exceptions
+from rest_framework.authentication import BaseAuthentication, get_authorization_header
+
+from .models import ApiToken
+
+
+class PrincipalCache:
+    """
+    Thread-safe LRU of token hash -> ApiToken (with its user), entries expiring after a TTL.
+    """
+    def __init__(self):
+        self.entries = OrderedDict()  # key_hash -> (cached_at, token)
+        self.lock = threading.Lock()
+
+    def get(self, key_hash):
+        with self.lock:
+            entry = self.entries.get(key_hash)
+            if entry is None:
+                return None
+            cached_at, token = entry
+            if time.monotonic() - cached_at > settings.RIDES_TOKEN_CACHE_TTL:
+                del self.entries[key_hash]
+                return None
+            self.entries.move_to_end(key_hash)
+            return token
+
+    def set(self, key_hash, token):
+        with self.lock:
+            self.entries[key_hash] = (time.monotonic(), token)
+            self.entries.move_to_end(key_hash)
+            while len(self.entries) > settings.RIDES_TOKEN_CACHE_SIZE:
+                self.entries.popitem(last=False)
+
+    def evict(self, key_hash):
+        with self.lock:
+            self.entries.pop(key_hash, None)
+
+    def evict_user(self, user_id):
+        with self.lock:
+            for key_hash in [k for k, (_, token) in self.entries.items() if token.user_id == user_id]:
+                del self.entries[key_hash]
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+principal_cache = PrincipalCache()
+
+
+class ApiTokenAuthentication(BaseAuthentication):
+    """
+    `Authorization: Token <key>` with keys from ApiToken.issue() (or `manage.py create_api_token`).
+
+    Like Sanctum's guard: request.user is the token's user, request.auth the ApiToken.
+    """
+    keyword = 'Token'
+
+    def authenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        if len(auth) != 2:
+            raise exceptions.AuthenticationFailed('Invalid token header. Use "Token <key>".')
+        try:
+            key = auth[1].decode()
+        except UnicodeError:
+            raise exceptions.AuthenticationFailed('Invalid token header. The key contains invalid characters.')
+        return self.authenticate_credentials(key)
+
+    def authenticate_credentials(self, key):
+        key_hash = ApiToken.hash_key(key)
+        token = principal_cache.get(key_hash)
+        if token is None:
+            # Primary, not a read replica: it has just-issued tokens and revocations
+            token = ApiToken.objects.using(router.db_for_write(ApiToken)).select_related('user').filter(
+                key_hash=key_hash
+            ).first()
+            if token is None:
+                raise exceptions.AuthenticationFailed('Invalid token.')
+            principal_cache.set(key_hash, token)
+
+        if not token.is_active():
+            raise exceptions.AuthenticationFailed('Token expired or revoked.')
+        if not token.user.is_active:
+            raise exceptions.AuthenticationFailed('User inactive or deleted.')
+        return (token.user, token)
+
+    def authenticate_header(self, request):
+        return self.keyword
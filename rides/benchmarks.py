@@ -0,0 +1,438 @@
+"""
+Benchmark helpers for the rides API hot paths.
+
+Used by `manage.py bench_api`; requests go through the full Django/DRF stack
+in-process (no network), so the numbers isolate server-side cost:
+latency percentiles, query count, SQL time, response size and peak memory.
+"""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import gc
+from math import ceil
+import threading
+import time
+import tracemalloc
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(ceil(pct / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def get_host():
+    """
+    A Host header ALLOWED_HOSTS accepts.
+
+    'localhost' passes the DEBUG default; the test runner only allows 'testserver'.
+    """
+    return 'testserver' if 'testserver' in settings.ALLOWED_HOSTS else 'localhost'
+
+
+def make_client(user):
+    """
+    Authenticated API client with a Host header ALLOWED_HOSTS accepts.
+    """
+    client = APIClient(HTTP_HOST=get_host())
+    client.force_authenticate(user=user)
+    return client
+
+
+def measure(client, url, iterations=20, warmup=3, memory_iterations=3, **headers):
+    """
+    Request `url` repeatedly and summarize the cost.
+
+    Latency and query stats come from the timed iterations; peak memory is
+    taken in separate runs because tracemalloc slows everything down.
+    """
+    for _ in range(warmup):
+        client.get(url, **headers)
+
+    latencies, query_counts, sql_times = [], [], []
+    response = None
+    for _ in range(iterations):
+        with CaptureQueriesContext(connection) as ctx:
+            started = time.perf_counter()
+            response = client.get(url, **headers)
+            latencies.append((time.perf_counter() - started) * 1000)
+        query_counts.append(len(ctx.captured_queries))
+        sql_times.append(sum(float(q['time']) for q in ctx.captured_queries) * 1000)
+
+    peaks = []
+    for _ in range(memory_iterations):
+        gc.collect()
+        tracemalloc.start()
+        client.get(url, **headers)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    body = b''.join(response.streaming_content) if response.streaming else response.content
+    return {
+        'url': url,
+        'status': response.status_code,
+        'iterations': iterations,
+        'latency_ms': {
+            'min': round(min(latencies), 3),
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'p99': round(percentile(latencies, 99), 3),
+            'max': round(max(latencies), 3),
+            'mean': round(sum(latencies) / len(latencies), 3),
+        },
+        'queries': max(query_counts),
+        'sql_ms': round(percentile(sql_times, 50), 3),
+        'response_bytes': len(body),
+        'peak_memory_kb': round(max(peaks) / 1024, 1),
+    }
+
+
+def compare(baseline, current, threshold=1.2):
+    """
+    Return a list of regressions between two bench_api JSON results.
+
+    A scenario regresses when its p95 latency grows by more than `threshold`
+    times or it issues more queries than before.
+    """
+    regressions = []
+    for name, result in current['scenarios'].items():
+        before = baseline.get('scenarios', {}).get(name)
+        if not before:
+            continue
+        old_p95, new_p95 = before['latency_ms']['p95'], result['latency_ms']['p95']
+        if old_p95 and new_p95 > old_p95 * threshold:
+            regressions.append(f'{name}: p95 {old_p95:.1f}ms -> {new_p95:.1f}ms')
+        if result['queries'] > before['queries']:
+            regressions.append(f"{name}: queries {before['queries']} -> {result['queries']}")
+    return regressions
+
+
+def time_call(fn, iterations=20, warmup=2):
+    """
+    Median wall time of fn() in milliseconds.
+    """
+    for _ in range(warmup):
+        fn()
+    timings = []
+    for _ in range(iterations):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return percentile(timings, 50)
+
+
+def measure_serializers(rides, iterations=20):
+    """
+    Compare RideSerializer with FastRideSerializer on an already loaded page.
+
+    `rides` must be Ride instances with select_related users and the
+    todays_events prefetch, so only serialization is timed.
+    """
+    from .serializers import FastRideSerializer, RideSerializer
+
+    drf_ms = time_call(lambda: RideSerializer(rides, many=True).data, iterations)
+    fast_ms = time_call(lambda: FastRideSerializer(rides, many=True).data, iterations)
+    return {
+        'page_size': len(rides),
+        'drf_ms': round(drf_ms, 3),
+        'fast_ms': round(fast_ms, 3),
+        'speedup': round(drf_ms / fast_ms, 2) if fast_ms else None,
+    }
+
+
+def measure_renderers(rides, iterations=20):
+    """
+    Time rendering a RideSerializer page with each JSON/binary renderer.
+
+    The serializer output is built once, so only encoding is timed.
+    """
+    from rest_framework.renderers import JSONRenderer
+
+    from .renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+    from .serializers import RideSerializer
+
+    data = RideSerializer(rides, many=True).data
+    renderers = {'json': JSONRenderer()}
+    if orjson is not None:
+        renderers['orjson'] = FastJSONRenderer()
+    if msgpack is not None:
+        renderers['msgpack'] = MessagePackRenderer()
+
+    result = {'page_size': len(rides)}
+    for name, renderer in renderers.items():
+        result[f'{name}_ms'] = round(time_call(lambda: renderer.render(data), iterations), 3)
+        result[f'{name}_bytes'] = len(renderer.render(data))
+    return result
+
+
+def measure_compression(payloads, iterations=20, levels=None):
+    """
+    CPU cost against bytes saved for each installed encoding and level.
+
+    `payloads` is {name: body bytes}; `levels` is {encoding: [levels]}
+    (default: the configured level of each encoding).
+    """
+    from django.test import override_settings
+
+    from .compression import available_encodings, compress
+
+    levels = levels or {encoding: [settings.RIDES_COMPRESSION_LEVELS[encoding]] for encoding in available_encodings()}
+    results = []
+    for name, body in payloads.items():
+        for encoding in available_encodings():
+            for level in levels.get(encoding, []):
+                with override_settings(RIDES_COMPRESSION_LEVELS={**settings.RIDES_COMPRESSION_LEVELS, encoding: level}):
+                    compress_ms = time_call(lambda: compress(body, encoding), iterations)
+                    size = len(compress(body, encoding))
+                results.append({
+                    'payload': name,
+                    'encoding': encoding,
+                    'level': level,
+                    'bytes': len(body),
+                    'compressed_bytes': size,
+                    'saved_pct': round(100 - size * 100 / len(body), 1),
+                    'compress_ms': round(compress_ms, 3),
+                    # CPU per byte saved, comparable across payload sizes
+                    'us_per_kb_saved': round(compress_ms * 1000 / max((len(body) - size) / 1024, 1e-9), 2),
+                })
+    return results
+
+
+def session_cookie(user):
+    """
+    Log `user` in and return a Cookie header value for raw ASGI/WSGI requests.
+    """
+    client = Client()
+    client.force_login(user)
+    return f'{settings.SESSION_COOKIE_NAME}={client.cookies[settings.SESSION_COOKIE_NAME].value}'
+
+
+async def asgi_get(app, url, cookie, client_delay=0.0):
+    """
+    One GET through an ASGI application, from a client that takes
+    `client_delay` seconds to read the response. Returns the status code.
+    """
+    path, _, query = url.partition('?')
+    host = get_host()
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query.encode(),
+        'root_path': '',
+        'headers': [(b'host', host.encode()), (b'cookie', cookie.encode())],
+        'client': ('127.0.0.1', 0),
+        'server': (host, 80),
+    }
+    finished = asyncio.Event()
+    request_sent = False
+    status = None
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await finished.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        nonlocal status
+        if message['type'] == 'http.response.start':
+            status = message['status']
+        elif message['type'] == 'http.response.body' and not message.get('more_body'):
+            # A slow reader only parks this coroutine
+            await asyncio.sleep(client_delay)
+            finished.set()
+
+    await app(scope, receive, send)
+    finished.set()
+    return status
+
+
+_wsgi_clients = threading.local()
+
+
+def wsgi_get(url, cookie, client_delay=0.0):
+    """
+    One GET through the sync handler from a worker thread; a slow client keeps
+    the thread busy while it reads, as it would a WSGI worker.
+    """
+    client = getattr(_wsgi_clients, 'client', None)
+    if client is None:
+        client = _wsgi_clients.client = Client(HTTP_HOST=get_host(), HTTP_COOKIE=cookie)
+    status = client.get(url, HTTP_CACHE_CONTROL='no-cache').status_code
+    time.sleep(client_delay)
+    return status
+
+
+async def run_load(request, concurrency, rounds):
+    """
+    `concurrency` clients each sending `rounds` requests back to back.
+
+    `request` is an async callable returning a status code. Latency includes
+    any time spent queued for a worker.
+    """
+    latencies, errors = [], 0
+
+    async def client():
+        nonlocal errors
+        for _ in range(rounds):
+            started = time.perf_counter()
+            if await request() != 200:
+                errors += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    wall = time.perf_counter() - started
+    return {
+        'concurrency': concurrency,
+        'requests': len(latencies),
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(latencies) / wall, 1),
+        'latency_ms': {
+            'p50': round(percentile(latencies, 50), 3),
+            'p95': round(percentile(latencies, 95), 3),
+            'max': round(max(latencies), 3),
+        },
+    }
+
+
+def measure_concurrency(wsgi_url, asgi_url, cookie, levels, rounds=3, threads=8, client_delay=0.0):
+    """
+    Compare the sync views on a fixed thread pool (a threaded WSGI worker)
+    with the async views on one event loop (an ASGI worker) as clients grow.
+    """
+    from django.core.asgi import get_asgi_application
+
+    app = get_asgi_application()
+    results = {'wsgi': [], 'asgi': []}
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for concurrency in levels:
+            async def wsgi_request():
+                loop = asyncio.get_running_loop()
+                return await loop.run_in_executor(pool, wsgi_get, wsgi_url, cookie, client_delay)
+
+            async def asgi_request():
+                return await asgi_get(app, asgi_url, cookie, client_delay)
+
+            results['wsgi'].append(asyncio.run(run_load(wsgi_request, concurrency, rounds)))
+            results['asgi'].append(asyncio.run(run_load(asgi_request, concurrency, rounds)))
+    return results
+
+
+def measure_read_write(read_url, write_url, write_body, cookie, readers=4, writers=2, duration=5.0):
+    """
+    Readers GET `read_url` while writers POST `write_body()` to `write_url`,
+    each in its own thread (and database connection), for `duration` seconds.
+
+    Failed requests are counted per error (e.g. "database is locked").
+    """
+    deadline = time.perf_counter() + duration
+    results = {'read': [], 'write': []}
+    errors = {'read': {}, 'write': {}}
+    lock = threading.Lock()
+
+    def worker(kind):
+        from django.db import connections
+
+        client = Client(HTTP_HOST=get_host(), HTTP_COOKIE=cookie)
+        latencies, failures = [], {}
+        try:
+            while time.perf_counter() < deadline:
+                started = time.perf_counter()
+                try:
+                    if kind == 'read':
+                        response = client.get(read_url, HTTP_CACHE_CONTROL='no-cache')
+                    else:
+                        response = client.post(write_url, write_body(), content_type='application/json')
+                    error = None if response.status_code < 400 else f'HTTP {response.status_code}'
+                except Exception as exc:
+                    error = f'{type(exc).__name__}: {exc}'
+                if error:
+                    failures[error] = failures.get(error, 0) + 1
+                else:
+                    latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            connections.close_all()
+        with lock:
+            results[kind].extend(latencies)
+            for error, count in failures.items():
+                errors[kind][error] = errors[kind].get(error, 0) + count
+
+    kinds = ['read'] * readers + ['write'] * writers
+    with ThreadPoolExecutor(max_workers=len(kinds)) as pool:
+        list(pool.map(worker, kinds))
+
+    return {
+        kind: {
+            'threads': readers if kind == 'read' else writers,
+            'ok': len(latencies),
+            'errors': errors[kind],
+            'throughput_rps': round(len(latencies) / duration, 1),
+            'latency_ms': {
+                'p50': round(percentile(latencies, 50), 3) if latencies else None,
+                'p95': round(percentile(latencies, 95), 3) if latencies else None,
+                'max': round(max(latencies), 3) if latencies else None,
+            },
+        }
+        for kind, latencies in results.items()
+    }
+
+
+def measure_auth(url, authorizations, iterations=20):
+    """
+    Cost of each authentication scheme, given {scheme: Authorization header value}.
+
+    `auth_us` times DRF's authenticator chain alone (what request.user runs);
+    `request` is a full GET of `url` with that header through measure().
+    """
+    from django.test import RequestFactory
+    from rest_framework.request import Request
+    from rest_framework.settings import api_settings
+
+    factory = RequestFactory(HTTP_HOST=get_host())
+    results = {}
+    for scheme, authorization in authorizations.items():
+        def authenticate():
+            request = Request(
+                factory.get(url, HTTP_AUTHORIZATION=authorization),
+                authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES]
+            )
+            return request.user
+
+        if not authenticate().is_authenticated:
+            raise ValueError(f'{scheme} credentials were rejected')
+        timings = []
+        for _ in range(iterations):
+            started = time.perf_counter()
+            authenticate()
+            timings.append((time.perf_counter() - started) * 1_000_000)
+
+        results[scheme] = {
+            'auth_us': {
+                'p50': round(percentile(timings, 50), 1),
+                'p95': round(percentile(timings, 95), 1),
+            },
+            'request': measure(
+                Client(HTTP_HOST=get_host()), url, iterations, memory_iterations=1,
+                HTTP_AUTHORIZATION=authorization
+            ),
+        }
+    return results
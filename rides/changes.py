@@ -0,0 +1,181 @@
+"""
+Ride change feed: an append-only log plus in-process fan-out.
+
+Writers append RideChange rows (signals.py for model saves, the bulk event
+endpoint for bulk_create). Readers never poll per subscriber: each event loop
+runs one ChangeFeed task that reads new rows after the highest id it has
+seen and pushes them to every subscriber's queue, so the database sees one
+query per poll interval however many clients are connected.
+
+Ids are the resume cursor. SQLite serializes writers, so ids commit in
+order; on databases with concurrent writers a transaction can commit a lower
+id after a higher one became visible, and a reader already past it would
+skip that row.
+"""
+import asyncio
+
+from .models import RideChange
+
+POLL_INTERVAL = 0.5        # seconds between change log reads while anyone listens
+BATCH_SIZE = 500           # rows per read, for catch-up and polling
+SUBSCRIBER_BACKLOG = 100   # pushed batches a slow subscriber may hold before it reads from the log
+
+
+def serialize_change(change):
+    return {
+        'id': change.id,
+        'kind': change.kind,
+        'id_ride': change.id_ride,
+        'payload': change.payload,
+        'created_at': change.created_at.isoformat(),
+    }
+
+
+def ride_status_change(ride, previous_status):
+    return RideChange(
+        kind='ride_status',
+        id_ride=ride.pk,
+        payload={'status': ride.status, 'previous_status': previous_status},
+    )
+
+
+def ride_event_change(event):
+    return RideChange(
+        kind='ride_event',
+        id_ride=event.id_ride_id,
+        payload={
+            'id': event.pk,
+            'description': event.description,
+            'created_at': event.created_at.isoformat(),
+        },
+    )
+
+
+async def fetch_changes(after, up_to=None, limit=BATCH_SIZE):
+    """
+    Return up to `limit` changes with after < id (<= up_to), oldest first.
+    """
+    queryset = RideChange.objects.filter(id__gt=after)
+    if up_to is not None:
+        queryset = queryset.filter(id__lte=up_to)
+    return [change async for change in queryset.order_by('id')[:limit]]
+
+
+async def latest_change_id():
+    change = await RideChange.objects.order_by('-id').only('id').afirst()
+    return change.id if change else 0
+
+
+class Subscription:
+    """
+    One client's view of the feed, starting after `after` (None = from now).
+
+    Iterate with `await subscription.next_batch(timeout)`; always close().
+    """
+    def __init__(self, feed, after):
+        self.feed = feed
+        self.after = after
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_BACKLOG)
+        self.behind = after < feed.last_id
+
+    async def next_batch(self, timeout=None):
+        """
+        Return the next non-empty list of changes, or [] on timeout.
+
+        Reads the log while behind the feed (resuming from a cursor, or after
+        falling SUBSCRIBER_BACKLOG batches behind), then takes the batches
+        the feed pushes without querying.
+        """
+        if self.behind:
+            up_to = self.feed.last_id
+            changes = await fetch_changes(self.after, up_to=up_to)
+            self.after = changes[-1].id if changes else max(self.after, up_to)
+            # Past what the feed had read: everything newer arrives on the queue
+            self.behind = self.after < up_to
+            if changes:
+                return changes
+
+        deadline = None if timeout is None else asyncio.get_running_loop().time() + timeout
+        while True:
+            try:
+                batch = self.queue.get_nowait()
+            except asyncio.QueueEmpty:
+                remaining = None if deadline is None else deadline - asyncio.get_running_loop().time()
+                if remaining is not None and remaining <= 0:
+                    return []
+                try:
+                    batch = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    return []
+            changes = [change for change in batch if change.id > self.after]
+            if changes:
+                self.after = changes[-1].id
+                return changes
+
+    def close(self):
+        self.feed.unsubscribe(self)
+
+
+class ChangeFeed:
+    """
+    Single reader of the change log for one event loop, fanning out to queues.
+    """
+    def __init__(self):
+        self.subscribers = set()
+        self.last_id = None
+        self.task = None
+
+    async def subscribe(self, after=None):
+        if self.task is None or self.task.done():
+            # Idle feeds don't track the log; start again from its head
+            self.last_id = await latest_change_id()
+            self.task = asyncio.ensure_future(self.run())
+        subscription = Subscription(self, self.last_id if after is None else after)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self.subscribers.discard(subscription)
+        # Stop reading the log with the last subscriber; subscribe() restarts it
+        if not self.subscribers and self.task is not None:
+            self.task.cancel()
+
+    async def run(self):
+        while self.subscribers:
+            await self.poll()
+            await asyncio.sleep(POLL_INTERVAL)
+
+    async def poll(self):
+        changes = await fetch_changes(self.last_id)
+        while changes:
+            self.last_id = changes[-1].id
+            self.publish(changes)
+            if len(changes) < BATCH_SIZE:
+                break
+            changes = await fetch_changes(self.last_id)
+
+    def publish(self, changes):
+        for subscription in list(self.subscribers):
+            try:
+                subscription.queue.put_nowait(changes)
+            except asyncio.QueueFull:
+                # Too slow: drop its backlog, it re-reads those rows from the log
+                while not subscription.queue.empty():
+                    subscription.queue.get_nowait()
+                subscription.behind = True
+
+
+_feeds = {}
+
+
+def get_feed():
+    """
+    Return the ChangeFeed of the running event loop.
+    """
+    loop = asyncio.get_running_loop()
+    feed = _feeds.get(loop)
+    if feed is None:
+        for stale in [l for l in _feeds if l.is_closed()]:
+            del _feeds[stale]
+        feed = _feeds[loop] = ChangeFeed()
+    return feed
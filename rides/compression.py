@@ -0,0 +1,188 @@
+"""
+Response compression negotiated from Accept-Encoding (CompressionMiddleware).
+
+Like Django's GZipMiddleware, plus brotli (`br`) and zstd when the `brotli`
+and `zstandard` packages are installed. The server prefers the first of
+RIDES_COMPRESSION_ENCODINGS the client accepts; bodies under
+RIDES_COMPRESSION_MIN_SIZE bytes, or that don't shrink, go out as they are.
+
+Streamed exports are compressed chunk by chunk with a flush after each, so
+clients still receive rows as they are read. The response cache
+(response_cache.py) keeps each compressed body next to the plain one, so a
+cache hit is served without compressing again.
+"""
+import zlib
+
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+INSTALLED = {
+    'gzip': True,
+    'br': brotli is not None,
+    'zstd': zstandard is not None,
+}
+
+
+def available_encodings():
+    """
+    RIDES_COMPRESSION_ENCODINGS whose library is installed, in server preference order.
+    """
+    return [encoding for encoding in settings.RIDES_COMPRESSION_ENCODINGS if INSTALLED.get(encoding)]
+
+
+def parse_accept_encoding(header):
+    """
+    Return {coding: q} from an Accept-Encoding header ('gzip, br;q=0.5' -> {'gzip': 1.0, 'br': 0.5}).
+    """
+    accepted = {}
+    for item in header.split(','):
+        coding, _, params = item.strip().partition(';')
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name.strip().lower() == 'q':
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(request):
+    """
+    The encoding to compress this request's response with, or None.
+
+    Highest client q-value first, then server preference.
+    """
+    accepted = parse_accept_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+    if not accepted:
+        return None
+    ranked = [
+        (accepted.get(encoding, accepted.get('*', 0.0)), -index, encoding)
+        for index, encoding in enumerate(available_encodings())
+    ]
+    q, _, encoding = max(ranked, default=(0.0, 0, None))
+    return encoding if q > 0 else None
+
+
+def is_compressible(response):
+    content_type = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return content_type in settings.RIDES_COMPRESSION_CONTENT_TYPES
+
+
+def compressor(encoding):
+    """
+    Return (compress, flush, finish) for one body in `encoding`, at its RIDES_COMPRESSION_LEVELS level.
+
+    compress(data) buffers, flush() emits everything so far as decodable
+    bytes, finish() ends the stream.
+    """
+    level = settings.RIDES_COMPRESSION_LEVELS[encoding]
+    if encoding == 'gzip':
+        stream = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # 16+: gzip header
+        return stream.compress, lambda: stream.flush(zlib.Z_SYNC_FLUSH), stream.flush
+    if encoding == 'br':
+        stream = brotli.Compressor(quality=level)
+        return stream.process, stream.flush, stream.finish
+    if encoding == 'zstd':
+        stream = zstandard.ZstdCompressor(level=level).compressobj()
+        return stream.compress, lambda: stream.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), stream.flush
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def compress(content, encoding):
+    """
+    Compress a whole body.
+    """
+    compress_data, _, finish = compressor(encoding)
+    return compress_data(content) + finish()
+
+
+def compress_stream(chunks, encoding):
+    """
+    Compress a streamed body, flushing after every chunk.
+    """
+    compress_data, flush, finish = compressor(encoding)
+    for chunk in chunks:
+        data = compress_data(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+async def acompress_stream(chunks, encoding):
+    compress_data, flush, finish = compressor(encoding)
+    async for chunk in chunks:
+        data = compress_data(chunk) + flush()
+        if data:
+            yield data
+    yield finish()
+
+
+def set_encoded_body(response, body, encoding):
+    """
+    Replace a response's body with its `encoding` version.
+
+    The ETag turns weak, like GZipMiddleware's: it still names the
+    uncompressed body, which If-None-Match compares weakly anyway.
+    """
+    response.content = body
+    response['Content-Length'] = str(len(body))
+    response['Content-Encoding'] = encoding
+    etag = response.get('ETag')
+    if etag and etag.startswith('"'):
+        response['ETag'] = 'W/' + etag
+    return response
+
+
+def response_encoding(request, response):
+    """
+    The encoding `response` should be sent in for `request`, or None.
+
+    Adds `Vary: Accept-Encoding` to every compressible response, compressed or not.
+    """
+    if not is_compressible(response):
+        return None
+    patch_vary_headers(response, ('Accept-Encoding',))
+    if response.has_header('Content-Encoding'):
+        return None
+    if not response.streaming and len(response.content) < settings.RIDES_COMPRESSION_MIN_SIZE:
+        return None
+    return choose_encoding(request)
+
+
+def compress_response(request, response):
+    """
+    Compress `response` for `request` when both sides allow it (CompressionMiddleware).
+    """
+    encoding = response_encoding(request, response)
+    if encoding is None:
+        return response
+
+    if response.streaming:
+        if response.is_async:
+            response.streaming_content = acompress_stream(response.streaming_content, encoding)
+        else:
+            response.streaming_content = compress_stream(response.streaming_content, encoding)
+        del response['Content-Length']
+        response['Content-Encoding'] = encoding
+        return response
+
+    body = compress(response.content, encoding)
+    if len(body) >= len(response.content):
+        return response
+    return set_encoded_body(response, body, encoding)
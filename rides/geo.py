@@ -0,0 +1,92 @@
+"""
+Geo helpers for distance sorting.
+
+Rides store a coarse grid cell for their pickup point (`Ride.pickup_cell`).
+A radius search first narrows candidates to the cells and bounding box
+covering the circle (both index-friendly), and only then computes the
+exact great-circle (haversine) distance on the survivors.
+"""
+from math import cos, floor, radians
+
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Least, Power, Radians, Sin, Sqrt
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE_LAT = 111.32
+
+# ~5.5 km per cell at the equator; small enough to prune, big enough that
+# a typical dispatch radius only touches a handful of cells.
+GRID_CELL_DEGREES = 0.05
+GRID_COLUMNS = int(round(360 / GRID_CELL_DEGREES))
+GRID_ROWS = int(round(180 / GRID_CELL_DEGREES))
+
+# Above this many cells the IN (...) list costs more than it saves;
+# fall back to the bounding box alone.
+MAX_SEARCH_CELLS = 400
+
+
+def _row(lat):
+    return min(max(int(floor((lat + 90) / GRID_CELL_DEGREES)), 0), GRID_ROWS - 1)
+
+
+def _column(lng):
+    return int(floor((lng + 180) / GRID_CELL_DEGREES)) % GRID_COLUMNS
+
+
+def grid_cell(lat, lng):
+    """
+    Return the integer grid cell containing (lat, lng).
+    """
+    return _row(lat) * GRID_COLUMNS + _column(lng)
+
+
+def bounding_box(lat, lng, radius_km):
+    """
+    Return (min_lat, max_lat, min_lng, max_lng) enclosing the search circle.
+
+    Longitude bounds are None when the box wraps the antimeridian or
+    reaches a pole, where a simple BETWEEN no longer describes it.
+    """
+    lat_delta = radius_km / KM_PER_DEGREE_LAT
+    min_lat, max_lat = lat - lat_delta, lat + lat_delta
+    if min_lat <= -90 or max_lat >= 90:
+        return max(min_lat, -90), min(max_lat, 90), None, None
+
+    lng_delta = radius_km / (KM_PER_DEGREE_LAT * cos(radians(lat)))
+    min_lng, max_lng = lng - lng_delta, lng + lng_delta
+    if min_lng < -180 or max_lng > 180:
+        return min_lat, max_lat, None, None
+    return min_lat, max_lat, min_lng, max_lng
+
+
+def cells_in_box(min_lat, max_lat, min_lng, max_lng):
+    """
+    Return the grid cells overlapping the box, or None if there are too many.
+    """
+    rows = range(_row(min_lat), _row(max_lat) + 1)
+    if min_lng is None:
+        columns = range(GRID_COLUMNS)
+    else:
+        columns = range(_column(min_lng), _column(max_lng) + 1)
+
+    if len(rows) * len(columns) > MAX_SEARCH_CELLS:
+        return None
+    return [row * GRID_COLUMNS + column for row in rows for column in columns]
+
+
+def haversine_km(lat, lng, lat_field='pickup_latitude', lng_field='pickup_longitude'):
+    """
+    Database expression for the great-circle distance (km) from (lat, lng).
+
+    Uses only functions Django provides on every backend (SQLite included).
+    """
+    origin_lat = radians(lat)
+    half_dlat = (Radians(F(lat_field)) - Value(origin_lat)) / 2
+    half_dlng = (Radians(F(lng_field)) - Value(radians(lng))) / 2
+
+    a = (
+        Power(Sin(half_dlat), 2)
+        + Value(cos(origin_lat)) * Cos(Radians(F(lat_field))) * Power(Sin(half_dlng), 2)
+    )
+    # Least() guards asin() against rounding pushing sqrt(a) just above 1
+    return ASin(Least(Sqrt(a), Value(1.0)), output_field=FloatField()) * Value(2 * EARTH_RADIUS_KM)
@@ -0,0 +1,27 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rides.archive import archive_events
+from rides.response_cache import bump_versions
+
+
+class Command(BaseCommand):
+    help = 'Moves non-trip ride events older than --days into the monthly archive tables (rides/archive.py)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.RIDES_EVENT_ARCHIVE_DAYS)
+        parser.add_argument('--batch-size', type=int, default=5000)
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        moved = archive_events(before=cutoff, batch_size=options['batch_size'])
+        if moved:
+            bump_versions('ride_event')
+        for month, count in sorted(moved.items()):
+            self.stdout.write(f'{month}: {count}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {sum(moved.values())} ride events older than {cutoff:%Y-%m-%d %H:%M}.'
+        ))
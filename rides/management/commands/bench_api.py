@@ -0,0 +1,190 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connection
+from django.db.models import Prefetch
+from django.utils import timezone
+import django
+import json
+import platform
+import sys
+
+from rides.benchmarks import (
+    compare, make_client, measure, measure_compression, measure_renderers, measure_serializers
+)
+from rides.models import User, Ride, RideEvent
+from rides.pagination import RideKeysetPagination
+
+
+class Command(BaseCommand):
+    help = 'Benchmarks the rides API hot paths and prints machine-readable JSON'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--warmup', type=int, default=3)
+        parser.add_argument('--scenario', action='append', dest='scenarios',
+                            help='Only run these scenarios (repeatable)')
+        parser.add_argument('--output', help='Write JSON here instead of stdout')
+        parser.add_argument('--compare', help='Baseline JSON to compare against; exits 1 on regression')
+        parser.add_argument('--threshold', type=float, default=1.2,
+                            help='Allowed p95 growth factor for --compare')
+        parser.add_argument('--seed-rides', type=int, default=0,
+                            help='Generate a fixed dataset (seed_load --seed 42) of this many rides first')
+
+    def handle(self, *args, **options):
+        if options['seed_rides']:
+            self.seed(options['seed_rides'])
+
+        if not Ride.objects.exists():
+            raise CommandError('No rides to benchmark; pass --seed-rides N or run seed_load first')
+
+        client = make_client(self.get_admin())
+        scenarios = self.get_scenarios()
+        if options['scenarios']:
+            unknown = set(options['scenarios']) - set(scenarios)
+            if unknown:
+                raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+            scenarios = {name: scenarios[name] for name in options['scenarios']}
+
+        results = {}
+        for name, (url, headers) in scenarios.items():
+            self.stderr.write(f'{name}: {url}')
+            results[name] = measure(
+                client, url,
+                iterations=options['iterations'],
+                warmup=options['warmup'],
+                **headers
+            )
+
+        report = {
+            'meta': self.get_meta(),
+            'scenarios': results,
+            'serializers': self.bench_serializers(options['iterations']),
+            'renderers': self.bench_renderers(options['iterations']),
+            'compression': self.bench_compression(client, options['iterations']),
+        }
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
+
+        if options['compare']:
+            with open(options['compare']) as f:
+                regressions = compare(json.load(f), report, options['threshold'])
+            for line in regressions:
+                self.stderr.write(self.style.ERROR(f'REGRESSION {line}'))
+            if regressions:
+                sys.exit(1)
+            self.stderr.write(self.style.SUCCESS('No regressions'))
+
+    def seed(self, rides):
+        if User.objects.filter(username__startswith='bench_').exists():
+            self.stderr.write('Benchmark dataset already present, skipping seed')
+            return
+        call_command(
+            'seed_load', rides=rides, riders=max(rides // 20, 1), drivers=max(rides // 200, 1),
+            seed=42, prefix='bench', stdout=self.stderr
+        )
+
+    def get_admin(self):
+        admin, _ = User.objects.get_or_create(
+            username='bench_admin',
+            defaults={'email': 'bench_admin@example.com', 'role': 'admin'}
+        )
+        return admin
+
+    def get_scenarios(self):
+        """
+        Return {name: (url, extra request headers)} built from the current data.
+        """
+        ride = Ride.objects.order_by('id').first()
+        rider_email = ride.id_rider.email
+
+        total = Ride.objects.count()
+        page_size = settings.REST_FRAMEWORK['PAGE_SIZE']
+        deep_page = max(total // page_size // 2, 1)
+
+        # Keyset cursor positioned at the same depth as deep_page
+        anchor = Ride.objects.order_by('-pickup_time', '-id')[(deep_page - 1) * page_size]
+        paginator = RideKeysetPagination()
+        paginator.base_url = '/api/rides/'
+        deep_cursor = paginator.encode_cursor(anchor, reverse=False)
+
+        lat, lng = ride.pickup_latitude, ride.pickup_longitude
+        # Ride list/detail are response-cached; measure the uncached work by default
+        uncached = {'HTTP_CACHE_CONTROL': 'no-cache'}
+        return {
+            'rides_default': ('/api/rides/', uncached),
+            'rides_cached': ('/api/rides/', {}),
+            'rides_compressed': ('/api/rides/', {**uncached, 'HTTP_ACCEPT_ENCODING': 'gzip, br, zstd'}),
+            'rides_cached_compressed': ('/api/rides/', {'HTTP_ACCEPT_ENCODING': 'gzip, br, zstd'}),
+            'rides_fast_serializer': ('/api/rides/?serializer=fast', uncached),
+            'rides_status': ('/api/rides/?status=dropoff', uncached),
+            'rides_rider_email': (f'/api/rides/?rider_email={rider_email}', uncached),
+            'rides_distance': (f'/api/rides/?lat={lat}&lng={lng}&sort_by=distance', uncached),
+            'rides_distance_radius': (f'/api/rides/?lat={lat}&lng={lng}&sort_by=distance&radius_km=2', uncached),
+            'rides_deep_page': (f'/api/rides/?page={deep_page}', uncached),
+            'rides_deep_cursor': (deep_cursor, uncached),
+            'ride_detail': (f'/api/rides/{ride.pk}/', uncached),
+            'ride_events': ('/api/ride-events/', {}),
+            'trip_duration_report': ('/api/reports/trip-duration/', {}),
+        }
+
+    def get_pages(self):
+        """
+        Loaded ride pages of 10, 100 and 500 rides (users joined, events prefetched).
+        """
+        from rides.views import RideViewSet
+
+        view = RideViewSet()
+        return [
+            list(
+                Ride.objects.select_related('id_rider', 'id_driver').prefetch_related(
+                    Prefetch('ride_events', queryset=view.get_events_queryset(), to_attr='todays_events')
+                ).order_by('-pickup_time')[:page_size]
+            )
+            for page_size in (10, 100, 500)
+        ]
+
+    def bench_serializers(self, iterations):
+        """
+        Serializer-only timings (DRF vs fast) on pages of 10, 100 and 500 rides.
+        """
+        return [measure_serializers(rides, iterations) for rides in self.get_pages()]
+
+    def bench_renderers(self, iterations):
+        """
+        Renderer-only timings (json vs orjson vs msgpack) on the same RideSerializer pages.
+        """
+        return [measure_renderers(rides, iterations) for rides in self.get_pages()]
+
+    def bench_compression(self, client, iterations):
+        """
+        Compression cost per encoding on a 100-ride page, a 500-ride page and the report.
+        """
+        from rides.renderers import FastJSONRenderer
+        from rides.serializers import RideSerializer
+
+        renderer = FastJSONRenderer()
+        _, rides_100, rides_500 = self.get_pages()
+        payloads = {
+            'rides_100': renderer.render(RideSerializer(rides_100, many=True).data),
+            'rides_500': renderer.render(RideSerializer(rides_500, many=True).data),
+            'trip_duration_report': client.get('/api/reports/trip-duration/').content,
+        }
+        return measure_compression(payloads, iterations)
+
+    def get_meta(self):
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'python': platform.python_version(),
+            'django': django.get_version(),
+            'database': connection.vendor,
+            'rows': {
+                'user': User.objects.count(),
+                'ride': Ride.objects.count(),
+                'ride_event': RideEvent.objects.count(),
+            },
+        }
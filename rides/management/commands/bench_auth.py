@@ -0,0 +1,63 @@
+from base64 import b64encode
+import json
+import secrets
+
+from django.core.management.base import BaseCommand, CommandError
+
+from rides.authentication import principal_cache
+from rides.benchmarks import measure_auth
+from rides.models import ApiToken, Ride, User
+
+
+class Command(BaseCommand):
+    help = 'Compares Basic and token authentication: authenticator time and full request latency'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--url', help='Endpoint to request (default: detail of the first ride)')
+        parser.add_argument('--output', help='Write JSON here instead of stdout')
+
+    def handle(self, *args, **options):
+        url = options['url']
+        if url is None:
+            ride_id = Ride.objects.order_by('id').values_list('id', flat=True).first()
+            if ride_id is None:
+                raise CommandError('No rides to benchmark; run seed_load first or pass --url')
+            url = f'/api/rides/{ride_id}/'
+
+        if User.objects.filter(username='bench_admin').exists():
+            raise CommandError('User bench_admin already exists; delete it first, this command only removes its own')
+
+        # A real password hash, so Basic pays the configured hasher's cost
+        password = secrets.token_urlsafe(16)
+        admin = None
+        try:
+            admin = User.objects.create_user(
+                username='bench_admin', email='bench_admin@example.com', password=password, role='admin'
+            )
+            _, key = ApiToken.issue(admin, name='bench_auth')
+            principal_cache.clear()
+
+            credentials = b64encode(f'{admin.username}:{password}'.encode()).decode()
+            results = measure_auth(url, {
+                'basic': f'Basic {credentials}',
+                'token': f'Token {key}',
+            }, iterations=options['iterations'])
+        finally:
+            if admin is not None:
+                admin.delete()  # cascades to the token
+                principal_cache.clear()
+
+        for scheme, result in results.items():
+            self.stderr.write(
+                f"{scheme:<5} auth p50 {result['auth_us']['p50']:>10.1f}us"
+                f" | request p50 {result['request']['latency_ms']['p50']:>8.3f}ms"
+                f" queries {result['request']['queries']}"
+            )
+
+        output = json.dumps({'url': url, 'iterations': options['iterations'], 'schemes': results}, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+import json
+
+from rides.benchmarks import measure_concurrency, session_cookie
+from rides.models import Ride, User
+
+# name -> (sync DRF endpoint, async endpoint); {ride} is the first ride id
+ENDPOINTS = {
+    'list': ('/api/rides/', '/api/async/rides/'),
+    'detail': ('/api/rides/{ride}/', '/api/async/rides/{ride}/'),
+    'report': ('/api/reports/trip-duration/', '/api/async/reports/trip-duration/'),
+}
+
+
+class Command(BaseCommand):
+    help = 'Load-tests the sync (WSGI thread pool) and async (ASGI event loop) read endpoints side by side'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', choices=sorted(ENDPOINTS), default='list')
+        parser.add_argument('--concurrency', default='1,10,100,500',
+                            help='Comma-separated numbers of concurrent clients')
+        parser.add_argument('--rounds', type=int, default=3, help='Requests per client')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Worker threads of the simulated WSGI server')
+        parser.add_argument('--client-delay', type=float, default=0.05,
+                            help='Seconds each client takes to read a response (slow clients)')
+        parser.add_argument('--output', help='Write JSON here instead of stdout')
+
+    def handle(self, *args, **options):
+        try:
+            levels = [int(level) for level in options['concurrency'].split(',')]
+        except ValueError:
+            raise CommandError('--concurrency must be comma-separated integers')
+
+        ride = Ride.objects.order_by('id').first()
+        if ride is None:
+            raise CommandError('No rides to benchmark; run seed_load first')
+
+        admin, _ = User.objects.get_or_create(
+            username='bench_admin',
+            defaults={'email': 'bench_admin@example.com', 'role': 'admin'}
+        )
+        wsgi_url, asgi_url = (url.format(ride=ride.pk) for url in ENDPOINTS[options['endpoint']])
+
+        results = measure_concurrency(
+            wsgi_url, asgi_url, session_cookie(admin), levels,
+            rounds=options['rounds'],
+            threads=options['threads'],
+            client_delay=options['client_delay'],
+        )
+        report = {
+            'endpoint': options['endpoint'],
+            'urls': {'wsgi': wsgi_url, 'asgi': asgi_url},
+            'threads': options['threads'],
+            'client_delay_s': options['client_delay'],
+            'results': results,
+        }
+        for wsgi, asgi in zip(results['wsgi'], results['asgi']):
+            self.stderr.write(
+                f"c={wsgi['concurrency']:<5} wsgi {wsgi['throughput_rps']:>8} rps p95 {wsgi['latency_ms']['p95']:>9}ms"
+                f" | asgi {asgi['throughput_rps']:>8} rps p95 {asgi['latency_ms']['p95']:>9}ms"
+            )
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
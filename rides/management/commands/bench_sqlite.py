@@ -0,0 +1,74 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+import json
+import random
+
+from config.database import SQLITE_PROFILES, sqlite_options
+from rides.benchmarks import measure_read_write, session_cookie
+from rides.models import Ride, User
+
+
+class Command(BaseCommand):
+    help = ('Measures ride list reads while ride events are being created, per SQLite '
+            'tuning profile (config/database.py). Writes real RideEvent rows.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profiles', default='stock,tuned',
+                            help=f"Comma-separated profiles to compare ({', '.join(SQLITE_PROFILES)})")
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--duration', type=float, default=5.0, help='Seconds per profile')
+        parser.add_argument('--read-url', default='/api/rides/?status=pickup')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write JSON here instead of stdout')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('bench_sqlite needs a SQLite database')
+        profiles = options['profiles'].split(',')
+        unknown = set(profiles) - set(SQLITE_PROFILES)
+        if unknown:
+            raise CommandError(f"Unknown profiles: {', '.join(sorted(unknown))}")
+
+        ride_ids = list(Ride.objects.values_list('id', flat=True)[:1000])
+        if not ride_ids:
+            raise CommandError('No rides to benchmark; run seed_load first')
+        admin, _ = User.objects.get_or_create(
+            username='bench_admin',
+            defaults={'email': 'bench_admin@example.com', 'role': 'admin'}
+        )
+        cookie = session_cookie(admin)
+        rng = random.Random(options['seed'])
+
+        def write_body():
+            return json.dumps({'id_ride': rng.choice(ride_ids), 'description': 'Location update'})
+
+        report = {'read_url': options['read_url'], 'duration_s': options['duration'], 'profiles': {}}
+        original = dict(connections.settings['default']['OPTIONS'])
+        try:
+            for profile in profiles:
+                # Worker threads open new connections, which pick up these OPTIONS
+                connections.close_all()
+                connections.settings['default']['OPTIONS'] = sqlite_options(profile)
+                result = measure_read_write(
+                    options['read_url'], '/api/ride-events/', write_body, cookie,
+                    readers=options['readers'],
+                    writers=options['writers'],
+                    duration=options['duration'],
+                )
+                report['profiles'][profile] = result
+                self.stderr.write(
+                    f"{profile:<6} reads {result['read']['throughput_rps']:>7} rps p95 {result['read']['latency_ms']['p95']}ms"
+                    f" | writes {result['write']['throughput_rps']:>7} rps"
+                    f" errors {sum(result['read']['errors'].values()) + sum(result['write']['errors'].values())}"
+                )
+        finally:
+            connections.close_all()
+            connections.settings['default']['OPTIONS'] = original
+
+        output = json.dumps(report, indent=2)
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                f.write(output)
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,32 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from rides.models import ApiToken, User
+
+
+class Command(BaseCommand):
+    help = 'Issues an API token for a user and prints its key (shown only once)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--name', default='', help='What the token is for, e.g. the service name')
+        parser.add_argument('--days', type=int, help='Expire after this many days (default: never)')
+    
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['username'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['username']!r}.")
+        
+        expires_at = None
+        if options['days'] is not None:
+            if options['days'] <= 0:
+                raise CommandError('--days must be positive.')
+            expires_at = timezone.now() + timedelta(days=options['days'])
+        
+        token, key = ApiToken.issue(user, name=options['name'], expires_at=expires_at)
+        expiry = f'expires {expires_at:%Y-%m-%d %H:%M}' if expires_at else 'never expires'
+        self.stderr.write(f'Token {token.pk} for {user.username}, {expiry}. Store the key now:')
+        self.stdout.write(key)
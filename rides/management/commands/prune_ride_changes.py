@@ -0,0 +1,18 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from rides.models import RideChange
+
+
+class Command(BaseCommand):
+    help = 'Deletes change feed entries older than --days (clients further behind must resync)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=7)
+    
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(days=options['days'])
+        deleted, _ = RideChange.objects.filter(created_at__lt=cutoff).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} ride changes older than {cutoff:%Y-%m-%d %H:%M}.'))
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rides.rollups import rebuild_rollup, rollup_drift
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the ride trip timing columns and the trip duration rollup from ride_event (backfill or repair)'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only compare the rollup with the report computed from the ride timing columns; exit 1 on drift'
+        )
+    
+    def handle(self, *args, **options):
+        if options['verify']:
+            drift = rollup_drift()
+            for (month, driver_id), (rollup, actual) in sorted(drift.items()):
+                self.stdout.write(f'{month} driver {driver_id}: rollup {rollup}, actual {actual}')
+            if drift:
+                raise CommandError(f'{len(drift)} month/driver rows differ; rerun without --verify.')
+            self.stdout.write(self.style.SUCCESS('Rollup matches the ride timing columns.'))
+            return
+        
+        self.stdout.write('Rebuilding trip duration rollup...')
+        rows = rebuild_rollup(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {rows} month/driver rows.'))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rides.search import rebuild_search_index
+
+
+class Command(BaseCommand):
+    help = ('Recreates the SQLite user search index (FTS5 table and triggers) from the user table. '
+            'Run after migrations that alter User: rebuilding a table drops its triggers.')
+    
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default='default')
+    
+    def handle(self, *args, **options):
+        if not rebuild_search_index(options['database']):
+            raise CommandError('Only SQLite databases have a user_search table; PostgreSQL uses pg_trgm indexes.')
+        self.stdout.write(self.style.SUCCESS('Rebuilt the user search index.'))
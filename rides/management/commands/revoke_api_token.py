@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from rides.models import ApiToken
+
+
+class Command(BaseCommand):
+    help = 'Revokes API tokens by id, or every token of --user'
+    
+    def add_arguments(self, parser):
+        parser.add_argument('ids', nargs='*', type=int)
+        parser.add_argument('--user', help='Revoke all active tokens of this username')
+    
+    def handle(self, *args, **options):
+        if not options['ids'] and not options['user']:
+            raise CommandError('Pass token ids or --user.')
+        
+        tokens = ApiToken.objects.filter(revoked_at__isnull=True)
+        if options['ids']:
+            tokens = tokens.filter(pk__in=options['ids'])
+        if options['user']:
+            tokens = tokens.filter(user__username=options['user'])
+        
+        # One save() per token, so the signals evict each from the principal cache
+        revoked = 0
+        for token in tokens:
+            token.revoke()
+            revoked += 1
+        self.stdout.write(self.style.SUCCESS(f'Revoked {revoked} tokens.'))
@@ -0,0 +1,227 @@
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from datetime import timedelta
+from math import cos, pi, radians, sin, sqrt
+import random
+import time
+
+from rides.geo import KM_PER_DEGREE_LAT, grid_cell
+from rides.models import User, Ride, RideEvent
+from rides.response_cache import bump_versions
+from rides.rollups import DROPOFF_DESCRIPTION, PICKUP_DESCRIPTION, rebuild_rollup, trip_seconds
+
+EN_ROUTE_DESCRIPTION = 'Status changes to en-route'
+TELEMETRY_DESCRIPTION = 'Location update'
+
+
+def event(ride, description, created_at):
+    # bulk_create skips RideEvent.save(), so classify here
+    return RideEvent(
+        id_ride=ride,
+        description=description,
+        event_type=RideEvent.classify(description),
+        created_at=created_at,
+    )
+
+
+def set_ride_timing(ride, events):
+    """
+    Fill the ride's pickup_at/dropoff_at/duration_seconds from its unsaved events.
+    """
+    pickups = [e.created_at for e in events if e.event_type == RideEvent.EventType.PICKUP]
+    dropoffs = [e.created_at for e in events if e.event_type == RideEvent.EventType.DROPOFF]
+    ride.pickup_at = min(pickups, default=None)
+    ride.dropoff_at = max(dropoffs, default=None)
+    ride.duration_seconds = trip_seconds(ride.pickup_at, ride.dropoff_at)
+
+
+def parse_status_mix(value):
+    """
+    Parse 'en-route=0.1,pickup=0.2,dropoff=0.7' into ([statuses], [weights]).
+    """
+    valid = {choice for choice, _ in Ride.STATUS_CHOICES}
+    statuses, weights = [], []
+    for part in value.split(','):
+        status, _, weight = part.partition('=')
+        status = status.strip()
+        if status not in valid:
+            raise CommandError(f'Unknown status "{status}" in --status-mix')
+        try:
+            weights.append(float(weight))
+        except ValueError:
+            raise CommandError(f'Invalid weight for "{status}" in --status-mix')
+        statuses.append(status)
+    if sum(weights) <= 0:
+        raise CommandError('--status-mix weights must add up to more than 0')
+    return statuses, weights
+
+
+class Command(BaseCommand):
+    help = 'Generates a large synthetic dataset (users, rides, events) with bulk inserts for benchmarking'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--riders', type=int, default=10000)
+        parser.add_argument('--drivers', type=int, default=1000)
+        parser.add_argument('--rides', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=42, help='RNG seed, same seed = same dataset')
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--prefix', default='load', help='Username prefix, must not already be in use')
+
+        # Distributions
+        parser.add_argument('--status-mix', default='en-route=0.1,pickup=0.1,dropoff=0.8')
+        parser.add_argument('--center', default='37.7749,-122.4194', help='lat,lng of the service area')
+        parser.add_argument('--spread-km', type=float, default=25.0, help='Radius of the service area')
+        parser.add_argument('--days', type=int, default=365, help='Spread pickup times over the last N days')
+        parser.add_argument('--long-trip-fraction', type=float, default=0.05,
+                            help='Share of completed trips lasting more than 1 hour')
+        parser.add_argument('--telemetry-events', type=int, default=2,
+                            help='Average extra "Location update" events per ride')
+        parser.add_argument('--skip-rollup', action='store_true',
+                            help='Do not rebuild the trip duration rollup afterwards')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.options = options
+        self.batch_size = options['batch_size']
+        self.statuses, self.status_weights = parse_status_mix(options['status_mix'])
+        try:
+            self.center_lat, self.center_lng = (float(v) for v in options['center'].split(','))
+        except ValueError:
+            raise CommandError('--center must be "lat,lng"')
+
+        if User.objects.filter(username__startswith=f"{options['prefix']}_").exists():
+            raise CommandError(f"Users with prefix '{options['prefix']}_' already exist; pass another --prefix")
+
+        started = time.perf_counter()
+        self.now = timezone.now()
+
+        rider_ids = self.create_users('rider', options['riders'])
+        driver_ids = self.create_users('driver', options['drivers'])
+        if not rider_ids or not driver_ids:
+            raise CommandError('Need at least one rider and one driver')
+
+        rides, events = self.create_rides(rider_ids, driver_ids, options['rides'])
+        # bulk_create skips the signals that invalidate cached API responses
+        bump_versions('user', 'ride', 'ride_event')
+
+        if not options['skip_rollup']:
+            self.stdout.write('Rebuilding trip duration rollup...')
+            rebuild_rollup(chunk_size=self.batch_size)
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Seeded {len(rider_ids)} riders, {len(driver_ids)} drivers, '
+            f'{rides} rides and {events} events in {elapsed:.1f}s'
+        ))
+
+    def create_users(self, role, count):
+        """
+        Bulk insert users sharing one pre-hashed password (hashing is the slow part).
+        """
+        prefix = self.options['prefix']
+        password = make_password('password')
+
+        for start in range(0, count, self.batch_size):
+            batch = [
+                User(
+                    username=f'{prefix}_{role}{i}',
+                    email=f'{prefix}.{role}{i}@example.com',
+                    email_lower=User.normalize_email(f'{prefix}.{role}{i}@example.com'),
+                    password=password,
+                    first_name=f'{role.title()}{i}',
+                    last_name='Load',
+                    role=role,
+                )
+                for i in range(start, min(start + self.batch_size, count))
+            ]
+            with transaction.atomic():
+                User.objects.bulk_create(batch)
+
+        self.stdout.write(f'Created {count} {role}s')
+        return list(
+            User.objects.filter(username__startswith=f'{prefix}_{role}', role=role)
+            .order_by('id').values_list('id', flat=True)
+        )
+
+    def random_point(self):
+        """
+        Uniform random point within --spread-km of --center.
+        """
+        distance = self.options['spread_km'] * sqrt(self.rng.random())
+        angle = self.rng.uniform(0, 2 * pi)
+        lat = self.center_lat + distance * cos(angle) / KM_PER_DEGREE_LAT
+        lng = self.center_lng + distance * sin(angle) / (
+            KM_PER_DEGREE_LAT * cos(radians(self.center_lat))
+        )
+        return lat, lng
+
+    def trip_minutes(self):
+        if self.rng.random() < self.options['long_trip_fraction']:
+            return self.rng.uniform(61, 240)
+        return self.rng.uniform(5, 55)
+
+    def create_rides(self, rider_ids, driver_ids, count):
+        """
+        Insert rides and their events batch by batch, one transaction per batch.
+        """
+        rng = self.rng
+        window_seconds = self.options['days'] * 86400
+        total_events = 0
+
+        for start in range(0, count, self.batch_size):
+            size = min(self.batch_size, count - start)
+            rides = []
+            for _ in range(size):
+                pickup_lat, pickup_lng = self.random_point()
+                dropoff_lat, dropoff_lng = self.random_point()
+                rides.append(Ride(
+                    status=rng.choices(self.statuses, self.status_weights)[0],
+                    id_rider_id=rng.choice(rider_ids),
+                    id_driver_id=rng.choice(driver_ids),
+                    pickup_latitude=pickup_lat,
+                    pickup_longitude=pickup_lng,
+                    dropoff_latitude=dropoff_lat,
+                    dropoff_longitude=dropoff_lng,
+                    pickup_time=self.now - timedelta(seconds=rng.uniform(0, window_seconds)),
+                    # bulk_create skips Ride.save(), so fill the grid cell here
+                    pickup_cell=grid_cell(pickup_lat, pickup_lng),
+                ))
+
+            events = []
+            for ride in rides:
+                ride_events = self.ride_events(ride)
+                set_ride_timing(ride, ride_events)
+                events.extend(ride_events)
+
+            with transaction.atomic():
+                Ride.objects.bulk_create(rides)
+                RideEvent.objects.bulk_create(events, batch_size=self.batch_size)
+
+            total_events += len(events)
+            self.stdout.write(f'  {start + size}/{count} rides')
+
+        return count, total_events
+
+    def ride_events(self, ride):
+        """
+        Events matching the ride's status, timestamped around pickup_time.
+        """
+        rng = self.rng
+        pickup_at = ride.pickup_time
+        events = [event(ride, EN_ROUTE_DESCRIPTION, pickup_at - timedelta(minutes=rng.uniform(2, 20)))]
+
+        end = pickup_at
+        if ride.status in ('pickup', 'dropoff'):
+            events.append(event(ride, PICKUP_DESCRIPTION, pickup_at))
+        if ride.status == 'dropoff':
+            end = pickup_at + timedelta(minutes=self.trip_minutes())
+            events.append(event(ride, DROPOFF_DESCRIPTION, end))
+
+        # Telemetry spread between en-route and the last status change
+        start = events[0].created_at
+        span = (end - start).total_seconds()
+        for _ in range(rng.randint(0, 2 * self.options['telemetry_events'])):
+            events.append(event(ride, TELEMETRY_DESCRIPTION, start + timedelta(seconds=rng.uniform(0, span))))
+        return events
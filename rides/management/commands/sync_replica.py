@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+from django.db import connections
+import sqlite3
+
+
+class Command(BaseCommand):
+    help = ('Copies the SQLite primary into a SQLite stand-in replica (online backup). '
+            'The replica is as far behind as the time since the last run.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', action='append', dest='replicas',
+                            help='Replica alias (repeatable); default: every RIDES_READ_REPLICAS entry')
+
+    def handle(self, *args, **options):
+        replicas = options['replicas'] or settings.RIDES_READ_REPLICAS
+        if not replicas:
+            raise CommandError('No replicas configured; set DATABASE_REPLICA_URLS')
+
+        primary = connections['default']
+        if primary.vendor != 'sqlite':
+            raise CommandError('sync_replica only copies SQLite databases; use real replication elsewhere')
+
+        primary.ensure_connection()
+        for alias in replicas:
+            replica = connections[alias]
+            if alias not in settings.RIDES_READ_REPLICAS or replica.vendor != 'sqlite':
+                raise CommandError(f'{alias} is not a SQLite replica')
+            replica.close()
+            target = sqlite3.connect(replica.settings_dict['NAME'])
+            try:
+                primary.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(self.style.SUCCESS(f'Copied default into {alias}.'))
@@ -0,0 +1,110 @@
+"""
+In-process request metrics, exported in Prometheus text format.
+
+RequestStatsMiddleware feeds one observation per request into `registry`;
+`/api/metrics/` renders it. Values are per process: with several workers,
+let Prometheus scrape and sum every instance.
+"""
+import threading
+from bisect import bisect_left
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (1024, 10 * 1024, 100 * 1024, 1024 ** 2, 10 * 1024 ** 2)
+
+
+class Histogram:
+    """
+    Cumulative-bucket histogram, the shape Prometheus expects.
+    """
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def render(self, name, labels):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + ('+Inf',), self.counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_sum{{{labels}}} {self.sum}')
+        lines.append(f'{name}_count{{{labels}}} {self.count}')
+        return lines
+
+
+# name -> (help text, buckets, RequestStats attribute)
+METRICS = {
+    'rides_request_duration_seconds': ('Total request time', DURATION_BUCKETS, 'total_seconds'),
+    'rides_request_sql_seconds': ('Time spent in SQL queries', DURATION_BUCKETS, 'sql_seconds'),
+    'rides_request_serialize_seconds': ('Serializer plus renderer time', DURATION_BUCKETS, 'serialize_seconds'),
+    'rides_request_queries': ('SQL queries per request', QUERY_BUCKETS, 'queries'),
+    'rides_response_size_bytes': ('Response body size', SIZE_BUCKETS, 'response_bytes'),
+}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+        self.budget_exceeded = {}
+        self.cache_lookups = {}
+
+    def observe(self, view, stats, over_budget=False):
+        with self.lock:
+            histograms = self.views.get(view)
+            if histograms is None:
+                histograms = self.views[view] = {
+                    name: Histogram(buckets) for name, (_, buckets, _) in METRICS.items()
+                }
+            for name, (_, _, attr) in METRICS.items():
+                histograms[name].observe(getattr(stats, attr))
+            if over_budget:
+                self.budget_exceeded[view] = self.budget_exceeded.get(view, 0) + 1
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+            self.budget_exceeded = {}
+            self.cache_lookups = {}
+
+    def count_cache(self, view, result):
+        """
+        Count a response cache lookup: result is 'hit', 'miss' or 'bypass'.
+        """
+        with self.lock:
+            key = (view, result)
+            self.cache_lookups[key] = self.cache_lookups.get(key, 0) + 1
+
+    def render(self):
+        """
+        Return the Prometheus text exposition of every metric.
+        """
+        with self.lock:
+            lines = []
+            for name, (help_text, _, _) in METRICS.items():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} histogram')
+                for view in sorted(self.views):
+                    lines.extend(self.views[view][name].render(name, f'view="{view}"'))
+
+            lines.append('# HELP rides_query_budget_exceeded_total Requests over their query budget')
+            lines.append('# TYPE rides_query_budget_exceeded_total counter')
+            for view in sorted(self.budget_exceeded):
+                lines.append(f'rides_query_budget_exceeded_total{{view="{view}"}} {self.budget_exceeded[view]}')
+
+            lines.append('# HELP rides_response_cache_total Response cache lookups by result')
+            lines.append('# TYPE rides_response_cache_total counter')
+            for view, result in sorted(self.cache_lookups):
+                count = self.cache_lookups[(view, result)]
+                lines.append(f'rides_response_cache_total{{view="{view}",result="{result}"}} {count}')
+            return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,273 @@
+from contextvars import ContextVar
+import logging
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.signals import request_finished
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from rest_framework.permissions import SAFE_METHODS
+
+from .compression import compress_response
+from .metrics import registry
+from .routers import choose_replica, current_replica, is_pinned, pin_to_primary
+
+logger = logging.getLogger('rides.instrumentation')
+
+# Stats of the request being handled. A context variable rather than a
+# per-request connection.execute_wrapper: under ASGI the ORM runs in
+# sync_to_async threads with their own connections, and context variables
+# follow the request there.
+current_stats = ContextVar('rides_request_stats', default=None)
+
+
+class RequestStats:
+    """
+    Per-request counters, attached to the request as `request.request_stats`.
+    """
+    def __init__(self):
+        self.view = 'unresolved'
+        self.queries = 0
+        self.sql_seconds = 0.0
+        self.serialize_seconds = 0.0
+        self.total_seconds = 0.0
+        self.response_bytes = 0
+        self.serialize_started = None
+
+    def record_query(self, execute, sql, params, many, context):
+        """
+        connection.execute_wrapper hook: counts and times every query.
+        """
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.sql_seconds += time.perf_counter() - started
+
+    def start_serialize(self):
+        if self.serialize_started is None:
+            self.serialize_started = time.perf_counter()
+
+    def stop_serialize(self):
+        if self.serialize_started is not None:
+            self.serialize_seconds += time.perf_counter() - self.serialize_started
+            self.serialize_started = None
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats.record_query(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def on_connection_created(sender, connection, **kwargs):
+    install_query_recorder(connection)
+
+
+def get_view_name(view_func, method):
+    """
+    Label a view as 'RideViewSet.list' / 'trip_duration_report'.
+    """
+    cls = getattr(view_func, 'cls', None)
+    if cls is None:
+        return getattr(view_func, '__name__', 'unknown')
+
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        return f'{cls.__name__}.{actions.get(method.lower(), method.lower())}'
+    # @api_view functions get a generated class named after the function
+    return cls.__name__
+
+
+class RequestStatsMiddleware:
+    """
+    Records query count, SQL time, serialization time and response size for
+    every request, aggregated per view in rides.metrics.registry.
+
+    Requests issuing more queries than their RIDES_QUERY_BUDGET entry are
+    logged as likely N+1 problems. Budgets include authentication queries,
+    plus RIDES_QUERY_BUDGET_BROWSABLE for browsable API pages.
+
+    Sync and async capable, so async views under ASGI aren't pushed onto a
+    thread just for this middleware.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Connections opened before this module was imported
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+
+        stats = request.request_stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        stats.total_seconds = time.perf_counter() - started
+        return self.finish(request, response, stats)
+
+    async def __acall__(self, request):
+        stats = request.request_stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        stats.total_seconds = time.perf_counter() - started
+        return self.finish(request, response, stats)
+
+    def finish(self, request, response, stats):
+        if not response.streaming:
+            stats.response_bytes = len(response.content)
+
+        budget = self.get_budget(stats.view, response)
+        over_budget = budget is not None and stats.queries > budget
+        if over_budget:
+            logger.warning(
+                'Possible N+1: %s %s ran %d queries (budget %d)',
+                request.method, request.path, stats.queries, budget
+            )
+
+        registry.observe(stats.view, stats, over_budget=over_budget)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.request_stats.view = get_view_name(view_func, request.method)
+
+    def process_template_response(self, request, response):
+        # DRF responses render after this hook; time the renderer as serialization
+        stats = request.request_stats
+        stats.start_serialize()
+        response.add_post_render_callback(lambda rendered: stats.stop_serialize())
+        return response
+
+    @staticmethod
+    def get_budget(view, response=None):
+        budgets = getattr(settings, 'RIDES_QUERY_BUDGET', {})
+        budget = budgets.get(view, budgets.get('default'))
+        # BrowsableAPIRenderer's format; its forms add a fixed number of queries
+        if budget is not None and getattr(getattr(response, 'accepted_renderer', None), 'format', None) == 'api':
+            budget += getattr(settings, 'RIDES_QUERY_BUDGET_BROWSABLE', {}).get(view, 0)
+        return budget
+
+
+class ReplicaMiddleware:
+    """
+    Sends reads of the RIDES_REPLICA_VIEWS to a read replica (see routers.py)
+    and pins clients to the primary for a few seconds after they write.
+
+    The replica choice stays in effect until the response is closed, so
+    streamed exports read from the replica too.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        current_replica.set(None)
+        return self.finish(request, self.get_response(request))
+    
+    async def __acall__(self, request):
+        current_replica.set(None)
+        return self.finish(request, await self.get_response(request))
+    
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request)
+        return response
+    
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if request.method not in SAFE_METHODS:
+            return
+        if get_view_name(view_func, request.method) not in getattr(settings, 'RIDES_REPLICA_VIEWS', ()):
+            return
+        if is_pinned(request):
+            return
+        # least_lag's probes are routing overhead, not the view's queries:
+        # keep them out of request_stats and RIDES_QUERY_BUDGET
+        token = current_stats.set(None)
+        try:
+            replica = choose_replica()
+        finally:
+            current_stats.reset(token)
+        current_replica.set(replica)
+
+
+class CompressionMiddleware:
+    """
+    Compresses API responses in the best Content-Encoding the client accepts
+    (gzip, br, zstd; see compression.py), streamed exports included.
+
+    Sits inside RequestStatsMiddleware, so response sizes in /api/metrics/ are
+    bytes on the wire. Responses the response cache already encoded pass through.
+    """
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return compress_response(request, self.get_response(request))
+    
+    async def __acall__(self, request):
+        return compress_response(request, await self.get_response(request))
+
+
+@receiver(request_finished)
+def reset_replica(sender, **kwargs):
+    current_replica.set(None)
+
+
+class SerializerTimingMixin:
+    """
+    ViewSet mixin adding serializer time (to_representation) to request stats.
+
+    Timing starts when the view builds its serializer and stops when the
+    response is finalized, so it covers `serializer.data` for list and detail.
+    """
+    def get_serializer(self, *args, **kwargs):
+        stats = getattr(self.request, 'request_stats', None)
+        if stats is not None:
+            stats.start_serialize()
+        return super().get_serializer(*args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        stats = getattr(request, 'request_stats', None)
+        if stats is not None:
+            stats.stop_serialize()
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -0,0 +1,34 @@
+# Generated by Django 6.0.1 on 2026-10-17 10:05
+
+from django.db import migrations, models
+
+from rides.geo import grid_cell
+
+
+def backfill_pickup_cell(apps, schema_editor):
+    Ride = apps.get_model('rides', 'Ride')
+    batch = []
+    for ride in Ride.objects.only('pickup_latitude', 'pickup_longitude').iterator(chunk_size=2000):
+        ride.pickup_cell = grid_cell(ride.pickup_latitude, ride.pickup_longitude)
+        batch.append(ride)
+        if len(batch) >= 2000:
+            Ride.objects.bulk_update(batch, ['pickup_cell'])
+            batch = []
+    if batch:
+        Ride.objects.bulk_update(batch, ['pickup_cell'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0002_ride_pickup_time_id_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='pickup_cell',
+            field=models.IntegerField(db_index=True, editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_pickup_cell, migrations.RunPython.noop),
+    ]
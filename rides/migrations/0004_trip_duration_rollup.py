@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 11:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0003_ride_pickup_cell'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TripDurationRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=7)),
+                ('trip_count', models.IntegerField(default=0)),
+                ('id_driver', models.ForeignKey(db_column='id_driver', on_delete=django.db.models.deletion.CASCADE, related_name='trip_duration_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'db_table': 'trip_duration_rollup',
+                'ordering': ['month'],
+                'constraints': [models.UniqueConstraint(fields=('month', 'id_driver'), name='trip_duration_rollup_month_driver_uniq')],
+            },
+        ),
+    ]
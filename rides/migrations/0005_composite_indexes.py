@@ -0,0 +1,29 @@
+# Generated by Django 6.0.1 on 2026-10-17 12:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0004_trip_duration_rollup'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['status', 'pickup_time'], name='ride_status_pickup_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rideevent',
+            index=models.Index(fields=['id_ride', 'created_at'], name='ride_event_ride_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rideevent',
+            index=models.Index(fields=['created_at'], name='ride_event_created_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='rideevent',
+            index=models.Index(fields=['description', 'id_ride', 'created_at'], name='ride_event_desc_ride_time_idx'),
+        ),
+    ]
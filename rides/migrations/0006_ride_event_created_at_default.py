@@ -0,0 +1,19 @@
+# Generated by Django 6.0.1 on 2026-10-17 13:10
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0005_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='rideevent',
+            name='created_at',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:20
+
+import django.utils.timezone
+from django.db import migrations, models
+from django.db.models import Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce, Greatest
+
+
+def backfill_updated_at(apps, schema_editor):
+    # Best known modification time: the latest event, or pickup_time without events
+    Ride = apps.get_model('rides', 'Ride')
+    RideEvent = apps.get_model('rides', 'RideEvent')
+    latest_event = RideEvent.objects.filter(
+        id_ride=OuterRef('pk')
+    ).order_by().values('id_ride').annotate(latest=Max('created_at')).values('latest')
+    Ride.objects.update(
+        updated_at=Greatest('pickup_time', Coalesce(Subquery(latest_event), 'pickup_time'))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0006_ride_event_created_at_default'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ride',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(backfill_updated_at, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:05
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0007_ride_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideChange',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('ride_status', 'Ride status'), ('ride_event', 'Ride event')], max_length=20)),
+                ('id_ride', models.BigIntegerField()),
+                ('payload', models.JSONField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'ride_change',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,100 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:05
+
+from django.db import migrations, models
+from django.db.models import Case, Max, Min, Q, When
+
+# Frozen copy of RideEvent.DESCRIPTION_TYPES at the time of this migration
+EVENT_TYPES = {
+    1: ['Status changes to en-route', 'Status change to en-route'],
+    2: ['Status changes to pickup', 'Status change to pickup'],
+    3: ['Status changes to dropoff', 'Status change to dropoff'],
+}
+
+
+def classify_events(apps, schema_editor):
+    RideEvent = apps.get_model('rides', 'RideEvent')
+    RideEvent.objects.update(event_type=Case(
+        *[
+            When(Q(description__iexact=description), then=event_type)
+            for event_type, descriptions in EVENT_TYPES.items()
+            for description in descriptions
+        ],
+        default=0,
+    ))
+
+
+def backfill_ride_timing(apps, schema_editor):
+    # First pickup, last dropoff and whole seconds between them (see rollups.py)
+    Ride = apps.get_model('rides', 'Ride')
+    RideEvent = apps.get_model('rides', 'RideEvent')
+    connection = schema_editor.connection
+    fields = [Ride._meta.get_field(name) for name in ('pickup_at', 'dropoff_at', 'duration_seconds')]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(Ride._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(Ride._meta.pk.column),
+    )
+
+    rows = RideEvent.objects.filter(event_type__in=[2, 3]).values('id_ride').annotate(
+        first_pickup=Min('created_at', filter=Q(event_type=2)),
+        last_dropoff=Max('created_at', filter=Q(event_type=3)),
+    ).order_by()
+
+    params = []
+    for row in rows.iterator(chunk_size=5000):
+        pickup_at, dropoff_at = row['first_pickup'], row['last_dropoff']
+        duration = None
+        if pickup_at is not None and dropoff_at is not None:
+            duration = int(dropoff_at.timestamp()) - int(pickup_at.timestamp())
+        params.append([
+            field.get_db_prep_save(value, connection)
+            for field, value in zip(fields, (pickup_at, dropoff_at, duration))
+        ] + [row['id_ride']])
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0008_ride_change'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='rideevent',
+            name='ride_event_desc_ride_time_idx',
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='dropoff_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='duration_seconds',
+            field=models.IntegerField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='ride',
+            name='pickup_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='rideevent',
+            name='event_type',
+            field=models.PositiveSmallIntegerField(choices=[(0, 'Other'), (1, 'Status change to en-route'), (2, 'Status change to pickup'), (3, 'Status change to dropoff')], default=0, editable=False),
+        ),
+        migrations.RunPython(classify_events, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='rideevent',
+            index=models.Index(fields=['event_type', 'id_ride', 'created_at'], name='ride_event_type_ride_time_idx'),
+        ),
+        migrations.RunPython(backfill_ride_timing, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='ride',
+            index=models.Index(fields=['duration_seconds', 'pickup_at', 'id_driver'], name='ride_duration_idx'),
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Generated by Django 6.0.1 on 2026-10-17 15:10
+
+from django.db import migrations, models
+from django.db.models.functions import Lower, Trim
+
+# SQLite: FTS5 trigram index over the user table's searchable columns (search.py).
+# External content (no copy of the rows); the triggers keep it in sync with every
+# write to "user", including bulk_create, QuerySet.update and raw SQL.
+SQLITE_SEARCH_INDEX = [
+    '''CREATE VIRTUAL TABLE user_search USING fts5(
+        email, first_name, last_name, content="user", content_rowid="id", tokenize="trigram"
+    )''',
+    '''CREATE TRIGGER user_search_insert AFTER INSERT ON "user" BEGIN
+        INSERT INTO user_search (rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END''',
+    '''CREATE TRIGGER user_search_delete AFTER DELETE ON "user" BEGIN
+        INSERT INTO user_search (user_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+    END''',
+    '''CREATE TRIGGER user_search_update AFTER UPDATE OF email, first_name, last_name ON "user" BEGIN
+        INSERT INTO user_search (user_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+        INSERT INTO user_search (rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END''',
+    "INSERT INTO user_search (user_search) VALUES ('rebuild')",
+]
+SQLITE_DROP_SEARCH_INDEX = [
+    'DROP TRIGGER IF EXISTS user_search_insert',
+    'DROP TRIGGER IF EXISTS user_search_delete',
+    'DROP TRIGGER IF EXISTS user_search_update',
+    'DROP TABLE IF EXISTS user_search',
+]
+
+# PostgreSQL: trigram GIN indexes matching icontains (UPPER(col) LIKE UPPER(%s))
+POSTGRESQL_SEARCH_INDEX = [
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+    *[
+        f'CREATE INDEX IF NOT EXISTS user_{column}_trgm_idx ON "user" USING gin (UPPER("{column}") gin_trgm_ops)'
+        for column in ('email', 'first_name', 'last_name')
+    ],
+]
+POSTGRESQL_DROP_SEARCH_INDEX = [
+    f'DROP INDEX IF EXISTS user_{column}_trgm_idx' for column in ('email', 'first_name', 'last_name')
+]
+
+
+def backfill_email_lower(apps, schema_editor):
+    User = apps.get_model('rides', 'User')
+    User.objects.update(email_lower=Lower(Trim('email')))
+
+
+def run_for_vendor(statements):
+    def run(apps, schema_editor):
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('rides', '0010_api_token'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='email_lower',
+            field=models.CharField(blank=True, default='', editable=False, max_length=254),
+        ),
+        migrations.RunPython(backfill_email_lower, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='user',
+            index=models.Index(fields=['email_lower'], name='user_email_lower_idx'),
+        ),
+        migrations.RunPython(
+            run_for_vendor({'sqlite': SQLITE_SEARCH_INDEX, 'postgresql': POSTGRESQL_SEARCH_INDEX}),
+            run_for_vendor({'sqlite': SQLITE_DROP_SEARCH_INDEX, 'postgresql': POSTGRESQL_DROP_SEARCH_INDEX}),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 6.0.1 on 2026-10-17 16:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rides', '0011_user_email_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RideEventArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.CharField(max_length=7, unique=True)),
+                ('table_name', models.CharField(max_length=63)),
+                ('row_count', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'db_table': 'ride_event_archive',
+                'ordering': ['month'],
+            },
+        ),
+    ]
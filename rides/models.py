@@ -2,6 +2,11 @@ from django.db import models
 
 from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.utils import timezone
+import hashlib
+import secrets
+
+from .geo import grid_cell
 
 class User(AbstractUser):
     """
@@ -15,12 +20,32 @@ class User(AbstractUser):
     
     role = models.CharField(max_length=20, choices=ROLE_CHOICES, default='rider')
     phone_number = models.CharField(max_length=20, blank=True, null=True)
+    # Lowercased email for indexed exact/prefix search (see search.py); set in save(),
+    # bulk_create callers use normalize_email()
+    email_lower = models.CharField(max_length=254, blank=True, default='', editable=False)
     
     class Meta:
         db_table = 'user'
+        indexes = [
+            # ?rider_email= / ?driver_email= exact and prefix lookups
+            models.Index(fields=['email_lower'], name='user_email_lower_idx'),
+        ]
     
     def __str__(self):
         return f"{self.first_name} {self.last_name} ({self.email})"
+    
+    @staticmethod
+    def normalize_email(email):
+        return (email or '').strip().lower()
+    
+    def save(self, *args, **kwargs):
+        self.email_lower = self.normalize_email(self.email)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'email' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'email_lower'}
+        
+        super().save(*args, **kwargs)
 
 class Ride(models.Model):
     """
@@ -57,17 +82,69 @@ class Ride(models.Model):
     dropoff_longitude = models.FloatField()
     pickup_time = models.DateTimeField()
     
+    # Precomputed grid cell of the pickup point (see geo.py), kept in sync in save().
+    # Indexed so radius searches can prune by cell before computing distances.
+    pickup_cell = models.IntegerField(null=True, editable=False, db_index=True)
+    
+    # Like Laravel's updated_at; also bumped when the ride's events change
+    # (see signals.py). Drives Last-Modified and the ?updated_since= filter.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    
+    # Denormalized from the ride's events on every pickup/dropoff event write
+    # (see rollups.py): first pickup, last dropoff and the whole seconds between.
+    # The trip duration report reads these instead of self-joining ride_event.
+    pickup_at = models.DateTimeField(null=True, editable=False)
+    dropoff_at = models.DateTimeField(null=True, editable=False)
+    duration_seconds = models.IntegerField(null=True, editable=False)
+    
     class Meta:
         db_table = 'ride'
         ordering = ['-pickup_time']  # Default ordering, like Laravel's $orderBy
+        indexes = [
+            # Keyset pagination seeks on (pickup_time, id) - see pagination.py
+            models.Index(fields=['pickup_time', 'id'], name='ride_pickup_time_id_idx'),
+            # ?status= filter combined with the default pickup_time ordering
+            models.Index(fields=['status', 'pickup_time'], name='ride_status_pickup_time_idx'),
+            # Long trips: range scan on duration, covering the report's month and driver
+            models.Index(fields=['duration_seconds', 'pickup_at', 'id_driver'], name='ride_duration_idx'),
+        ]
     
     def __str__(self):
         return f"Ride {self.pk}: {self.id_rider} -> {self.status}"
+    
+    def save(self, *args, **kwargs):
+        self.pickup_cell = grid_cell(self.pickup_latitude, self.pickup_longitude)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            extra = {'updated_at'}
+            if {'pickup_latitude', 'pickup_longitude'} & set(update_fields):
+                extra.add('pickup_cell')
+            kwargs['update_fields'] = set(update_fields) | extra
+        
+        super().save(*args, **kwargs)
 
 class RideEvent(models.Model):
     """
     RideEvent model - represents events that occur during a ride.
     """
+    class EventType(models.IntegerChoices):
+        OTHER = 0, 'Other'
+        EN_ROUTE = 1, 'Status change to en-route'
+        PICKUP = 2, 'Status change to pickup'
+        DROPOFF = 3, 'Status change to dropoff'
+    
+    # Known status change descriptions, lowercased. Clients send both
+    # "Status changes to ..." and "Status change to ...".
+    DESCRIPTION_TYPES = {
+        'status changes to en-route': EventType.EN_ROUTE,
+        'status change to en-route': EventType.EN_ROUTE,
+        'status changes to pickup': EventType.PICKUP,
+        'status change to pickup': EventType.PICKUP,
+        'status changes to dropoff': EventType.DROPOFF,
+        'status change to dropoff': EventType.DROPOFF,
+    }
+    
     id_ride = models.ForeignKey(
         Ride,
         on_delete=models.CASCADE,
@@ -75,11 +152,155 @@ class RideEvent(models.Model):
         db_column='id_ride'
     )
     description = models.CharField(max_length=255)
-    created_at = models.DateTimeField(auto_now_add=True)
+    # Classified from description in save(); bulk_create callers use classify()
+    event_type = models.PositiveSmallIntegerField(
+        choices=EventType.choices, default=EventType.OTHER, editable=False
+    )
+    # default (not auto_now_add) so seeders and bulk_create can set explicit timestamps
+    created_at = models.DateTimeField(default=timezone.now)
     
     class Meta:
         db_table = 'ride_event'
         ordering = ['-created_at']
+        indexes = [
+            # todays_events Prefetch: WHERE id_ride IN (...) AND created_at >= now-24h
+            models.Index(fields=['id_ride', 'created_at'], name='ride_event_ride_created_idx'),
+            # Default ordering of the /api/ride-events/ list
+            models.Index(fields=['created_at'], name='ride_event_created_at_idx'),
+            # Pickup/dropoff lookups by type (ride timing rebuild)
+            models.Index(fields=['event_type', 'id_ride', 'created_at'], name='ride_event_type_ride_time_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Event for Ride {self.id_ride_id}: {self.description}"
+    
+    @classmethod
+    def classify(cls, description):
+        return cls.DESCRIPTION_TYPES.get(description.strip().lower(), cls.EventType.OTHER)
+    
+    def save(self, *args, **kwargs):
+        self.event_type = self.classify(self.description)
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'description' in update_fields:
+            kwargs['update_fields'] = set(update_fields) | {'event_type'}
+        
+        super().save(*args, **kwargs)
+
+
+class TripDurationRollup(models.Model):
+    """
+    Materialized trip duration report: trips > 1 hour per (month, driver).
+
+    Maintained incrementally by the RideEvent signals in signals.py;
+    rebuild with `manage.py rebuild_trip_duration_rollup`.
+    """
+    month = models.CharField(max_length=7)  # 'YYYY-MM' of the pickup event
+    id_driver = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='trip_duration_rollups',
+        db_column='id_driver'
+    )
+    trip_count = models.IntegerField(default=0)
+    
+    class Meta:
+        db_table = 'trip_duration_rollup'
+        ordering = ['month']
+        constraints = [
+            models.UniqueConstraint(fields=['month', 'id_driver'], name='trip_duration_rollup_month_driver_uniq'),
+        ]
     
     def __str__(self):
-        return f"Event for Ride {self.id_ride_id}: {self.description}"
\ No newline at end of file
+        return f"{self.month} driver {self.id_driver_id}: {self.trip_count} trips"
+
+
+class RideChange(models.Model):
+    """
+    Append-only change log behind the ride change feed (see changes.py).
+
+    The auto-increment id is the feed's sequence number: clients resume from
+    the last id they saw. id_ride is a plain column, not a FK, so the log
+    outlives deleted rides.
+    """
+    KIND_CHOICES = [
+        ('ride_status', 'Ride status'),
+        ('ride_event', 'Ride event'),
+    ]
+    
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    id_ride = models.BigIntegerField()
+    payload = models.JSONField()
+    created_at = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'ride_change'
+        ordering = ['id']
+    
+    def __str__(self):
+        return f"Change {self.pk}: {self.kind} for Ride {self.id_ride}"
+
+
+class RideEventArchive(models.Model):
+    """
+    One monthly partition of archived (cold) ride events (see archive.py).
+    
+    The rows live in their own table, `ride_event_YYYY_MM`, with the same
+    columns as ride_event; this registry lists the partitions so queries
+    only touch the months they need.
+    """
+    month = models.CharField(max_length=7, unique=True)  # 'YYYY-MM' of created_at (UTC)
+    table_name = models.CharField(max_length=63)
+    row_count = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        db_table = 'ride_event_archive'
+        ordering = ['month']
+    
+    def __str__(self):
+        return f"{self.table_name}: {self.row_count} events"
+
+
+class ApiToken(models.Model):
+    """
+    API token for service clients: `Authorization: Token <key>` (see authentication.py).
+    
+    Like a Sanctum personal access token: only the SHA-256 of the key is
+    stored, the key itself is shown once by ApiToken.issue(). Tokens expire
+    at expires_at (if set) and stop working as soon as revoked_at is set.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='api_tokens')
+    name = models.CharField(max_length=100, blank=True)
+    key_hash = models.CharField(max_length=64, unique=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    expires_at = models.DateTimeField(null=True, blank=True)
+    revoked_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'api_token'
+    
+    def __str__(self):
+        return f"Token {self.pk} ({self.name or 'unnamed'}) for {self.user_id}"
+    
+    @staticmethod
+    def hash_key(key):
+        # Keys are 256 random bits, so a fast unsalted hash is enough (no PBKDF2)
+        return hashlib.sha256(key.encode()).hexdigest()
+    
+    @classmethod
+    def issue(cls, user, name='', expires_at=None):
+        """
+        Create a token for `user`; returns (token, key). The key can't be recovered later.
+        """
+        key = secrets.token_urlsafe(32)
+        token = cls.objects.create(user=user, name=name, key_hash=cls.hash_key(key), expires_at=expires_at)
+        return token, key
+    
+    def revoke(self):
+        self.revoked_at = timezone.now()
+        self.save(update_fields=['revoked_at'])
+    
+    def is_active(self, now=None):
+        now = now or timezone.now()
+        return self.revoked_at is None and (self.expires_at is None or self.expires_at > now)
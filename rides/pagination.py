@@ -0,0 +1,214 @@
+import json
+from base64 import b64decode, b64encode
+from collections import OrderedDict
+
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RideKeysetPagination(BasePagination):
+    """
+    Keyset (a.k.a. seek) pagination on (pickup_time, id).
+
+    Instead of `OFFSET n` + `COUNT(*)`, each page remembers the last row it
+    returned and the next page starts with `WHERE (pickup_time, id) < (...)`.
+    With an index on (pickup_time, id) every page costs the same, no matter
+    how deep the client has paged.
+
+    Laravel equivalent: ->cursorPaginate() instead of ->paginate().
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = None
+    invalid_cursor_message = 'Invalid cursor'
+
+    # Only the default ordering field is supported; `id` is always added
+    # as a tiebreaker so rides sharing a pickup_time are never skipped.
+    ordering_field = 'pickup_time'
+
+    def __init__(self, page_size=None):
+        self.page_size = page_size
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.set_page(list(self.get_page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        # Async views (async_views.py): same queries, fetched without blocking
+        return self.set_page([row async for row in self.get_page_queryset(queryset, request)])
+
+    def get_page_queryset(self, queryset, request):
+        """
+        Return the unevaluated queryset for the requested page (plus one row).
+        """
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.descending = self.get_descending(queryset)
+        self.position, self.reverse = self.decode_cursor(request)
+
+        # Walking backwards flips the sort order; results are re-flipped below
+        descending = self.descending != self.reverse
+        sign = '-' if descending else ''
+        queryset = queryset.order_by(f'{sign}{self.ordering_field}', f'{sign}id')
+
+        if self.position is not None:
+            queryset = queryset.filter(self.get_seek_filter(descending, *self.position))
+
+        # Fetch one extra row to know whether another page exists (no COUNT)
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+
+        if self.reverse:
+            self.page.reverse()
+            self.has_next = self.position is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.position is not None
+
+        return self.page
+
+    def get_descending(self, queryset):
+        """
+        Read the direction from the ordering already applied by OrderingFilter.
+        """
+        ordering = queryset.query.order_by or queryset.model._meta.ordering
+        first = ordering[0] if ordering else f'-{self.ordering_field}'
+        if not isinstance(first, str) or first.lstrip('-') != self.ordering_field:
+            raise ValidationError({
+                self.cursor_query_param: f'Cursor pagination requires ordering by {self.ordering_field}.'
+            })
+        return first.startswith('-')
+
+    def get_seek_filter(self, descending, value, pk):
+        """
+        Build the row-value comparison (value, pk) < / > (current, pk).
+
+        The redundant `lte`/`gte` bound lets the database seek straight into
+        the (pickup_time, id) index instead of scanning from the start.
+        """
+        op = 'lt' if descending else 'gt'
+        bound = 'lte' if descending else 'gte'
+        field = self.ordering_field
+        return Q(**{f'{field}__{bound}': value}) & (
+            Q(**{f'{field}__{op}': value}) | Q(**{field: value, f'id__{op}': pk})
+        )
+
+    def decode_cursor(self, request):
+        """
+        Return ((pickup_time, id) or None, reverse) from the ?cursor= param.
+
+        An empty `?cursor=` opts into keyset mode starting at the first page.
+        """
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+
+        try:
+            data = json.loads(b64decode(encoded.encode('ascii')).decode('utf-8'))
+            value = parse_datetime(data['p'])
+            pk = int(data['i'])
+            reverse = bool(data.get('r', False))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        if value is None:
+            raise NotFound(self.invalid_cursor_message)
+        return (value, pk), reverse
+
+    def encode_cursor(self, ride, reverse):
+        # Rides may be model instances or .values() rows (FastRideSerializer)
+        if isinstance(ride, dict):
+            value, pk = ride[self.ordering_field], ride['id']
+        else:
+            value, pk = getattr(ride, self.ordering_field), ride.pk
+        data = {'p': value.isoformat(), 'i': pk}
+        if reverse:
+            data['r'] = True
+        encoded = b64encode(json.dumps(data, separators=(',', ':')).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            # Past the end: step back to the very first page
+            return replace_query_param(self.base_url, self.cursor_query_param, '')
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class RidePagination(PageNumberPagination):
+    """
+    Page-number pagination by default (?page=2), keyset pagination on request.
+
+    Passing `?cursor=` (empty for the first page) switches to
+    RideKeysetPagination, which skips the COUNT(*) query and the OFFSET scan.
+    """
+    keyset_class = RideKeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class(page_size=self.get_page_size(request))
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() for async views, using acount() and async iteration.
+        """
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class(page_size=self.get_page_size(request))
+            return await self.keyset.apaginate_queryset(queryset, request, view)
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        # Fill Paginator.count (a cached_property) so it never runs a sync COUNT
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            self.page = paginator.page(page_number)
+        except InvalidPage as exc:
+            raise NotFound(self.invalid_page_message.format(page_number=page_number, message=str(exc)))
+
+        self.page.object_list = [row async for row in self.page.object_list]
+        self.request = request
+        return list(self.page)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
@@ -0,0 +1,102 @@
+import json
+import re
+
+from django.conf import settings
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Floats orjson writes differently from json.dumps: exponents (1e16 vs 1e+16) and
+# small decimals (0.00001 vs 1e-05). Also matches some strings, which then just take
+# the json.dumps path. Kept to literal-led checks: a leading \d makes re 10x slower.
+ORJSON_EXPONENT = re.compile(rb'e[-0-9]')
+ORJSON_SMALL_DECIMAL = b'0.0000'
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    DRF's JSONRenderer on orjson (RIDES_JSON_RENDERER = 'orjson'), same bytes out.
+
+    orjson leaves datetimes, Decimals and other non-JSON types to DRF's
+    encoder, so they format exactly as before. Output that may hold a float
+    orjson formats differently, non-string keys, integers over 64 bits and
+    indented (browsable API) output go through json.dumps instead.
+    NaN/Infinity render as null instead of failing like strict json.dumps.
+    """
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (
+            orjson is None
+            or settings.RIDES_JSON_RENDERER != 'orjson'
+            or data is None
+            or not self.compact
+            or self.ensure_ascii
+            or self.get_indent(accepted_media_type, renderer_context or {}) is not None
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        try:
+            ret = orjson.dumps(
+                data, default=self.encoder_class().default, option=orjson.OPT_PASSTHROUGH_DATETIME
+            )
+        except orjson.JSONEncodeError:
+            return super().render(data, accepted_media_type, renderer_context)
+        if ORJSON_SMALL_DECIMAL in ret or ORJSON_EXPONENT.search(ret):
+            return super().render(data, accepted_media_type, renderer_context)
+        # Like JSONRenderer: escape the two line terminators JavaScript strings can't contain
+        if b'\xe2\x80' in ret:  # one scan for both (and other U+20xx characters)
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    MessagePack (`Accept: application/msgpack` or ?format=msgpack), needs the msgpack package.
+
+    Same values as the JSON body: datetimes and Decimals are converted by
+    DRF's encoder, floats stay 64-bit.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=JSONEncoder().default)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Newline-delimited JSON (one object per line).
+
+    The export actions stream their rows themselves; this renderer is what
+    content negotiation picks for ?format=ndjson and what error responses
+    (403, 400) on those actions are rendered with.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        rows = data if isinstance(data, list) else [data]
+        return ''.join(json.dumps(row) + '\n' for row in rows).encode(self.charset)
+
+
+class CSVRenderer(NDJSONRenderer):
+    """
+    CSV export format (?format=csv). Error responses fall back to JSON lines.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
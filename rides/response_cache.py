@@ -0,0 +1,220 @@
+"""
+Versioned response cache and HTTP validators for the ride list and detail.
+
+Like Laravel's Cache::tags(): every entry key embeds the current version of
+the tables the response was built from. Saving or deleting a Ride, RideEvent
+or User bumps its table's version (see signals.py), so older entries are
+never looked up again and simply age out through the backend's eviction.
+
+The backend is the Django cache named by RIDES_RESPONSE_CACHE_ALIAS
+(LocMemCache with LRU eviction, FileBasedCache or RedisCache, see settings).
+Versions live in the same backend, so invalidation reaches every worker that
+shares it; a per-process LocMemCache only invalidates its own worker and the
+cache TIMEOUT bounds staleness elsewhere (and for the 24h events window).
+
+Writes that skip model signals (bulk_create, QuerySet.update, raw SQL) must
+call bump_versions() themselves.
+
+Entries also hold the body compressed in each Content-Encoding clients have
+asked for (compression.py), so repeated hits skip recompression.
+"""
+from functools import wraps
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import parse_http_date_safe, quote_etag
+
+from .compression import compress, response_encoding, set_encoded_body
+from .metrics import registry
+from .routers import current_replica
+
+VERSION_KEY = 'rides:version:{}'
+# v2: entries gained their compressed bodies
+RESPONSE_KEY = 'rides:response:v2:{}'
+
+
+def get_cache():
+    """
+    Return the configured response cache, or None when caching is disabled.
+    """
+    alias = getattr(settings, 'RIDES_RESPONSE_CACHE_ALIAS', None)
+    return caches[alias] if alias else None
+
+
+def get_versions(cache, tables):
+    """
+    Current version of each table, initializing missing counters.
+
+    Counters start from the clock rather than 0 so an evicted counter can't
+    come back at an old value and resurrect stale entries.
+    """
+    keys = [VERSION_KEY.format(table) for table in tables]
+    versions = cache.get_many(keys)
+    for key in keys:
+        if key not in versions:
+            cache.add(key, time.time_ns(), timeout=None)
+            versions[key] = cache.get(key)
+    return [versions[key] for key in keys]
+
+
+def bump_versions(*tables):
+    """
+    Invalidate every cached response built from these tables.
+
+    Bumps now and again on commit: the second bump drops entries another
+    request cached from pre-commit data while the transaction was open.
+    """
+    cache = get_cache()
+    if cache is None:
+        return
+
+    def bump():
+        for table in tables:
+            key = VERSION_KEY.format(table)
+            try:
+                cache.incr(key)
+            except ValueError:
+                cache.set(key, time.time_ns(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def response_key(request, tables, versions):
+    """
+    Cache key from the normalized request: params sorted by name, plus the
+    host (pagination links are absolute) and the negotiated renderer.
+
+    Responses read from a replica (routers.py) are keyed by its alias: one
+    built from a lagging replica must not be served to a client pinned to
+    the primary after a write.
+    """
+    params = sorted((name, request.query_params.getlist(name)) for name in request.query_params)
+    raw = repr((
+        request.scheme, request.get_host(), request.path, params,
+        request.accepted_renderer.format, list(zip(tables, versions)),
+        current_replica.get(),
+    ))
+    return RESPONSE_KEY.format(hashlib.md5(raw.encode(), usedforsecurity=False).hexdigest())
+
+
+def conditional_response(request, response, use_last_modified=True):
+    """
+    Return a 304 when the client's If-None-Match/If-Modified-Since still match.
+    """
+    last_modified = response.get('Last-Modified') if use_last_modified else None
+    conditional = get_conditional_response(
+        request,
+        etag=response['ETag'],
+        last_modified=parse_http_date_safe(last_modified) if last_modified else None,
+        response=response,
+    )
+    # The 304 is a new response that only keeps the validator headers
+    if conditional is not response and response.has_header('X-Cache'):
+        conditional['X-Cache'] = response['X-Cache']
+    return conditional
+
+
+def add_etag(response):
+    response['ETag'] = quote_etag(hashlib.md5(response.content, usedforsecurity=False).hexdigest())
+    return response
+
+
+def entry_response(entry, cache_status):
+    content, content_type, etag, last_modified, _ = entry
+    response = HttpResponse(content, content_type=content_type)
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = last_modified
+    response['X-Cache'] = cache_status
+    return response
+
+
+def encode_entry(request, response, entry):
+    """
+    Send a cached 200 in the client's Content-Encoding, compressing at most once per entry.
+
+    Returns (response, whether `entry` gained an encoding and needs storing).
+    A body that doesn't shrink is remembered too, and sent as is.
+    """
+    encoding = response_encoding(request, response)
+    if encoding is None:
+        return response, False
+    content, encoded = entry[0], entry[4]
+    added = encoding not in encoded
+    if added:
+        encoded[encoding] = compress(content, encoding)
+    if len(encoded[encoding]) < len(content):
+        response = set_encoded_body(response, encoded[encoding], encoding)
+    return response, added
+
+
+def versioned_cache(*tables, use_last_modified=True):
+    """
+    Cache a ViewSet GET handler's 200 responses, keyed on `tables` versions.
+
+    Runs after authentication and permission checks. Every 200 gets an ETag
+    (hash of the body) and keeps the Last-Modified header the handler set;
+    matching If-None-Match / If-Modified-Since answer 304, on hits and misses
+    alike. use_last_modified=False sends Last-Modified without evaluating
+    If-Modified-Since against it, for responses where it is only a hint.
+
+    `Cache-Control: no-cache` skips the lookup (the fresh response is still
+    stored). Lookups are counted in rides_response_cache_total. Validators
+    still work when the cache itself is disabled.
+    """
+    def decorator(handler):
+        @wraps(handler)
+        def wrapper(view, request, *args, **kwargs):
+            if request.method != 'GET':
+                return handler(view, request, *args, **kwargs)
+
+            cache = get_cache()
+            cache_status = 'BYPASS'
+            if cache is not None:
+                view_name = f'{type(view).__name__}.{view.action}'
+                key = response_key(request, tables, get_versions(cache, tables))
+                if 'no-cache' in request.headers.get('Cache-Control', ''):
+                    registry.count_cache(view_name, 'bypass')
+                else:
+                    entry = cache.get(key)
+                    if entry is not None:
+                        registry.count_cache(view_name, 'hit')
+                        response = conditional_response(request, entry_response(entry, 'HIT'), use_last_modified)
+                        if response.status_code != 200:
+                            return response
+                        response, added = encode_entry(request, response, entry)
+                        if added:
+                            cache.set(key, entry)
+                        return response
+                    registry.count_cache(view_name, 'miss')
+                    cache_status = 'MISS'
+
+            response = handler(view, request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+
+            def finalize(rendered):
+                add_etag(rendered)
+                if cache is None:
+                    return conditional_response(request, rendered, use_last_modified)
+                rendered['X-Cache'] = cache_status
+                entry = (
+                    rendered.content, rendered['Content-Type'],
+                    rendered['ETag'], rendered.get('Last-Modified'), {},
+                )
+                response = conditional_response(request, rendered, use_last_modified)
+                if response.status_code == 200:
+                    response, _ = encode_entry(request, response, entry)
+                cache.set(key, entry)
+                return response
+
+            response.add_post_render_callback(finalize)
+            return response
+        return wrapper
+    return decorator
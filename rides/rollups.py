@@ -0,0 +1,253 @@
+"""
+Incrementally maintained rollup behind the trip duration report.
+
+The report counts trips longer than an hour per (month, driver). A trip is a
+ride's first pickup event to its last dropoff event; both times and the
+whole seconds between them are denormalized onto `ride` (pickup_at,
+dropoff_at, duration_seconds) whenever a pickup/dropoff event is written,
+so long trips are a range scan on the `ride_duration_idx` index instead of
+a self-join over `ride_event`.
+
+Each pickup/dropoff event write refreshes its ride's timing columns and
+applies the change in the ride's contribution to `TripDurationRollup`.
+
+Writes that bypass model signals (`bulk_create`, `QuerySet.update`, raw SQL)
+are not tracked unless the caller wraps them in snapshot()/apply_snapshot()
+like the bulk event endpoint does; otherwise run
+`manage.py rebuild_trip_duration_rollup` after those.
+"""
+from collections import Counter
+from datetime import timezone
+
+from django.db import connections, router, transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q
+from django.db.models.functions import TruncMonth
+
+from .models import Ride, RideEvent, TripDurationRollup
+
+PICKUP_DESCRIPTION = 'Status changes to pickup'
+DROPOFF_DESCRIPTION = 'Status change to dropoff'
+TRIP_EVENT_TYPES = (RideEvent.EventType.PICKUP, RideEvent.EventType.DROPOFF)
+
+LONG_TRIP_SECONDS = 3600
+
+TIMING_FIELDS = ['pickup_at', 'dropoff_at', 'duration_seconds']
+
+
+def trip_seconds(pickup_at, dropoff_at):
+    """
+    Whole seconds from pickup to dropoff, or None without both.
+
+    Truncates each timestamp to the second first, like the original report SQL.
+    """
+    if pickup_at is None or dropoff_at is None:
+        return None
+    return int(dropoff_at.timestamp()) - int(pickup_at.timestamp())
+
+
+def ride_trips(pickup_at, duration_seconds):
+    """
+    A ride's contribution to the report: Counter({month: 1}) for a long trip.
+    """
+    if duration_seconds is None or duration_seconds <= LONG_TRIP_SECONDS:
+        return Counter()
+    return Counter({pickup_at.astimezone(timezone.utc).strftime('%Y-%m'): 1})
+
+
+def event_timing(ride_ids=None, columns=()):
+    """
+    Per-ride first pickup and last dropoff, from the events (conditional aggregation).
+
+    Rows are grouped by id_ride plus any extra `columns`.
+    """
+    events = RideEvent.objects.filter(event_type__in=TRIP_EVENT_TYPES)
+    if ride_ids is not None:
+        events = events.filter(id_ride_id__in=ride_ids)
+    return events.values('id_ride', *columns).annotate(
+        first_pickup=Min('created_at', filter=Q(event_type=RideEvent.EventType.PICKUP)),
+        last_dropoff=Max('created_at', filter=Q(event_type=RideEvent.EventType.DROPOFF)),
+    ).order_by()
+
+
+def save_ride_timing(timings):
+    """
+    Write (ride_id, pickup_at, dropoff_at) tuples to the rides' timing columns.
+
+    One parameterized UPDATE run with executemany: bulk_update() builds a
+    CASE per column whose cost grows with the batch, ~3x slower here.
+    """
+    connection = connections[router.db_for_write(Ride)]
+    fields = [Ride._meta.get_field(name) for name in TIMING_FIELDS]
+    quote = connection.ops.quote_name
+    sql = 'UPDATE {} SET {} WHERE {} = %s'.format(
+        quote(Ride._meta.db_table),
+        ', '.join(f'{quote(field.column)} = %s' for field in fields),
+        quote(Ride._meta.pk.column),
+    )
+    params = [
+        [
+            field.get_db_prep_save(value, connection)
+            for field, value in zip(fields, (pickup_at, dropoff_at, trip_seconds(pickup_at, dropoff_at)))
+        ] + [ride_id]
+        for ride_id, pickup_at, dropoff_at in timings
+    ]
+    if params:
+        with connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+
+def update_ride_timing(ride_ids):
+    """
+    Recompute pickup_at/dropoff_at/duration_seconds of these rides from their events.
+    """
+    timing = {row['id_ride']: row for row in event_timing(ride_ids)}
+    save_ride_timing(
+        (ride_id, timing.get(ride_id, {}).get('first_pickup'), timing.get(ride_id, {}).get('last_dropoff'))
+        for ride_id in ride_ids
+    )
+
+
+def ride_long_trips(ride_id):
+    """
+    Return Counter({month: trips}) for one ride, read from the database.
+    """
+    return long_trips_by_ride([ride_id]).get(ride_id, Counter())
+
+
+def long_trips_by_ride(ride_ids):
+    """
+    Return {ride_id: Counter({month: trips})} for many rides in one query.
+    """
+    rows = Ride.objects.filter(pk__in=ride_ids).values_list('pk', 'pickup_at', 'duration_seconds')
+    return {ride_id: ride_trips(pickup_at, duration) for ride_id, pickup_at, duration in rows}
+
+
+def apply_delta(driver_id, before, after):
+    """
+    Move a ride's contribution for one driver from `before` to `after`.
+    """
+    delta = Counter(after)
+    delta.subtract(before)
+
+    with transaction.atomic():
+        for month, change in delta.items():
+            if not change:
+                continue
+            updated = TripDurationRollup.objects.filter(
+                month=month, id_driver_id=driver_id
+            ).update(trip_count=F('trip_count') + change)
+            if not updated and change > 0:
+                TripDurationRollup.objects.create(
+                    month=month, id_driver_id=driver_id, trip_count=change
+                )
+
+
+def snapshot(ride_ids):
+    """
+    Capture {ride_id: (driver_id, Counter)} before a write touches these rides.
+    """
+    rows = Ride.objects.filter(pk__in=ride_ids).values_list('pk', 'id_driver', 'pickup_at', 'duration_seconds')
+    return {
+        ride_id: (driver_id, ride_trips(pickup_at, duration))
+        for ride_id, driver_id, pickup_at, duration in rows
+    }
+
+
+def apply_snapshot(state):
+    """
+    Refresh the timing of the rides captured by snapshot() and apply the differences.
+    """
+    update_ride_timing(list(state))
+    trips = long_trips_by_ride(list(state))
+    for ride_id, (driver_id, before) in state.items():
+        apply_delta(driver_id, before, trips.get(ride_id, Counter()))
+
+
+def long_trips_by_month_and_driver():
+    """
+    Return Counter({(month, driver_id): trips}) for all rides in one query.
+
+    A range scan on ride_duration_idx (duration_seconds, pickup_at, id_driver);
+    TruncMonth instead of SQLite's strftime() keeps it portable. The driver is
+    an annotation so the GROUP BY starts with the month: grouped by id_driver
+    first, SQLite walks the whole id_driver index for its order instead.
+    """
+    rows = Ride.objects.filter(
+        duration_seconds__gt=LONG_TRIP_SECONDS
+    ).annotate(
+        month=TruncMonth('pickup_at', tzinfo=timezone.utc), driver=F('id_driver')
+    ).values(
+        'month', 'driver'
+    ).annotate(
+        trips=Count('id')
+    ).order_by()
+
+    return Counter({
+        (row['month'].strftime('%Y-%m'), row['driver']): row['trips']
+        for row in rows
+    })
+
+
+def rebuild_ride_timing(chunk_size=5000):
+    """
+    Recompute every ride's timing columns from ride_event, writing only rides that differ.
+
+    Returns the number of rides updated.
+    """
+    stale = []
+    rows = event_timing(columns=('id_ride__pickup_at', 'id_ride__dropoff_at')).iterator(chunk_size=chunk_size)
+    for row in rows:
+        if (row['first_pickup'], row['last_dropoff']) != (row['id_ride__pickup_at'], row['id_ride__dropoff_at']):
+            stale.append((row['id_ride'], row['first_pickup'], row['last_dropoff']))
+
+    with transaction.atomic():
+        save_ride_timing(stale)
+        # Rides whose pickup/dropoff events are gone
+        cleared = Ride.objects.filter(
+            Q(pickup_at__isnull=False) | Q(dropoff_at__isnull=False)
+        ).exclude(
+            Exists(RideEvent.objects.filter(id_ride=OuterRef('pk'), event_type__in=TRIP_EVENT_TYPES))
+        ).update(pickup_at=None, dropoff_at=None, duration_seconds=None)
+    return len(stale) + cleared
+
+
+def rebuild_rollup(chunk_size=5000):
+    """
+    Recompute the ride timing columns, then the whole rollup from them.
+
+    Returns the number of (month, driver) rows written.
+    """
+    rebuild_ride_timing(chunk_size=chunk_size)
+    totals = long_trips_by_month_and_driver()
+
+    with transaction.atomic():
+        TripDurationRollup.objects.all().delete()
+        TripDurationRollup.objects.bulk_create(
+            [
+                TripDurationRollup(month=month, id_driver_id=driver_id, trip_count=trips)
+                for (month, driver_id), trips in totals.items()
+            ],
+            batch_size=chunk_size
+        )
+    return len(totals)
+
+
+def rollup_drift():
+    """
+    Compare the rollup with long_trips_by_month_and_driver().
+
+    Returns {(month, driver_id): (rollup_trips, actual_trips)} for every row
+    that differs; empty when the rollup is correct.
+    """
+    rollup = Counter({
+        (month, driver_id): trips
+        for month, driver_id, trips in TripDurationRollup.objects.filter(
+            trip_count__gt=0
+        ).values_list('month', 'id_driver', 'trip_count')
+    })
+    actual = long_trips_by_month_and_driver()
+    return {
+        key: (rollup[key], actual[key])
+        for key in rollup.keys() | actual.keys()
+        if rollup[key] != actual[key]
+    }
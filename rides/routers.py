@@ -0,0 +1,132 @@
+"""
+Read-replica routing (DATABASE_ROUTERS in settings.py).
+
+Like Laravel's read/write connections, but opt-in per view: ReplicaMiddleware
+marks requests to the RIDES_REPLICA_VIEWS (list, detail, export and report
+reads) and ReplicaRouter sends their `rides` app reads to a replica from
+RIDES_READ_REPLICAS. Everything else, and every write, uses `default`.
+
+Read-your-writes: after a client writes, its reads stay on the primary for
+RIDES_REPLICA_PIN_SECONDS, so it never reads a replica that hasn't caught up
+with its own change. Clients are told apart by their Authorization header or
+session cookie.
+"""
+from contextvars import ContextVar
+import hashlib
+import itertools
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import DEFAULT_DB_ALIAS
+
+# Alias the current request reads from, or None for the router's default
+current_replica = ContextVar('rides_replica', default=None)
+
+PIN_KEY = 'rides:pin:{}'
+LAG_CHECK_INTERVAL = 5  # seconds between lag probes per replica (least_lag strategy)
+
+_round_robin = itertools.count()
+_lag_checks = {}  # alias -> (checked_at, lag_seconds)
+
+
+def get_replicas():
+    return list(getattr(settings, 'RIDES_READ_REPLICAS', []))
+
+
+def client_key(request):
+    """
+    Identify the client across requests, or None for anonymous ones.
+    """
+    credentials = request.headers.get('Authorization') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credentials:
+        return None
+    return PIN_KEY.format(hashlib.md5(credentials.encode(), usedforsecurity=False).hexdigest())
+
+
+def get_pin_cache():
+    return caches[getattr(settings, 'RIDES_REPLICA_PIN_CACHE', 'default')]
+
+
+def pin_to_primary(request):
+    """
+    Keep this client's reads on the primary for RIDES_REPLICA_PIN_SECONDS.
+    """
+    key = client_key(request)
+    if key is not None:
+        get_pin_cache().set(key, True, getattr(settings, 'RIDES_REPLICA_PIN_SECONDS', 5))
+
+
+def is_pinned(request):
+    key = client_key(request)
+    return key is not None and get_pin_cache().get(key, False)
+
+
+def replica_lag(alias):
+    """
+    Seconds `alias` is behind the primary, from the newest ride_change row on each.
+
+    Backend independent, so it also measures the SQLite stand-in replica.
+    Probed at most every LAG_CHECK_INTERVAL seconds per replica.
+    """
+    from .models import RideChange
+
+    checked_at, lag = _lag_checks.get(alias, (None, None))
+    if checked_at is not None and time.monotonic() - checked_at < LAG_CHECK_INTERVAL:
+        return lag
+
+    def newest(db):
+        change = RideChange.objects.using(db).order_by('-id').only('created_at').first()
+        return change.created_at if change else None
+
+    primary, replica = newest(DEFAULT_DB_ALIAS), newest(alias)
+    if primary is None or replica is not None and replica >= primary:
+        lag = 0.0
+    elif replica is None:
+        lag = float('inf')
+    else:
+        lag = (primary - replica).total_seconds()
+    _lag_checks[alias] = (time.monotonic(), lag)
+    return lag
+
+
+def choose_replica():
+    """
+    Pick a replica by RIDES_REPLICA_STRATEGY: 'round_robin' or 'least_lag'.
+
+    Returns None (read from the primary) when no replica is configured, or
+    with least_lag when every replica is over RIDES_REPLICA_MAX_LAG seconds behind.
+    """
+    replicas = get_replicas()
+    if not replicas:
+        return None
+    if getattr(settings, 'RIDES_REPLICA_STRATEGY', 'round_robin') != 'least_lag':
+        return replicas[next(_round_robin) % len(replicas)]
+
+    lags = {alias: replica_lag(alias) for alias in replicas}
+    alias = min(replicas, key=lags.get)
+    max_lag = getattr(settings, 'RIDES_REPLICA_MAX_LAG', None)
+    if max_lag is not None and lags[alias] > max_lag:
+        return None
+    return alias
+
+
+class ReplicaRouter:
+    """
+    Routes reads of the `rides` models to the request's replica, if it has one.
+    """
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'rides':
+            return current_replica.get()
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same rows as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas get their schema from the primary through replication
+        return db not in get_replicas()
@@ -0,0 +1,101 @@
+"""
+Rider/driver search behind RideFilter (?rider_email=, ?driver_name=, ...).
+
+Exact and prefix email lookups seek the indexed, lowercased `user.email_lower`
+column. Substring search (?*_email_contains=, ?*_name=) uses the `user_search`
+FTS5 table with the trigram tokenizer on SQLite, kept in sync with `user` by
+triggers, and icontains backed by pg_trgm GIN indexes on PostgreSQL
+(migration 0011). Both stay index lookups with millions of users; rides are
+then found through the id_rider/id_driver indexes.
+
+SQLite drops a table's triggers when a migration rebuilds it, so run
+`manage.py rebuild_user_search` after any migration that alters User.
+"""
+from functools import reduce
+from operator import and_, or_
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+from rest_framework.exceptions import ValidationError
+
+from .models import User
+
+# Trigram search can't match fewer characters than this
+MIN_SEARCH_TERM = 3
+
+# Kept in sync with migration 0011 (which has its own frozen copy)
+SQLITE_SEARCH_INDEX = [
+    'DROP TRIGGER IF EXISTS user_search_insert',
+    'DROP TRIGGER IF EXISTS user_search_delete',
+    'DROP TRIGGER IF EXISTS user_search_update',
+    'DROP TABLE IF EXISTS user_search',
+    '''CREATE VIRTUAL TABLE user_search USING fts5(
+        email, first_name, last_name, content="user", content_rowid="id", tokenize="trigram"
+    )''',
+    '''CREATE TRIGGER user_search_insert AFTER INSERT ON "user" BEGIN
+        INSERT INTO user_search (rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END''',
+    '''CREATE TRIGGER user_search_delete AFTER DELETE ON "user" BEGIN
+        INSERT INTO user_search (user_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+    END''',
+    '''CREATE TRIGGER user_search_update AFTER UPDATE OF email, first_name, last_name ON "user" BEGIN
+        INSERT INTO user_search (user_search, rowid, email, first_name, last_name)
+        VALUES ('delete', old.id, old.email, old.first_name, old.last_name);
+        INSERT INTO user_search (rowid, email, first_name, last_name)
+        VALUES (new.id, new.email, new.first_name, new.last_name);
+    END''',
+    "INSERT INTO user_search (user_search) VALUES ('rebuild')",
+]
+
+
+def email_users(value):
+    """
+    Users whose email is `value` (case-insensitive), or starts with it when it ends in '*'.
+    """
+    value = User.normalize_email(value)
+    if not value.endswith('*'):
+        return User.objects.filter(email_lower=value)
+
+    prefix = value.rstrip('*')
+    if not prefix:
+        raise ValidationError('An email prefix needs at least one character before "*".')
+    # A range instead of LIKE 'prefix%', which SQLite won't run on a case-sensitive index
+    return User.objects.filter(email_lower__gte=prefix, email_lower__lt=prefix + '\U0010ffff')
+
+
+def search_users(columns, value):
+    """
+    Users with every whitespace-separated term of `value` inside one of `columns`.
+    """
+    terms = value.split()
+    if not terms or any(len(term) < MIN_SEARCH_TERM for term in terms):
+        raise ValidationError(f'Search terms need at least {MIN_SEARCH_TERM} characters.')
+
+    if connections[router.db_for_read(User)].vendor == 'sqlite':
+        # FTS5 query: {columns} : "term" AND ... (quotes doubled inside a string)
+        group = '{' + ' '.join(columns) + '}'
+        query = ' AND '.join('{} : "{}"'.format(group, term.replace('"', '""')) for term in terms)
+        return User.objects.filter(
+            id__in=RawSQL('SELECT rowid FROM user_search WHERE user_search MATCH %s', [query])
+        )
+
+    return User.objects.filter(reduce(and_, [
+        reduce(or_, [Q(**{f'{column}__icontains': term}) for column in columns])
+        for term in terms
+    ]))
+
+
+def rebuild_search_index(using='default'):
+    """
+    Recreate the SQLite user_search table and its triggers from the user table.
+    """
+    connection = connections[using]
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        for statement in SQLITE_SEARCH_INDEX:
+            cursor.execute(statement)
+    return True
@@ -1,6 +1,9 @@
 from rest_framework import serializers
+from rest_framework.settings import api_settings
+from rest_framework import ISO_8601
+from django.conf import settings
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, timezone as dt_timezone
 from .models import User, Ride, RideEvent
 
 
@@ -12,12 +15,28 @@ class UserSerializer(serializers.ModelSerializer):
 
 
 class RideEventSerializer(serializers.ModelSerializer):
+    # Ride.__str__ shows the rider: the browsable API's choices would query one per ride
+    id_ride = serializers.PrimaryKeyRelatedField(queryset=Ride.objects.select_related('id_rider'))
+    
     class Meta:
         model = RideEvent
         fields = ['id', 'id_ride', 'description', 'created_at']
         read_only_fields = ['id', 'created_at']
 
 
+class RideEventBulkItemSerializer(serializers.Serializer):
+    """
+    One item of POST /api/ride-events/bulk/.
+    
+    Plain Serializer (no ModelSerializer / PrimaryKeyRelatedField) so validating
+    thousands of items does not query per item; ride ids are checked in bulk
+    by the view. created_at is optional and defaults to now.
+    """
+    id_ride = serializers.IntegerField(min_value=1)
+    description = serializers.CharField(max_length=255)
+    created_at = serializers.DateTimeField(required=False)
+
+
 class RideSerializer(serializers.ModelSerializer):
     # Nested serializers (like Laravel's whenLoaded())
     id_rider = UserSerializer(read_only=True)
@@ -25,6 +44,15 @@ class RideSerializer(serializers.ModelSerializer):
     
     # This will be populated with only today's events (performance requirement)
     todays_ride_events = RideEventSerializer(many=True, read_only=True, source='todays_events')
+    # Replaces todays_ride_events with ?events=count (the prefetch is skipped then)
+    todays_ride_events_count = serializers.IntegerField(read_only=True, source='todays_events_count')
+    
+    # Only present when sorting by distance (?lat=&lng=&sort_by=distance);
+    # read-only fields missing from the instance are skipped entirely
+    distance_km = serializers.FloatField(read_only=True)
+    
+    # Nested unless left out of ?expand= (users then render as ids)
+    expandable_fields = ['id_rider', 'id_driver', 'todays_ride_events']
     
     class Meta:
         model = Ride
@@ -32,8 +60,24 @@ class RideSerializer(serializers.ModelSerializer):
             'id', 'status', 'id_rider', 'id_driver',
             'pickup_latitude', 'pickup_longitude',
             'dropoff_latitude', 'dropoff_longitude',
-            'pickup_time', 'todays_ride_events'
+            'pickup_time', 'updated_at', 'todays_ride_events', 'todays_ride_events_count',
+            'distance_km'
         ]
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # ?fields= / ?expand= from RideViewSet.get_serializer_context(); None means all
+        fields, expand = self.context.get('fields'), self.context.get('expand')
+        if expand is not None:
+            for name in ['id_rider', 'id_driver']:
+                if name not in expand:
+                    self.fields[name] = serializers.PrimaryKeyRelatedField(read_only=True)
+            if 'todays_ride_events' not in expand:
+                self.fields.pop('todays_ride_events')
+        if fields is not None:
+            for name in list(self.fields):
+                if name not in fields:
+                    self.fields.pop(name)
 
 
 class RideCreateUpdateSerializer(serializers.ModelSerializer):
@@ -52,4 +96,206 @@ class RideCreateUpdateSerializer(serializers.ModelSerializer):
             'pickup_latitude', 'pickup_longitude',
             'dropoff_latitude', 'dropoff_longitude',
             'pickup_time'
-        ]
\ No newline at end of file
+        ]
+
+
+def datetime_formatter():
+    """
+    Return a function formatting datetimes exactly like serializers.DateTimeField.
+    
+    With the default ISO 8601 format and a UTC current timezone, UTC values
+    (what the database returns) skip the field's timezone conversion entirely.
+    """
+    field = serializers.DateTimeField()
+    current = timezone.get_current_timezone() if settings.USE_TZ else None
+    fast = (
+        api_settings.DATETIME_FORMAT is not None
+        and api_settings.DATETIME_FORMAT.lower() == ISO_8601
+        and current is not None
+        and getattr(current, 'key', None) == 'UTC'
+    )
+    
+    def format_datetime(value):
+        if fast and value is not None and value.tzinfo is dt_timezone.utc:
+            return value.isoformat()[:-6] + 'Z'
+        return field.to_representation(value)
+    
+    return format_datetime
+
+
+class FastRideSerializer(serializers.BaseSerializer):
+    """
+    Read-only fast path for RideSerializer (?serializer=fast on list/detail).
+    
+    Produces byte-for-byte the same JSON as RideSerializer but builds plain
+    dicts directly instead of running every value through DRF Field objects.
+    Accepts either Ride instances (select_related + todays_events prefetch,
+    or a todays_events_count annotation) or `.values()` rows from RideViewSet.get_fast_rows() with users and
+    events attached by RideViewSet.attach_related().
+    
+    Keep the keys in sync with RideSerializer; tests compare both outputs.
+    """
+    # .values() columns used for rows, see RideViewSet.get_fast_rows()
+    ride_columns = [
+        'id', 'status', 'id_rider', 'id_driver',
+        'pickup_latitude', 'pickup_longitude',
+        'dropoff_latitude', 'dropoff_longitude',
+        'pickup_time', 'updated_at',
+    ]
+    user_columns = ['id', 'email', 'first_name', 'last_name', 'role', 'phone_number']
+    event_columns = ['id', 'id_ride', 'description', 'created_at']
+    # Output key -> row key, where they differ
+    sources = {'todays_ride_events': 'todays_events', 'todays_ride_events_count': 'todays_events_count'}
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.format_datetime = datetime_formatter()
+        # ?fields= / ?expand=: the keys to output, in RideSerializer's order
+        fields, expand = self.context.get('fields'), self.context.get('expand')
+        self.sparse_fields = None
+        if fields is not None or expand is not None:
+            self.sparse_fields = [
+                name for name in RideSerializer.Meta.fields
+                if (fields is None or name in fields)
+                and not (name == 'todays_ride_events' and expand is not None and name not in expand)
+            ]
+    
+    def to_representation(self, ride):
+        if self.sparse_fields is not None:
+            if not isinstance(ride, dict):
+                ride = self.instance_to_row(ride)
+            return self.sparse_representation(ride)
+        if isinstance(ride, dict):
+            return self.row_to_representation(ride)
+        
+        fmt = self.format_datetime
+        data = {
+            'id': ride.id,
+            'status': ride.status,
+            'id_rider': self.user_to_representation(ride.id_rider),
+            'id_driver': self.user_to_representation(ride.id_driver),
+            'pickup_latitude': ride.pickup_latitude,
+            'pickup_longitude': ride.pickup_longitude,
+            'dropoff_latitude': ride.dropoff_latitude,
+            'dropoff_longitude': ride.dropoff_longitude,
+            'pickup_time': fmt(ride.pickup_time),
+            'updated_at': fmt(ride.updated_at),
+        }
+        if hasattr(ride, 'todays_events_count'):
+            data['todays_ride_events_count'] = ride.todays_events_count
+        else:
+            data['todays_ride_events'] = [
+                {
+                    'id': event.id,
+                    'id_ride': event.id_ride_id,
+                    'description': event.description,
+                    'created_at': fmt(event.created_at),
+                }
+                for event in ride.todays_events
+            ]
+        if hasattr(ride, 'distance_km'):
+            data['distance_km'] = ride.distance_km
+        return data
+    
+    @staticmethod
+    def user_to_representation(user):
+        return {
+            'id': user.id,
+            'email': user.email,
+            'first_name': user.first_name,
+            'last_name': user.last_name,
+            'role': user.role,
+            'phone_number': user.phone_number,
+        }
+    
+    def row_to_representation(self, row):
+        fmt = self.format_datetime
+        data = {
+            'id': row['id'],
+            'status': row['status'],
+            'id_rider': {c: row['id_rider'][c] for c in self.user_columns},
+            'id_driver': {c: row['id_driver'][c] for c in self.user_columns},
+            'pickup_latitude': row['pickup_latitude'],
+            'pickup_longitude': row['pickup_longitude'],
+            'dropoff_latitude': row['dropoff_latitude'],
+            'dropoff_longitude': row['dropoff_longitude'],
+            'pickup_time': fmt(row['pickup_time']),
+            'updated_at': fmt(row['updated_at']),
+        }
+        if 'todays_events_count' in row:
+            data['todays_ride_events_count'] = row['todays_events_count']
+        else:
+            data['todays_ride_events'] = [
+                {
+                    'id': event['id'],
+                    'id_ride': event['id_ride'],
+                    'description': event['description'],
+                    'created_at': fmt(event['created_at']),
+                }
+                for event in row['todays_events']
+            ]
+        if 'distance_km' in row:
+            data['distance_km'] = row['distance_km']
+        return data
+    
+    def instance_to_row(self, ride):
+        """
+        The loaded parts of a (possibly .only()) Ride as a row like get_fast_rows() + attach_related().
+        """
+        deferred = ride.get_deferred_fields()
+        row = {}
+        for name in self.ride_columns:
+            field = Ride._meta.get_field(name)
+            if field.attname in deferred:
+                continue
+            if field.is_relation:
+                # Nested only when select_related() loaded the user
+                row[name] = (
+                    self.user_to_representation(getattr(ride, name))
+                    if field.is_cached(ride) else getattr(ride, field.attname)
+                )
+            else:
+                row[name] = getattr(ride, name)
+        
+        if hasattr(ride, 'todays_events'):
+            row['todays_events'] = [
+                {
+                    'id': event.id,
+                    'id_ride': event.id_ride_id,
+                    'description': event.description,
+                    'created_at': event.created_at,
+                }
+                for event in ride.todays_events
+            ]
+        for name in ['todays_events_count', 'distance_km']:
+            if hasattr(ride, name):
+                row[name] = getattr(ride, name)
+        return row
+    
+    def sparse_representation(self, row):
+        """
+        Only the sparse_fields keys; users not attached to the row stay ids.
+        """
+        fmt = self.format_datetime
+        data = {}
+        for name in self.sparse_fields:
+            source = self.sources.get(name, name)
+            if source not in row:
+                continue
+            value = row[source]
+            if name in ['pickup_time', 'updated_at']:
+                value = fmt(value)
+            elif name == 'todays_ride_events':
+                value = [
+                    {
+                        'id': event['id'],
+                        'id_ride': event['id_ride'],
+                        'description': event['description'],
+                        'created_at': fmt(event['created_at']),
+                    }
+                    for event in value
+                ]
+            elif isinstance(value, dict):
+                value = {c: value[c] for c in self.user_columns}
+            data[name] = value
+        return data
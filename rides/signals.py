@@ -0,0 +1,131 @@
+"""
+Signal receivers keeping derived tables in sync with model writes.
+
+Like Laravel model observers: registered once in RideConfig.ready().
+"""
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import authentication, changes, response_cache, rollups
+from .models import ApiToken, Ride, RideEvent, User
+
+
+@receiver(pre_save, sender=RideEvent)
+@receiver(pre_delete, sender=RideEvent)
+def snapshot_ride_event(sender, instance, **kwargs):
+    ride_ids = set()
+    if instance.event_type in rollups.TRIP_EVENT_TYPES:
+        ride_ids.add(instance.id_ride_id)
+
+    # An update can move an event off a ride or change its type
+    if instance.pk is not None and kwargs.get('signal') is pre_save:
+        old = RideEvent.objects.filter(pk=instance.pk).values('id_ride', 'event_type').first()
+        if old and old['event_type'] in rollups.TRIP_EVENT_TYPES:
+            ride_ids.add(old['id_ride'])
+
+    origin = kwargs.get('origin')
+    if origin is None or not ride_ids:
+        instance._rollup_state = rollups.snapshot(ride_ids) if ride_ids else {}
+        return
+
+    # delete() sends every pre_delete before it removes any row, so each of a
+    # ride's events would snapshot (and later subtract) the whole ride: share
+    # one snapshot per ride across the deletion, kept on its origin
+    pending = origin.__dict__.setdefault('_rollup_pending', {})
+    if instance.id_ride_id not in pending:
+        pending[instance.id_ride_id] = rollups.snapshot(ride_ids)
+    instance._rollup_state = pending[instance.id_ride_id]
+
+
+@receiver(post_save, sender=RideEvent)
+@receiver(post_delete, sender=RideEvent)
+def update_trip_duration_rollup(sender, instance, **kwargs):
+    state = getattr(instance, '_rollup_state', None)
+    if state:
+        rollups.apply_snapshot(state)
+        state.clear()  # applied: the ride's other deleted events share it
+    pending = getattr(kwargs.get('origin'), '_rollup_pending', None)
+    if pending:
+        pending.pop(instance.id_ride_id, None)
+    instance._rollup_state = None
+
+
+@receiver(pre_save, sender=Ride)
+def snapshot_ride_driver(sender, instance, **kwargs):
+    instance._rollup_move = None
+    if instance.pk is None:
+        return
+
+    update_fields = kwargs.get('update_fields')
+    if update_fields is not None and 'id_driver' not in update_fields:
+        return
+
+    old_driver_id = Ride.objects.filter(pk=instance.pk).values_list('id_driver', flat=True).first()
+    if old_driver_id is not None and old_driver_id != instance.id_driver_id:
+        instance._rollup_move = (old_driver_id, rollups.ride_long_trips(instance.pk))
+
+
+@receiver(post_save, sender=Ride)
+def move_trip_duration_rollup(sender, instance, **kwargs):
+    move = getattr(instance, '_rollup_move', None)
+    if move:
+        old_driver_id, trips = move
+        rollups.apply_delta(old_driver_id, trips, {})
+        rollups.apply_delta(instance.id_driver_id, {}, trips)
+    instance._rollup_move = None
+
+
+@receiver(post_save, sender=Ride)
+@receiver(post_delete, sender=Ride)
+@receiver(post_save, sender=RideEvent)
+@receiver(post_delete, sender=RideEvent)
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_response_cache(sender, instance, **kwargs):
+    response_cache.bump_versions(sender._meta.db_table)
+
+
+@receiver(post_save, sender=RideEvent)
+@receiver(post_delete, sender=RideEvent)
+def touch_ride(sender, instance, **kwargs):
+    # Like Laravel's $touches: an event change counts as a change to its ride
+    Ride.objects.filter(pk=instance.id_ride_id).update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=Ride)
+def snapshot_ride_status(sender, instance, **kwargs):
+    instance._previous_status = None
+    update_fields = kwargs.get('update_fields')
+    if instance.pk is None or (update_fields is not None and 'status' not in update_fields):
+        return
+    instance._previous_status = Ride.objects.filter(pk=instance.pk).values_list('status', flat=True).first()
+
+
+@receiver(post_save, sender=Ride)
+def log_ride_status_change(sender, instance, created, **kwargs):
+    update_fields = kwargs.get('update_fields')
+    if not created and update_fields is not None and 'status' not in update_fields:
+        return
+    previous = getattr(instance, '_previous_status', None)
+    if created or previous != instance.status:
+        changes.ride_status_change(instance, previous).save()
+
+
+@receiver(post_save, sender=RideEvent)
+def log_ride_event(sender, instance, created, **kwargs):
+    if created:
+        changes.ride_event_change(instance).save()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def evict_user_principals(sender, instance, **kwargs):
+    # Role or is_active may have changed: the next request reloads the user
+    authentication.principal_cache.evict_user(instance.pk)
+
+
+@receiver(post_save, sender=ApiToken)
+@receiver(post_delete, sender=ApiToken)
+def evict_token_principal(sender, instance, **kwargs):
+    authentication.principal_cache.evict(instance.key_hash)
@@ -1,4 +1,6 @@
-from django.test import TestCase
+from io import StringIO
+
+from django.test import TestCase, TransactionTestCase, override_settings
 from django.urls import reverse
 from rest_framework.test import APIClient
 from rest_framework import status
@@ -94,3 +96,2222 @@ class RideAPITestCase(TestCase):
         self.assertEqual(len(report_data), 1)
         self.assertEqual(report_data[0]['driver'], 'Test Driver')
         self.assertEqual(report_data[0]['trip_count'], 1)
+
+
+class RideKeysetPaginationTestCase(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+
+        # 25 rides, several sharing the same pickup_time to exercise the id tiebreaker
+        base_time = timezone.now()
+        for i in range(25):
+            Ride.objects.create(
+                status='pickup' if i % 2 else 'dropoff',
+                id_rider=self.admin,
+                id_driver=self.admin,
+                pickup_latitude=0, pickup_longitude=0,
+                dropoff_latitude=0, dropoff_longitude=0,
+                pickup_time=base_time - timedelta(minutes=i // 3)
+            )
+
+    def walk(self, url):
+        ids = []
+        pages = 0
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('count', response.json())
+            ids.extend(ride['id'] for ride in response.json()['results'])
+            url = response.json()['next']
+            pages += 1
+        return ids, pages
+
+    def test_cursor_walks_every_ride_once_in_order(self):
+        ids, pages = self.walk('/api/rides/?cursor=')
+        expected = list(
+            Ride.objects.order_by('-pickup_time', '-id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual(pages, 3)
+
+    def test_cursor_with_ascending_ordering_and_filter(self):
+        ids, _ = self.walk('/api/rides/?cursor=&ordering=pickup_time&status=pickup')
+        expected = list(
+            Ride.objects.filter(status='pickup')
+            .order_by('pickup_time', 'id').values_list('id', flat=True)
+        )
+        self.assertEqual(ids, expected)
+
+    def test_previous_link_returns_previous_page(self):
+        first = self.client.get('/api/rides/?cursor=').json()
+        second = self.client.get(first['next']).json()
+        back = self.client.get(second['previous']).json()
+        self.assertEqual(
+            [r['id'] for r in back['results']],
+            [r['id'] for r in first['results']]
+        )
+
+    def test_cursor_skips_count_query(self):
+        # 1 query for the page of rides + 1 for the events prefetch
+        with self.assertNumQueries(2):
+            self.client.get('/api/rides/?cursor=')
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/rides/?cursor=garbage')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_page_number_pagination_still_default(self):
+        response = self.client.get('/api/rides/?page=2')
+        self.assertEqual(response.json()['count'], 25)
+
+
+class RideDistanceSortTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+
+        # San Francisco downtown, Oakland (~13 km), San Jose (~68 km)
+        self.rides = {}
+        for name, lat, lng in [
+            ('sj', 37.3382, -121.8863),
+            ('sf', 37.7749, -122.4194),
+            ('oak', 37.8044, -122.2712),
+        ]:
+            self.rides[name] = Ride.objects.create(
+                status='pickup',
+                id_rider=self.admin,
+                id_driver=self.admin,
+                pickup_latitude=lat, pickup_longitude=lng,
+                dropoff_latitude=lat, dropoff_longitude=lng,
+                pickup_time=timezone.now()
+            )
+
+    def test_pickup_cell_kept_in_sync_on_save(self):
+        from .geo import grid_cell
+
+        ride = self.rides['sf']
+        self.assertEqual(ride.pickup_cell, grid_cell(37.7749, -122.4194))
+
+        ride.pickup_latitude = 37.3382
+        ride.pickup_longitude = -121.8863
+        ride.save(update_fields=['pickup_latitude', 'pickup_longitude'])
+        ride.refresh_from_db()
+        self.assertEqual(ride.pickup_cell, grid_cell(37.3382, -121.8863))
+
+    def test_sort_by_distance_returns_haversine_km(self):
+        response = self.client.get('/api/rides/?lat=37.7749&lng=-122.4194&sort_by=distance')
+        results = response.json()['results']
+
+        self.assertEqual(
+            [r['id'] for r in results],
+            [self.rides[name].id for name in ('sf', 'oak', 'sj')]
+        )
+        self.assertAlmostEqual(results[0]['distance_km'], 0, places=3)
+        self.assertAlmostEqual(results[1]['distance_km'], 13.4, delta=0.2)
+        self.assertAlmostEqual(results[2]['distance_km'], 67.7, delta=0.5)
+
+    def test_radius_km_prunes_far_rides(self):
+        response = self.client.get(
+            '/api/rides/?lat=37.7749&lng=-122.4194&sort_by=distance&radius_km=20'
+        )
+        self.assertEqual(
+            [r['id'] for r in response.json()['results']],
+            [self.rides['sf'].id, self.rides['oak'].id]
+        )
+
+    def test_invalid_radius(self):
+        response = self.client.get('/api/rides/?lat=37.7&lng=-122.4&sort_by=distance&radius_km=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_non_finite_params(self):
+        for params in ('lat=nan&lng=-122.4', 'lat=37.7&lng=inf', 'lat=37.7&lng=-122.4&radius_km=nan',
+                       'lat=37.7&lng=-122.4&radius_km=inf'):
+            response = self.client.get(f'/api/rides/?{params}&sort_by=distance')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+
+    def test_distance_only_exposed_when_sorting(self):
+        response = self.client.get('/api/rides/')
+        self.assertNotIn('distance_km', response.json()['results'][0])
+
+
+class TripDurationRollupTestCase(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.driver = User.objects.create_user(
+            username='driver1',
+            email='driver1@test.com',
+            password='password',
+            first_name='Test',
+            last_name='Driver',
+            role='driver'
+        )
+        self.ride = Ride.objects.create(
+            status='dropoff',
+            id_rider=self.admin,
+            id_driver=self.driver,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+
+        # 30 minute trip: not in the report yet
+        self.base_time = timezone.now().replace(day=15) - timedelta(days=40)
+        self.pickup = RideEvent.objects.create(id_ride=self.ride, description='Status changes to pickup')
+        self.pickup.created_at = self.base_time
+        self.pickup.save(update_fields=['created_at'])
+        self.dropoff = RideEvent.objects.create(id_ride=self.ride, description='Status change to dropoff')
+        self.dropoff.created_at = self.base_time + timedelta(minutes=30)
+        self.dropoff.save(update_fields=['created_at'])
+
+    def report(self):
+        return self.client.get('/api/reports/trip-duration/').json()['data']
+
+    def stretch_trip(self):
+        from datetime import timedelta
+
+        self.dropoff.created_at = self.base_time + timedelta(hours=2)
+        self.dropoff.save(update_fields=['created_at'])
+
+    def test_short_trip_not_counted(self):
+        self.assertEqual(self.report(), [])
+
+    def test_event_update_counts_long_trip(self):
+        self.stretch_trip()
+        self.assertEqual(self.report(), [{
+            'month': self.base_time.strftime('%Y-%m'),
+            'driver': 'Test Driver',
+            'trip_count': 1,
+        }])
+
+    def test_event_delete_removes_trip(self):
+        self.stretch_trip()
+        self.pickup.delete()
+        self.assertEqual(self.report(), [])
+
+    def create_long_trip(self):
+        from datetime import timedelta
+        from .models import RideEvent
+
+        ride = Ride.objects.create(
+            status='dropoff', id_rider=self.admin, id_driver=self.driver,
+            pickup_latitude=0, pickup_longitude=0, dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=self.base_time
+        )
+        RideEvent.objects.create(id_ride=ride, description='Status changes to pickup', created_at=self.base_time)
+        RideEvent.objects.create(
+            id_ride=ride, description='Status change to dropoff', created_at=self.base_time + timedelta(hours=2)
+        )
+        return ride
+
+    def test_ride_delete_removes_trip_once(self):
+        from .rollups import rollup_drift
+
+        self.stretch_trip()
+        ride = self.create_long_trip()
+        self.create_long_trip()
+        self.assertEqual(self.report()[0]['trip_count'], 3)
+
+        # Both trip events cascade; the ride must only be subtracted once
+        ride.delete()
+        self.assertEqual(self.report()[0]['trip_count'], 2)
+        self.assertEqual(rollup_drift(), {})
+
+    def test_queryset_delete_of_trip_events_removes_trip_once(self):
+        from .models import RideEvent
+        from .rollups import rollup_drift
+
+        self.stretch_trip()
+        ride = self.create_long_trip()
+        other = self.create_long_trip()
+        RideEvent.objects.filter(id_ride__in=[ride, other]).delete()
+        self.assertEqual(self.report()[0]['trip_count'], 1)
+        self.assertEqual(rollup_drift(), {})
+
+    def test_driver_change_moves_trip(self):
+        from .models import TripDurationRollup
+
+        self.stretch_trip()
+        other = User.objects.create_user(
+            username='driver2', password='password',
+            first_name='Other', last_name='Driver', role='driver'
+        )
+        self.ride.id_driver = other
+        self.ride.save()
+
+        self.assertEqual([row['driver'] for row in self.report()], ['Other Driver'])
+        self.assertEqual(
+            TripDurationRollup.objects.get(id_driver=self.driver).trip_count, 0
+        )
+
+    def test_rebuild_command_matches_incremental(self):
+        from django.core.management import call_command
+        from .models import TripDurationRollup
+
+        self.stretch_trip()
+        incremental = self.report()
+
+        TripDurationRollup.objects.all().delete()
+        self.assertEqual(self.report(), [])
+
+        call_command('rebuild_trip_duration_rollup', stdout=StringIO())
+        self.assertEqual(self.report(), incremental)
+
+    def test_orm_reference_query_matches_rollup(self):
+        from datetime import timedelta
+        from django.core.management import call_command
+        from django.core.management.base import CommandError
+        from .models import RideEvent, TripDurationRollup
+        from .rollups import long_trips_by_month_and_driver
+
+        self.stretch_trip()
+        # Exactly one hour (not counted) and a second long trip in another month
+        for offset, minutes in ((timedelta(days=-20), 60), (timedelta(days=-50), 61)):
+            ride = Ride.objects.create(
+                status='dropoff', id_rider=self.admin, id_driver=self.driver,
+                pickup_latitude=0, pickup_longitude=0, dropoff_latitude=0, dropoff_longitude=0,
+                pickup_time=self.base_time + offset
+            )
+            RideEvent.objects.create(id_ride=ride, description='Status changes to pickup', created_at=self.base_time + offset)
+            RideEvent.objects.create(
+                id_ride=ride, description='Status change to dropoff',
+                created_at=self.base_time + offset + timedelta(minutes=minutes)
+            )
+
+        expected = {
+            (row.month, row.id_driver_id): row.trip_count
+            for row in TripDurationRollup.objects.filter(trip_count__gt=0)
+        }
+        self.assertEqual(len(expected), 2)
+        self.assertEqual(dict(long_trips_by_month_and_driver()), expected)
+
+        out = StringIO()
+        call_command('rebuild_trip_duration_rollup', verify=True, stdout=out)
+        self.assertIn('matches', out.getvalue())
+        TripDurationRollup.objects.update(trip_count=5)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_trip_duration_rollup', verify=True, stdout=StringIO())
+
+
+class QueryPlanTestCase(TestCase):
+    """
+    Runs EXPLAIN QUERY PLAN for every query issued by the hot endpoints and
+    fails if SQLite falls back to a full table scan (`SCAN <table>` without
+    an index). Catches dropped indexes and queries that stop using them.
+    """
+    # Tables a full scan is acceptable on, with the reason
+    SCAN_ALLOWED = {
+        'trip_duration_rollup',  # O(months x drivers) by design
+        'qualify',  # Django's ROW_NUMBER() subquery: already limited to the page's rides
+        'user_search',  # FTS5 MATCH is an index lookup, reported as SCAN ... VIRTUAL TABLE
+    }
+
+    def setUp(self):
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        ride = Ride.objects.create(
+            status='pickup',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=37.77, pickup_longitude=-122.41,
+            dropoff_latitude=37.78, dropoff_longitude=-122.42,
+            pickup_time=timezone.now()
+        )
+        RideEvent.objects.create(id_ride=ride, description='Status changes to pickup')
+
+    def query_plans(self, url):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        plans = []
+        with connection.cursor() as cursor:
+            for query in ctx.captured_queries:
+                if not query['sql'].lstrip().upper().startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                plans.append((query['sql'], [row[-1] for row in cursor.fetchall()]))
+        return plans
+
+    def assertNoFullScan(self, url):
+        import re
+
+        from django.db import connection
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN output is SQLite specific')
+
+        for sql, plan in self.query_plans(url):
+            for step in plan:
+                match = re.match(r'SCAN (\w+)', step)
+                if not match or 'USING' in step or match.group(1) in self.SCAN_ALLOWED:
+                    continue
+                self.fail(f'Full table scan on {match.group(1)} for {url}\n{sql}\n' + '\n'.join(plan))
+
+    def test_ride_list(self):
+        self.assertNoFullScan('/api/rides/')
+
+    def test_ride_list_filtered_by_status(self):
+        self.assertNoFullScan('/api/rides/?status=pickup')
+
+    def test_ride_list_filtered_by_email(self):
+        self.assertNoFullScan('/api/rides/?rider_email=ADMIN@test.com')
+        self.assertNoFullScan('/api/rides/?driver_email=adm*')
+
+    def test_ride_list_filtered_by_name(self):
+        self.assertNoFullScan('/api/rides/?driver_name=adm')
+
+    def test_ride_list_ascending(self):
+        self.assertNoFullScan('/api/rides/?ordering=pickup_time')
+
+    def test_ride_list_keyset_page(self):
+        self.assertNoFullScan('/api/rides/?cursor=')
+
+    def test_ride_list_keyset_deep_page(self):
+        from .pagination import RideKeysetPagination
+
+        # Cursor pointing just past the only ride: exercises the seek filter
+        ride = Ride.objects.get()
+        paginator = RideKeysetPagination(page_size=10)
+        paginator.base_url = 'http://testserver/api/rides/'
+        next_url = paginator.encode_cursor(ride, reverse=False)
+        self.assertNoFullScan(next_url.replace('http://testserver', ''))
+
+    def test_ride_list_radius_search(self):
+        self.assertNoFullScan('/api/rides/?lat=37.77&lng=-122.41&sort_by=distance&radius_km=5')
+
+    def test_ride_detail(self):
+        ride = Ride.objects.get()
+        self.assertNoFullScan(f'/api/rides/{ride.pk}/')
+
+    def test_ride_event_list(self):
+        self.assertNoFullScan('/api/ride-events/')
+
+    def test_trip_duration_report(self):
+        self.assertNoFullScan('/api/reports/trip-duration/')
+
+    def test_long_trips_range_scan(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        from .rollups import long_trips_by_month_and_driver
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('EXPLAIN QUERY PLAN output is SQLite specific')
+        with CaptureQueriesContext(connection) as ctx:
+            long_trips_by_month_and_driver()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + ctx.captured_queries[0]['sql'])
+            plan = ' '.join(row[-1] for row in cursor.fetchall())
+        self.assertIn('USING COVERING INDEX ride_duration_idx (duration_seconds>?)', plan)
+
+
+class SeedLoadCommandTestCase(TestCase):
+    def seed(self, prefix):
+        from django.core.management import call_command
+
+        call_command(
+            'seed_load', riders=5, drivers=2, rides=30, batch_size=7,
+            prefix=prefix, seed=7, long_trip_fraction=0.5,
+            status_mix='pickup=1,dropoff=3', stdout=StringIO()
+        )
+        return list(
+            Ride.objects.filter(id_rider__username__startswith=prefix)
+            .order_by('id').values_list('status', 'pickup_latitude', 'pickup_longitude')
+        )
+
+    def test_generates_dataset_with_explicit_timestamps(self):
+        from .geo import grid_cell
+        from .models import RideEvent, TripDurationRollup
+
+        self.seed('a')
+        self.assertEqual(User.objects.filter(role='rider').count(), 5)
+        self.assertEqual(Ride.objects.count(), 30)
+        self.assertFalse(Ride.objects.filter(status='en-route').exists())
+
+        ride = Ride.objects.filter(status='dropoff').first()
+        self.assertEqual(ride.pickup_cell, grid_cell(ride.pickup_latitude, ride.pickup_longitude))
+        pickup = ride.ride_events.get(description='Status changes to pickup')
+        self.assertEqual(pickup.created_at, ride.pickup_time)
+
+        # Rollup is rebuilt since bulk_create skips the signals
+        self.assertTrue(RideEvent.objects.filter(description='Status change to dropoff').exists())
+        self.assertTrue(TripDurationRollup.objects.exists())
+
+    def test_same_seed_same_data(self):
+        self.assertEqual(self.seed('a'), self.seed('b'))
+
+
+class BenchApiCommandTestCase(TestCase):
+    def test_emits_json_for_every_scenario(self):
+        import json
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command(
+            'bench_api', seed_rides=20, iterations=2, warmup=0,
+            stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+
+        self.assertEqual(report['meta']['rows']['ride'], 20)
+        for name, result in report['scenarios'].items():
+            self.assertEqual(result['status'], status.HTTP_200_OK, name)
+            self.assertIn('p95', result['latency_ms'])
+        self.assertEqual(report['scenarios']['rides_deep_cursor']['queries'], 2)
+
+    def test_compare_flags_regressions(self):
+        from .benchmarks import compare
+
+        def run(p95, queries):
+            return {'scenarios': {'rides_default': {'latency_ms': {'p95': p95}, 'queries': queries}}}
+
+        self.assertEqual(compare(run(10, 3), run(11, 3)), [])
+        self.assertEqual(len(compare(run(10, 3), run(20, 4))), 2)
+
+
+class RequestMetricsTestCase(TestCase):
+    def setUp(self):
+        from .metrics import registry
+
+        registry.reset()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+
+    def test_metrics_exposes_per_view_histograms(self):
+        self.client.get('/api/rides/')
+        self.client.get('/api/rides/')
+        self.client.get('/api/reports/trip-duration/')
+
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+
+        body = response.content.decode()
+        self.assertIn('# TYPE rides_request_queries histogram', body)
+        self.assertIn('rides_request_duration_seconds_count{view="RideViewSet.list"} 2', body)
+        self.assertIn('rides_request_queries_count{view="trip_duration_report"} 1', body)
+        # The empty ride list issues the count query only (no rows to fetch)
+        self.assertIn('rides_request_queries_bucket{view="RideViewSet.list",le="1"} 2', body)
+
+    def test_metrics_requires_admin_role(self):
+        rider = User.objects.create_user(username='rider', password='password', role='rider')
+        self.client.force_authenticate(user=rider)
+        response = self.client.get('/api/metrics/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_query_budget_warning(self):
+        from django.test import override_settings
+        from django.utils import timezone
+
+        Ride.objects.create(
+            status='pickup', id_rider=self.admin, id_driver=self.admin,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+        with override_settings(RIDES_QUERY_BUDGET={'RideViewSet.list': 1}):
+            with self.assertLogs('rides.instrumentation', level='WARNING') as logs:
+                self.client.get('/api/rides/')
+        self.assertIn('Possible N+1', logs.output[0])
+
+        body = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('rides_query_budget_exceeded_total{view="RideViewSet.list"} 1', body)
+
+    def test_browsable_pages_within_budget(self):
+        from django.test import Client
+        from django.utils import timezone
+        from .models import RideEvent
+
+        for _ in range(3):
+            ride = Ride.objects.create(
+                status='pickup', id_rider=self.admin, id_driver=self.admin,
+                pickup_latitude=0, pickup_longitude=0,
+                dropoff_latitude=0, dropoff_longitude=0,
+                pickup_time=timezone.now()
+            )
+            RideEvent.objects.create(id_ride=ride, description='Location update')
+
+        # Session auth (+2) and the forms' related-field choices
+        client = Client()
+        client.force_login(self.admin)
+        with self.assertNoLogs('rides.instrumentation', level='WARNING'):
+            for url in ('/api/rides/', f'/api/rides/{ride.id}/', '/api/ride-events/'):
+                response = client.get(url, headers={'Accept': 'text/html', 'Cache-Control': 'no-cache'})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class FastRideSerializerTestCase(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            first_name='Ada',
+            role='admin',
+            phone_number='555-0100'
+        )
+        self.client.force_authenticate(user=self.admin)
+        driver = User.objects.create_user(username='driver', password='password', role='driver')
+
+        now = timezone.now()
+        for i in range(12):
+            ride = Ride.objects.create(
+                status='pickup',
+                id_rider=self.admin,
+                id_driver=driver,
+                pickup_latitude=37.7 + i / 100, pickup_longitude=-122.4,
+                dropoff_latitude=37.8, dropoff_longitude=-122.5,
+                pickup_time=now - timedelta(hours=i)
+            )
+            RideEvent.objects.create(id_ride=ride, description='Status changes to pickup',
+                                     created_at=now - timedelta(minutes=i))
+            RideEvent.objects.create(id_ride=ride, description='Old event',
+                                     created_at=now - timedelta(days=3))
+
+    def assertSameOutput(self, url):
+        separator = '&' if '?' in url else '?'
+        drf = self.client.get(url)
+        fast = self.client.get(f'{url}{separator}serializer=fast')
+        self.assertEqual(drf.status_code, status.HTTP_200_OK)
+        self.assertEqual(fast.content.replace(b'&serializer=fast', b''), drf.content)
+        return fast
+
+    def test_list_matches_drf_serializer(self):
+        response = self.assertSameOutput('/api/rides/')
+        self.assertEqual(len(response.json()['results'][0]['todays_ride_events']), 1)
+
+    def test_detail_matches_drf_serializer(self):
+        self.assertSameOutput(f'/api/rides/{Ride.objects.first().pk}/')
+
+    def test_distance_and_cursor_match_drf_serializer(self):
+        self.assertSameOutput('/api/rides/?lat=37.7&lng=-122.4&sort_by=distance&radius_km=5')
+        self.assertSameOutput('/api/rides/?cursor=&status=pickup')
+
+    def test_fast_list_query_count(self):
+        # count + rides + users + events
+        with self.assertNumQueries(4):
+            self.client.get('/api/rides/?serializer=fast')
+
+
+class ExportTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        for i in range(5):
+            ride = Ride.objects.create(
+                status='pickup' if i < 3 else 'dropoff',
+                id_rider=self.admin,
+                id_driver=self.admin,
+                pickup_latitude=1.5, pickup_longitude=2,
+                dropoff_latitude=3, dropoff_longitude=4,
+                pickup_time=timezone.now()
+            )
+            RideEvent.objects.create(id_ride=ride, description='Status changes to pickup')
+
+    def read(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ride_export_ndjson_with_filter_and_since(self):
+        import json
+
+        ids = list(Ride.objects.filter(status='pickup').order_by('id').values_list('id', flat=True))
+        response = self.client.get(f'/api/rides/export/?status=pickup&since={ids[0]}')
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        rows = [json.loads(line) for line in self.read(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows], ids[1:])
+        self.assertEqual(rows[0]['pickup_latitude'], 1.5)
+        self.assertTrue(rows[0]['pickup_time'].endswith('Z'))
+
+    def test_ride_event_export_csv(self):
+        import csv
+
+        response = self.client.get('/api/ride-events/export/?format=csv')
+        self.assertEqual(response['Content-Type'], 'text/csv')
+        rows = list(csv.reader(self.read(response).splitlines()))
+        self.assertEqual(rows[0], ['id', 'id_ride', 'description', 'created_at'])
+        self.assertEqual(len(rows), 6)
+
+    def test_export_requires_admin_role(self):
+        rider = User.objects.create_user(username='rider', password='password', role='rider')
+        self.client.force_authenticate(user=rider)
+        response = self.client.get('/api/rides/export/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_export_invalid_since(self):
+        response = self.client.get('/api/ride-events/export/?since=yesterday')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BulkRideEventTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            first_name='Test',
+            last_name='Driver',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.ride = Ride.objects.create(
+            status='dropoff',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+
+    def test_bulk_json_array_with_partial_errors(self):
+        from .models import RideEvent
+
+        payload = [
+            {'id_ride': self.ride.id, 'description': 'Status changes to pickup',
+             'created_at': '2026-01-10T08:00:00Z'},
+            {'id_ride': 999999, 'description': 'Unknown ride'},
+            {'description': 'Missing ride'},
+            {'id_ride': self.ride.id, 'description': 'Status change to dropoff',
+             'created_at': '2026-01-10T10:00:00Z'},
+        ]
+        response = self.client.post('/api/ride-events/bulk/', payload, format='json')
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['created'], 2)
+        self.assertEqual([e['index'] for e in response.json()['errors']], [1, 2])
+        self.assertIn('id_ride', response.json()['errors'][1]['errors'])
+
+        pickup = RideEvent.objects.get(description='Status changes to pickup')
+        self.assertEqual(pickup.created_at.isoformat(), '2026-01-10T08:00:00+00:00')
+
+        # The rollup is maintained even though bulk_create skips signals
+        report = self.client.get('/api/reports/trip-duration/').json()['data']
+        self.assertEqual(report, [{'month': '2026-01', 'driver': 'Test Driver', 'trip_count': 1}])
+
+    def test_bulk_ndjson(self):
+        body = '\n'.join(
+            f'{{"id_ride": {self.ride.id}, "description": "Location update {i}"}}' for i in range(50)
+        )
+        response = self.client.post(
+            '/api/ride-events/bulk/', body, content_type='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json(), {'created': 50, 'failed': 0, 'errors': []})
+
+    def test_bulk_all_invalid(self):
+        response = self.client.post('/api/ride-events/bulk/', [{'id_ride': 'x'}], format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json()['failed'], 1)
+
+
+class ResponseCacheTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .metrics import registry
+
+        registry.reset()
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            first_name='Test',
+            last_name='Driver',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.ride = Ride.objects.create(
+            status='pickup',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+
+    def test_second_request_is_served_from_cache(self):
+        first = self.client.get('/api/rides/?status=pickup&ordering=-pickup_time')
+        self.assertEqual(first['X-Cache'], 'MISS')
+
+        # Same params in another order normalize to the same key
+        with self.assertNumQueries(0):
+            second = self.client.get('/api/rides/?ordering=-pickup_time&status=pickup')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.content, first.content)
+        self.assertEqual(second['ETag'], first['ETag'])
+
+    def test_writes_invalidate(self):
+        from .models import RideEvent
+
+        self.client.get('/api/rides/')
+        RideEvent.objects.create(id_ride=self.ride, description='Status changes to pickup')
+        response = self.client.get('/api/rides/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results'][0]['todays_ride_events']), 1)
+
+        self.client.get(f'/api/rides/{self.ride.id}/')
+        self.admin.first_name = 'Renamed'
+        self.admin.save()
+        response = self.client.get(f'/api/rides/{self.ride.id}/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['id_driver']['first_name'], 'Renamed')
+
+    def test_bulk_events_invalidate(self):
+        self.client.get('/api/rides/')
+        self.client.post(
+            '/api/ride-events/bulk/',
+            [{'id_ride': self.ride.id, 'description': 'Location update'}],
+            format='json'
+        )
+        response = self.client.get('/api/rides/')
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()['results'][0]['todays_ride_events']), 1)
+
+    def test_if_none_match_returns_304(self):
+        etag = self.client.get('/api/rides/')['ETag']
+
+        response = self.client.get('/api/rides/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+        # A write that doesn't change this response still revalidates as 304
+        User.objects.create_user(username='other', password='password', role='rider')
+        response = self.client.get('/api/rides/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['X-Cache'], 'MISS')
+
+        response = self.client.get('/api/rides/', HTTP_IF_NONE_MATCH='"stale"')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_no_cache_and_permissions(self):
+        self.client.get('/api/rides/')
+        response = self.client.get('/api/rides/', HTTP_CACHE_CONTROL='no-cache')
+        self.assertEqual(response['X-Cache'], 'BYPASS')
+
+        rider = User.objects.create_user(username='rider', password='password', role='rider')
+        self.client.force_authenticate(user=rider)
+        response = self.client.get('/api/rides/')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_hit_miss_counters(self):
+        self.client.get('/api/rides/')
+        self.client.get('/api/rides/')
+        self.client.get('/api/rides/999999/')
+
+        body = self.client.get('/api/metrics/').content.decode()
+        self.assertIn('rides_response_cache_total{view="RideViewSet.list",result="hit"} 1', body)
+        self.assertIn('rides_response_cache_total{view="RideViewSet.list",result="miss"} 1', body)
+        self.assertIn('rides_response_cache_total{view="RideViewSet.retrieve",result="miss"} 1', body)
+
+
+class RideUpdatedAtTestCase(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.old, self.new = [
+            Ride.objects.create(
+                status='pickup',
+                id_rider=self.admin,
+                id_driver=self.admin,
+                pickup_latitude=0, pickup_longitude=0,
+                dropoff_latitude=0, dropoff_longitude=0,
+                pickup_time=timezone.now()
+            )
+            for _ in range(2)
+        ]
+        self.an_hour_ago = timezone.now() - timedelta(hours=1)
+        Ride.objects.filter(pk=self.old.pk).update(updated_at=self.an_hour_ago)
+
+    def test_event_writes_touch_ride(self):
+        from .models import RideEvent
+
+        event = RideEvent.objects.create(id_ride=self.old, description='Status changes to pickup')
+        self.old.refresh_from_db()
+        self.assertGreater(self.old.updated_at, self.an_hour_ago)
+
+        Ride.objects.filter(pk=self.old.pk).update(updated_at=self.an_hour_ago)
+        event.delete()
+        self.old.refresh_from_db()
+        self.assertGreater(self.old.updated_at, self.an_hour_ago)
+
+    def test_bulk_events_touch_rides(self):
+        self.client.post(
+            '/api/ride-events/bulk/',
+            [{'id_ride': self.old.id, 'description': 'Location update'}],
+            format='json'
+        )
+        self.old.refresh_from_db()
+        self.assertGreater(self.old.updated_at, self.an_hour_ago)
+
+    def test_save_with_update_fields_touches_ride(self):
+        self.old.status = 'dropoff'
+        self.old.save(update_fields=['status'])
+        self.old.refresh_from_db()
+        self.assertGreater(self.old.updated_at, self.an_hour_ago)
+
+    def test_updated_since_filter(self):
+        from datetime import timedelta
+
+        since = (self.an_hour_ago + timedelta(minutes=1)).isoformat()
+        response = self.client.get('/api/rides/', {'updated_since': since})
+        self.assertEqual([r['id'] for r in response.json()['results']], [self.new.id])
+
+        response = self.client.get('/api/rides/', {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_detail_if_modified_since(self):
+        from .models import RideEvent
+
+        response = self.client.get(f'/api/rides/{self.old.id}/')
+        last_modified = response['Last-Modified']
+        self.assertIn('updated_at', response.json())
+
+        response = self.client.get(f'/api/rides/{self.old.id}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['Last-Modified'], last_modified)
+
+        RideEvent.objects.create(id_ride=self.old, description='Status changes to pickup')
+        response = self.client.get(f'/api/rides/{self.old.id}/', HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_list_validators(self):
+        from django.utils.http import http_date
+
+        for url in ('/api/rides/', '/api/rides/?serializer=fast'):
+            response = self.client.get(url)
+            self.assertEqual(response['Last-Modified'], http_date(self.new.updated_at.timestamp()))
+
+            # Lists revalidate by ETag only
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_validators_without_response_cache(self):
+        from django.test import override_settings
+
+        with override_settings(RIDES_RESPONSE_CACHE_ALIAS=None):
+            response = self.client.get(f'/api/rides/{self.new.id}/')
+            self.assertNotIn('X-Cache', response)
+            response = self.client.get(f'/api/rides/{self.new.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+
+class RideChangeFeedTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.async_client.force_login(self.admin)
+        self.ride = Ride.objects.create(
+            status='en-route',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+
+    def test_log_records_status_changes_and_new_events(self):
+        from .models import RideChange, RideEvent
+
+        self.ride.status = 'pickup'
+        self.ride.save()
+        self.ride.save()  # unchanged status: not logged
+        self.ride.pickup_latitude = 1
+        self.ride.save(update_fields=['pickup_latitude'])
+        RideEvent.objects.create(id_ride=self.ride, description='Status changes to pickup')
+
+        changes = list(RideChange.objects.values_list('kind', 'payload'))
+        self.assertEqual(changes[0], ('ride_status', {'status': 'en-route', 'previous_status': None}))
+        self.assertEqual(changes[1], ('ride_status', {'status': 'pickup', 'previous_status': 'en-route'}))
+        self.assertEqual(changes[2][0], 'ride_event')
+        self.assertEqual(changes[2][1]['description'], 'Status changes to pickup')
+        self.assertEqual(len(changes), 3)
+
+    def test_bulk_events_are_logged(self):
+        from .models import RideChange
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        client.post(
+            '/api/ride-events/bulk/',
+            [{'id_ride': self.ride.id, 'description': f'Location update {i}'} for i in range(3)],
+            format='json'
+        )
+        self.assertEqual(RideChange.objects.filter(kind='ride_event').count(), 3)
+
+    async def test_long_poll_returns_backlog(self):
+        response = await self.async_client.get('/api/rides/changes/', {'after': 0, 'wait': 0})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        body = response.json()
+        self.assertEqual([c['kind'] for c in body['changes']], ['ride_status'])
+        self.assertEqual(body['cursor'], body['changes'][-1]['id'])
+
+        response = await self.async_client.get('/api/rides/changes/', {'after': body['cursor'], 'wait': 0})
+        self.assertEqual(response.json(), {'changes': [], 'cursor': body['cursor']})
+
+        response = await self.async_client.get('/api/rides/changes/', {'after': 0, 'wait': 0, 'ride': 999999})
+        self.assertEqual(response.json()['changes'], [])
+
+    async def test_long_poll_wakes_on_new_change(self):
+        import asyncio
+        from .models import RideEvent
+
+        request = asyncio.ensure_future(self.async_client.get('/api/rides/changes/', {'wait': 5}))
+        await asyncio.sleep(0.2)
+        await RideEvent.objects.acreate(id_ride=self.ride, description='Status changes to pickup')
+
+        response = await asyncio.wait_for(request, 5)
+        self.assertEqual([c['kind'] for c in response.json()['changes']], ['ride_event'])
+
+    async def test_sse_stream_resumes_from_last_event_id(self):
+        response = await self.async_client.get(
+            '/api/rides/changes/stream/', headers={'Last-Event-ID': '0'}
+        )
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        stream = response.streaming_content
+        try:
+            self.assertEqual(await anext(stream), b'retry: 3000\n\n')
+            message = (await anext(stream)).decode()
+        finally:
+            await stream.aclose()
+        self.assertTrue(message.startswith('id: '))
+        self.assertIn('event: ride_status\n', message)
+
+    def test_sse_stream_rejected_under_wsgi(self):
+        from django.test import Client
+
+        client = Client()
+        client.force_login(self.admin)
+        response = client.get('/api/rides/changes/stream/')
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+        self.assertIn('ASGI', response.json()['detail'])
+
+    async def test_fan_out_reads_log_once_per_poll(self):
+        from unittest import mock
+        from . import changes
+        from .models import RideChange
+
+        feed = changes.ChangeFeed()
+        subscriptions = [await feed.subscribe() for _ in range(50)]
+        await RideChange.objects.acreate(kind='ride_status', id_ride=self.ride.id, payload={})
+
+        with mock.patch('rides.changes.fetch_changes', wraps=changes.fetch_changes) as fetch:
+            await feed.poll()
+            batches = [await s.next_batch(timeout=0) for s in subscriptions]
+        self.assertEqual(fetch.await_count, 1)
+        self.assertTrue(all(len(batch) == 1 for batch in batches))
+
+        for subscription in subscriptions:
+            subscription.close()
+        self.assertTrue(feed.task.cancelled() or feed.task.cancelling())
+
+    def test_requires_admin_and_valid_cursor(self):
+        from django.test import Client
+
+        client = Client()
+        self.assertEqual(client.get('/api/rides/changes/?wait=0').status_code, status.HTTP_401_UNAUTHORIZED)
+
+        rider = User.objects.create_user(username='rider', password='password', role='rider')
+        client.force_login(rider)
+        self.assertEqual(client.get('/api/rides/changes/?wait=0').status_code, status.HTTP_403_FORBIDDEN)
+
+        client.force_login(self.admin)
+        response = client.get('/api/rides/changes/?after=abc')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AsyncRideViewsTestCase(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_login(self.admin)
+        self.async_client.force_login(self.admin)
+
+        now = timezone.now()
+        self.rides = []
+        for i in range(15):
+            ride = Ride.objects.create(
+                status='pickup' if i % 3 == 0 else 'en-route',
+                id_rider=self.admin,
+                id_driver=self.admin,
+                pickup_latitude=37.77 + i / 100, pickup_longitude=-122.41,
+                dropoff_latitude=0, dropoff_longitude=0,
+                pickup_time=now - timedelta(hours=i)
+            )
+            RideEvent.objects.create(id_ride=ride, description='Status changes to pickup', created_at=now - timedelta(hours=i))
+            RideEvent.objects.create(id_ride=ride, description='Status change to dropoff', created_at=now - timedelta(hours=i - 2))
+            self.rides.append(ride)
+
+    async def assert_same_body(self, sync_path, async_path, params=None):
+        sync = await self.async_client.get(sync_path, params or {}, headers={'Cache-Control': 'no-cache'})
+        response = await self.async_client.get(async_path, params or {})
+        self.assertEqual(response.status_code, sync.status_code)
+        self.assertEqual(response.content.replace(async_path.encode(), sync_path.encode()), sync.content)
+        return response
+
+    async def test_list_matches_sync_endpoint(self):
+        for params in [
+            {},
+            {'page': 2},
+            {'status': 'pickup'},
+            {'ordering': 'pickup_time'},
+            {'lat': 37.77, 'lng': -122.41, 'sort_by': 'distance', 'radius_km': 5},
+            {'fields': 'id,status,id_driver', 'expand': ''},
+            {'events': 'count'},
+        ]:
+            with self.subTest(params=params):
+                response = await self.assert_same_body('/api/rides/', '/api/async/rides/', params)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+        # Cursor links point back at the async endpoint
+        response = await self.async_client.get('/api/async/rides/', {'cursor': ''})
+        next_page = response.json()['next']
+        self.assertIn('/api/async/rides/?cursor=', next_page)
+        response = await self.async_client.get(next_page)
+        self.assertEqual(len(response.json()['results']), 5)
+
+    async def test_detail_and_report_match_sync_endpoints(self):
+        ride = self.rides[0]
+        response = await self.assert_same_body(f'/api/rides/{ride.id}/', f'/api/async/rides/{ride.id}/')
+        self.assertEqual(response.json()['id'], ride.id)
+        self.assertEqual(len(response.json()['todays_ride_events']), 2)
+
+        response = await self.assert_same_body('/api/rides/999999/', '/api/async/rides/999999/')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        await self.assert_same_body('/api/reports/trip-duration/', '/api/async/reports/trip-duration/')
+
+    async def test_errors_and_validators(self):
+        response = await self.assert_same_body('/api/rides/', '/api/async/rides/', {'page': 99})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        response = await self.assert_same_body('/api/rides/', '/api/async/rides/', {'updated_since': 'yesterday'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = await self.async_client.get('/api/async/rides/')
+        response = await self.async_client.get('/api/async/rides/', headers={'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_requires_admin(self):
+        from django.test import Client
+
+        client = Client()
+        self.assertEqual(client.get('/api/async/rides/').status_code, status.HTTP_401_UNAUTHORIZED)
+        rider = User.objects.create_user(username='rider', password='password', role='rider')
+        client.force_login(rider)
+        self.assertEqual(client.get('/api/async/rides/1/').status_code, status.HTTP_403_FORBIDDEN)
+
+
+class BenchConcurrencyCommandTestCase(TransactionTestCase):
+    def test_reports_both_paths_per_level(self):
+        import json
+        from django.core.management import call_command
+
+        call_command('seed_load', rides=5, riders=2, drivers=2, stdout=StringIO())
+        out = StringIO()
+        call_command(
+            'bench_concurrency', concurrency='1,4', rounds=1, threads=2, client_delay=0,
+            stdout=out, stderr=StringIO()
+        )
+        report = json.loads(out.getvalue())
+
+        for path in ('wsgi', 'asgi'):
+            self.assertEqual([r['concurrency'] for r in report['results'][path]], [1, 4])
+            self.assertEqual(report['results'][path][1]['requests'], 4)
+            self.assertEqual(report['results'][path][1]['errors'], 0)
+
+
+class DatabaseSettingsTestCase(TestCase):
+    def test_parse_database_url(self):
+        from pathlib import Path
+        from django.core.exceptions import ImproperlyConfigured
+        from config.database import parse_database_url
+
+        sqlite = parse_database_url('sqlite:///db.sqlite3', '/srv/app', conn_max_age=60)
+        self.assertEqual(sqlite['NAME'], Path('/srv/app/db.sqlite3'))
+        self.assertIn('PRAGMA journal_mode=WAL;', sqlite['OPTIONS']['init_command'])
+        self.assertEqual(sqlite['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertTrue(sqlite['CONN_HEALTH_CHECKS'])
+        self.assertEqual(parse_database_url('sqlite:////data/rides.db', '/srv/app')['NAME'], Path('/data/rides.db'))
+
+        postgres = parse_database_url('postgres://rides:p%40ss@db:5433/rides?sslmode=require', '/srv/app')
+        self.assertEqual(postgres['ENGINE'], 'django.db.backends.postgresql')
+        self.assertEqual(
+            (postgres['NAME'], postgres['USER'], postgres['PASSWORD'], postgres['HOST'], postgres['PORT']),
+            ('rides', 'rides', 'p@ss', 'db', '5433')
+        )
+        self.assertEqual(postgres['OPTIONS'], {'sslmode': 'require'})
+
+        pooled = parse_database_url('postgresql://db/rides', '/srv/app', conn_max_age=60, pool=True)
+        self.assertEqual((pooled['OPTIONS'], pooled['CONN_MAX_AGE']), ({'pool': True}, 0))
+
+        with self.assertRaises(ImproperlyConfigured):
+            parse_database_url('oracle://db/rides', '/srv/app')
+
+    def test_sqlite_profiles(self):
+        from django.core.exceptions import ImproperlyConfigured
+        from config.database import parse_database_url
+
+        stock = parse_database_url('sqlite:///db.sqlite3', '/srv/app', sqlite_profile='stock')
+        self.assertEqual(stock['OPTIONS'], {'init_command': 'PRAGMA journal_mode=DELETE;'})
+
+        # URL parameters override the profile
+        custom = parse_database_url('sqlite:///db.sqlite3?transaction_mode=EXCLUSIVE', '/srv/app')
+        self.assertEqual(custom['OPTIONS']['transaction_mode'], 'EXCLUSIVE')
+
+        with self.assertRaises(ImproperlyConfigured):
+            parse_database_url('sqlite:///db.sqlite3', '/srv/app', sqlite_profile='fast')
+
+    def test_sqlite_connection_pragmas(self):
+        from django.db import connection
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('SQLite pragmas')
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)  # MEMORY
+        self.assertEqual(connection.transaction_mode, 'IMMEDIATE')
+
+
+class BenchSqliteCommandTestCase(TransactionTestCase):
+    """
+    Runs against a temporary SQLite file: the in-memory test database is
+    shared-cache, whose table locks busy_timeout doesn't wait on.
+    """
+    def setUp(self):
+        import tempfile
+        from django.core.management import call_command
+        from django.db import connections
+
+        if connections['default'].vendor != 'sqlite':
+            self.skipTest('bench_sqlite needs a SQLite database')
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+
+        # Keep the in-memory connection open (closing it drops the test database)
+        memory = connections['default']
+        connections.settings['default'] = {**memory.settings_dict, 'NAME': f'{tmp.name}/bench.sqlite3'}
+        connections['default'] = connections.create_connection('default')
+
+        def restore():
+            connections.close_all()
+            connections.settings['default'] = memory.settings_dict
+            connections['default'] = memory
+        self.addCleanup(restore)
+        call_command('migrate', verbosity=0)
+
+    def test_reads_and_writes_per_profile(self):
+        import json
+        from django.core.management import call_command
+        from .models import RideEvent
+
+        call_command('seed_load', rides=5, riders=2, drivers=2, stdout=StringIO())
+        events = RideEvent.objects.count()
+        out = StringIO()
+        call_command(
+            'bench_sqlite', profiles='tuned', readers=1, writers=1, duration=0.5,
+            stdout=out, stderr=StringIO()
+        )
+        result = json.loads(out.getvalue())['profiles']['tuned']
+
+        self.assertGreater(result['read']['ok'], 0)
+        self.assertEqual(result['read']['errors'], {})
+        self.assertEqual(RideEvent.objects.count(), events + result['write']['ok'])
+
+
+@override_settings(
+    RIDES_READ_REPLICAS=['replica1'],
+    RIDES_REPLICA_STRATEGY='round_robin',
+    RIDES_RESPONSE_CACHE_ALIAS=None,
+)
+class ReadReplicaTestCase(TransactionTestCase):
+    """
+    A second SQLite file stands in for the replica; sync_replica copies the
+    primary into it, so rows written afterwards exist only on the primary.
+    """
+    databases = '__all__'  # replica1 is added in setUpClass
+
+    @classmethod
+    def setUpClass(cls):
+        import tempfile
+        from django.db import connections
+
+        cls.replica_dir = tempfile.TemporaryDirectory()
+        connections.settings['replica1'] = {
+            **connections['default'].settings_dict,
+            'NAME': f'{cls.replica_dir.name}/replica.sqlite3',
+            'TEST': {'MIRROR': None, 'NAME': None, 'CHARSET': None, 'COLLATION': None, 'MIGRATE': True},
+        }
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        from django.db import connections
+
+        super().tearDownClass()
+        connections['replica1'].close()
+        del connections['replica1']
+        del connections.settings['replica1']
+        cls.replica_dir.cleanup()
+
+    def setUp(self):
+        from django.core.cache import caches
+        from django.core.management import call_command
+        from django.db import connection
+        from django.test import Client
+        from django.utils import timezone
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('The stand-in replica is a SQLite file')
+        caches['rides'].clear()
+
+        admin = User.objects.create_user(username='admin', password='password', role='admin')
+        other = User.objects.create_user(username='other', password='password', role='admin')
+        self.ride = self.create_ride(admin, timezone.now())
+        call_command('sync_replica', database=['replica1'], stdout=StringIO())
+        # Written after the sync: only on the primary
+        self.create_ride(admin, timezone.now())
+
+        self.writer, self.reader = Client(), Client()
+        self.writer.force_login(admin)
+        self.reader.force_login(other)
+
+    def create_ride(self, user, pickup_time):
+        return Ride.objects.create(
+            status='pickup', id_rider=user, id_driver=user,
+            pickup_latitude=0, pickup_longitude=0, dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=pickup_time
+        )
+
+    def ride_count(self, client):
+        return client.get('/api/rides/').json()['count']
+
+    def test_reads_go_to_replica_and_writers_are_pinned(self):
+        self.assertEqual(self.ride_count(self.writer), 1)
+        self.assertEqual(self.ride_count(self.reader), 1)
+
+        response = self.writer.post(
+            '/api/ride-events/', {'id_ride': self.ride.id, 'description': 'Status changes to pickup'},
+            content_type='application/json'
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Read-your-writes: the writer reads the primary until its pin expires
+        self.assertEqual(self.ride_count(self.writer), 2)
+        self.assertEqual(self.ride_count(self.reader), 1)
+
+    def test_streamed_export_reads_replica(self):
+        response = self.reader.get('/api/rides/export/')
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 1)
+
+    def test_least_lag_falls_back_to_primary(self):
+        from django.core.management import call_command
+        from . import routers
+
+        routers._lag_checks.clear()
+        with self.settings(RIDES_REPLICA_STRATEGY='least_lag', RIDES_REPLICA_MAX_LAG=0):
+            # The replica misses the second ride's change log row: too far behind
+            self.assertEqual(self.ride_count(self.reader), 2)
+
+            call_command('sync_replica', stdout=StringIO())
+            routers._lag_checks.clear()
+            self.assertEqual(self.ride_count(self.reader), 2)
+            # Within LAG_CHECK_INTERVAL the last probe (caught up) still holds
+            self.create_ride(User.objects.get(username='admin'), self.ride.pickup_time)
+            self.assertEqual(self.ride_count(self.reader), 2)
+
+    def test_lag_probes_not_counted_as_request_queries(self):
+        from . import routers
+
+        queries = self.reader.get('/api/rides/').wsgi_request.request_stats.queries
+        routers._lag_checks.clear()
+        with self.settings(RIDES_REPLICA_STRATEGY='least_lag'):
+            response = self.reader.get('/api/rides/', headers={'Cache-Control': 'no-cache'})
+        self.assertEqual(response.wsgi_request.request_stats.queries, queries)
+
+
+class RideEventTypeTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.ride = Ride.objects.create(
+            status='dropoff',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+        self.start = timezone.now().replace(microsecond=500000)
+
+    def event(self, description, minutes=0):
+        from datetime import timedelta
+        from .models import RideEvent
+
+        return RideEvent.objects.create(
+            id_ride=self.ride, description=description, created_at=self.start + timedelta(minutes=minutes)
+        )
+
+    def test_classifies_both_wordings(self):
+        from .models import RideEvent
+
+        EventType = RideEvent.EventType
+        self.assertEqual(self.event('Status changes to pickup').event_type, EventType.PICKUP)
+        self.assertEqual(self.event('status change to pickup').event_type, EventType.PICKUP)
+        self.assertEqual(self.event('Status change to dropoff').event_type, EventType.DROPOFF)
+        self.assertEqual(self.event('Status changes to dropoff').event_type, EventType.DROPOFF)
+        self.assertEqual(self.event('Status changes to en-route').event_type, EventType.EN_ROUTE)
+        event = self.event('Location update')
+        self.assertEqual(event.event_type, EventType.OTHER)
+
+        event.description = 'Status change to dropoff'
+        event.save(update_fields=['description'])
+        self.assertEqual(RideEvent.objects.get(pk=event.pk).event_type, EventType.DROPOFF)
+
+    def test_ride_timing_follows_events(self):
+        pickup = self.event('Status changes to pickup', 0)
+        self.event('Status changes to pickup', 5)  # a second pickup: the first one counts
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.pickup_at, pickup.created_at)
+        self.assertIsNone(self.ride.duration_seconds)
+
+        dropoff = self.event('Status change to dropoff', 90)
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.dropoff_at, dropoff.created_at)
+        self.assertEqual(self.ride.duration_seconds, 5400)
+
+        dropoff.delete()
+        self.ride.refresh_from_db()
+        self.assertEqual((self.ride.dropoff_at, self.ride.duration_seconds), (None, None))
+
+    def test_bulk_events_classified_and_timed(self):
+        from .models import RideEvent
+
+        client = APIClient()
+        client.force_authenticate(user=self.admin)
+        client.post('/api/ride-events/bulk/', [
+            {'id_ride': self.ride.id, 'description': 'Status changes to pickup', 'created_at': self.start.isoformat()},
+            {'id_ride': self.ride.id, 'description': 'Status changes to dropoff', 'created_at': self.start.isoformat()},
+        ], format='json')
+
+        self.assertEqual(
+            sorted(RideEvent.objects.values_list('event_type', flat=True)),
+            [RideEvent.EventType.PICKUP, RideEvent.EventType.DROPOFF]
+        )
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.duration_seconds, 0)
+
+    def test_rebuild_repairs_timing(self):
+        from django.core.management import call_command
+
+        self.event('Status changes to pickup', 0)
+        self.event('Status change to dropoff', 61)
+        Ride.objects.update(pickup_at=None, dropoff_at=None, duration_seconds=None)
+
+        call_command('rebuild_trip_duration_rollup', stdout=StringIO())
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.duration_seconds, 3660)
+
+
+class RideEventsWindowTestCase(TestCase):
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        now = timezone.now()
+        self.rides = [
+            Ride.objects.create(
+                status='pickup',
+                id_rider=self.admin,
+                id_driver=self.admin,
+                pickup_latitude=0, pickup_longitude=0,
+                dropoff_latitude=0, dropoff_longitude=0,
+                pickup_time=now - timedelta(minutes=i)
+            )
+            for i in range(2)
+        ]
+        for ride in self.rides:
+            for minutes in [1, 2, 3, 4]:
+                RideEvent.objects.create(
+                    id_ride=ride, description=f'Location update {minutes}',
+                    created_at=now - timedelta(minutes=minutes)
+                )
+            RideEvent.objects.create(
+                id_ride=ride, description='Yesterday', created_at=now - timedelta(hours=25)
+            )
+
+    def events(self, query, ride=0):
+        response = self.client.get(f'/api/rides/?{query}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()['results'][ride]
+
+    def test_default_window(self):
+        events = self.events('')['todays_ride_events']
+        self.assertEqual(len(events), 4)
+        self.assertNotIn('Yesterday', [event['description'] for event in events])
+
+    def test_limit_per_ride(self):
+        for ride in [0, 1]:
+            events = self.events('events_limit=2', ride)['todays_ride_events']
+            self.assertEqual(
+                [event['description'] for event in events],
+                ['Location update 1', 'Location update 2']
+            )
+
+    def test_since(self):
+        events = self.events('events_since=2000-01-01T00:00:00Z')['todays_ride_events']
+        self.assertEqual(len(events), 5)
+
+        with self.settings(RIDES_EVENTS_LIMIT=3):
+            events = self.events('events_since=2000-01-02T00:00:00Z')['todays_ride_events']
+            self.assertEqual(len(events), 3)
+
+    def test_count_only(self):
+        ride = self.events('events=count')
+        self.assertEqual(ride['todays_ride_events_count'], 4)
+        self.assertNotIn('todays_ride_events', ride)
+
+        # Uncapped, and no events prefetch: rides + pagination count
+        self.assertEqual(self.events('events=count&events_limit=1')['todays_ride_events_count'], 4)
+        with self.assertNumQueries(2):
+            self.client.get('/api/rides/?events=count&events_since=2000-01-01T00:00:00Z')
+
+        detail = self.client.get(f'/api/rides/{self.rides[0].pk}/?events=count').json()
+        self.assertEqual(detail['todays_ride_events_count'], 4)
+
+    def test_fast_serializer_matches(self):
+        for query in ['events_limit=2', 'events=count', 'events_since=2000-01-01T00:00:00Z']:
+            drf = self.client.get(f'/api/rides/?{query}')
+            fast = self.client.get(f'/api/rides/?{query}&serializer=fast')
+            self.assertEqual(drf.content, fast.content)
+
+    def test_invalid_params(self):
+        for query in ['events_since=yesterday', 'events_limit=0', 'events_limit=5000', 'events=all']:
+            response = self.client.get(f'/api/rides/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class SparseFieldsTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.driver = User.objects.create_user(
+            username='driver',
+            email='driver@test.com',
+            password='password',
+            role='driver'
+        )
+        self.client.force_authenticate(user=self.admin)
+        for i in range(3):
+            ride = Ride.objects.create(
+                status='pickup',
+                id_rider=self.admin,
+                id_driver=self.driver,
+                pickup_latitude=37.77, pickup_longitude=-122.41,
+                dropoff_latitude=37.78, dropoff_longitude=-122.42,
+                pickup_time=timezone.now()
+            )
+            RideEvent.objects.create(id_ride=ride, description='Status changes to pickup')
+        self.ride = ride
+
+    def get(self, url):
+        response = self.client.get(url, headers={'Cache-Control': 'no-cache'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.json()
+
+    def test_fields_prune_json_and_query(self):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+
+        with CaptureQueriesContext(connection) as ctx:
+            results = self.get('/api/rides/?fields=id,status,pickup_latitude,pickup_longitude')['results']
+        self.assertEqual(list(results[0]), ['id', 'status', 'pickup_latitude', 'pickup_longitude'])
+
+        # Rides and pagination count only: no user JOIN, no events query, no unused columns
+        self.assertEqual(len(ctx.captured_queries), 2)
+        sql = ctx.captured_queries[1]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('dropoff_latitude', sql)
+
+    def test_expand(self):
+        ride = self.get('/api/rides/?expand=')['results'][0]
+        self.assertEqual(ride['id_rider'], self.admin.id)
+        self.assertEqual(ride['id_driver'], self.driver.id)
+        self.assertNotIn('todays_ride_events', ride)
+
+        with self.assertNumQueries(2):
+            ride = self.get('/api/rides/?expand=id_driver')['results'][0]
+        self.assertEqual(ride['id_rider'], self.admin.id)
+        self.assertEqual(ride['id_driver']['email'], 'driver@test.com')
+
+        ride = self.get(f'/api/rides/{self.ride.pk}/?fields=id,todays_ride_events&expand=todays_ride_events')
+        self.assertEqual(list(ride), ['id', 'todays_ride_events'])
+        self.assertEqual(len(ride['todays_ride_events']), 1)
+
+    def test_fast_serializer_matches(self):
+        for query in [
+            'fields=id,status',
+            'expand=',
+            'expand=id_rider,todays_ride_events',
+            'fields=id,id_driver,todays_ride_events,updated_at',
+            'fields=id,todays_ride_events_count&events=count',
+        ]:
+            with self.subTest(query=query):
+                for url in ['/api/rides/', f'/api/rides/{self.ride.pk}/']:
+                    drf = self.client.get(f'{url}?{query}', headers={'Cache-Control': 'no-cache'})
+                    fast = self.client.get(f'{url}?{query}&serializer=fast', headers={'Cache-Control': 'no-cache'})
+                    self.assertEqual(drf.content, fast.content)
+
+    def test_cursor_pages(self):
+        from unittest import mock
+        from .pagination import RidePagination
+
+        # Cursors read pickup_time and id, loaded even when not requested
+        with mock.patch.object(RidePagination, 'page_size', 2):
+            page = self.get('/api/rides/?cursor=&fields=status')
+            self.assertEqual(page['results'][0], {'status': 'pickup'})
+            self.assertEqual(len(self.get(page['next'])['results']), 1)
+
+    def test_unknown_field(self):
+        for query in ['fields=id,password', 'expand=status']:
+            response = self.client.get(f'/api/rides/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class ApiTokenAuthenticationTestCase(TestCase):
+    def setUp(self):
+        from .authentication import principal_cache
+        from .models import ApiToken
+
+        principal_cache.clear()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.token, self.key = ApiToken.issue(self.admin, name='tests')
+        self.client = APIClient()
+
+    def get(self, key, url='/api/users/'):
+        return self.client.get(url, HTTP_AUTHORIZATION=f'Token {key}')
+
+    def authenticate(self, key):
+        from django.test import RequestFactory
+        from .authentication import ApiTokenAuthentication
+
+        request = RequestFactory().get('/', HTTP_AUTHORIZATION=f'Token {key}')
+        return ApiTokenAuthentication().authenticate(request)
+
+    def test_token_authenticates_from_cache(self):
+        from .models import ApiToken
+
+        self.assertEqual(self.get(self.key).status_code, status.HTTP_200_OK)
+        self.assertNotIn(self.key, ApiToken.objects.values_list('key_hash', flat=True))
+
+        with self.assertNumQueries(0):
+            user, token = self.authenticate(self.key)
+        self.assertEqual((user, token), (self.admin, self.token))
+
+    def test_rejected_tokens(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import ApiToken
+
+        self.assertEqual(self.get('wrong').status_code, status.HTTP_403_FORBIDDEN)
+
+        _, expired = ApiToken.issue(self.admin, expires_at=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(self.get(expired).status_code, status.HTTP_403_FORBIDDEN)
+
+        rider = User.objects.create_user(username='rider', email='rider@test.com', password='password')
+        _, rider_key = ApiToken.issue(rider)
+        self.assertEqual(self.get(rider_key).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_revocation_and_role_change_evict(self):
+        self.authenticate(self.key)  # cached
+
+        self.admin.role = 'rider'
+        self.admin.save()
+        self.assertEqual(self.get(self.key).status_code, status.HTTP_403_FORBIDDEN)
+
+        self.admin.role = 'admin'
+        self.admin.save()
+        self.assertEqual(self.get(self.key).status_code, status.HTTP_200_OK)
+
+        self.token.revoke()
+        self.assertEqual(self.get(self.key).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cache_bounds(self):
+        from .authentication import principal_cache
+        from .models import ApiToken
+
+        keys = [ApiToken.issue(self.admin)[1] for _ in range(3)]
+        with self.settings(RIDES_TOKEN_CACHE_SIZE=2):
+            for key in keys:
+                self.authenticate(key)
+            self.assertEqual(len(principal_cache.entries), 2)
+            self.assertIsNone(principal_cache.get(ApiToken.hash_key(keys[0])))
+
+        with self.settings(RIDES_TOKEN_CACHE_TTL=-1):
+            self.assertIsNone(principal_cache.get(ApiToken.hash_key(keys[2])))
+
+    def test_commands(self):
+        from django.core.management import call_command
+
+        out = StringIO()
+        call_command('create_api_token', 'admin', name='svc', days=30, stdout=out, stderr=StringIO())
+        key = out.getvalue().strip()
+        self.assertEqual(self.get(key).status_code, status.HTTP_200_OK)
+
+        call_command('revoke_api_token', user='admin', stdout=StringIO())
+        self.assertEqual(self.get(key).status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.get(self.key).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_bench_auth(self):
+        import json
+        from django.core.management import CommandError, call_command
+
+        out = StringIO()
+        call_command('bench_auth', url='/api/users/', iterations=1, stdout=out, stderr=StringIO())
+        schemes = json.loads(out.getvalue())['schemes']
+        self.assertEqual(schemes['token']['request']['status'], 200)
+        self.assertEqual(schemes['basic']['request']['status'], 200)
+        self.assertEqual(schemes['token']['request']['queries'], 2)  # users page + count, none for auth
+        self.assertFalse(User.objects.filter(username='bench_admin').exists())
+
+        # Never reuses (or resets the password of) an account it didn't create
+        User.objects.create_user(username='bench_admin', password='theirs', role='admin')
+        with self.assertRaises(CommandError):
+            call_command('bench_auth', url='/api/users/', iterations=1, stdout=StringIO(), stderr=StringIO())
+        self.assertTrue(User.objects.get(username='bench_admin').check_password('theirs'))
+
+
+class RideSearchTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.rider = User.objects.create_user(
+            username='rider', email='Jane.Rider@Example.com', password='password',
+            first_name='Jane', last_name='Doe'
+        )
+        self.driver = User.objects.create_user(
+            username='driver', email='max.driver@example.com', password='password',
+            first_name='Max', last_name='Mustermann', role='driver'
+        )
+        self.ride = Ride.objects.create(
+            status='pickup',
+            id_rider=self.rider,
+            id_driver=self.driver,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+        # A ride whose rider and driver match nothing below
+        Ride.objects.create(
+            status='pickup',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+
+    def ride_ids(self, query):
+        response = self.client.get(f'/api/rides/?{query}', headers={'Cache-Control': 'no-cache'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [ride['id'] for ride in response.json()['results']]
+
+    def test_email_exact_and_prefix(self):
+        self.assertEqual(self.rider.email_lower, 'jane.rider@example.com')
+        self.assertEqual(self.ride_ids('rider_email=jane.rider@EXAMPLE.com'), [self.ride.id])
+        self.assertEqual(self.ride_ids('rider_email=JANE.r*'), [self.ride.id])
+        self.assertEqual(self.ride_ids('rider_email=rider@example.com'), [])  # not a substring search
+        self.assertEqual(self.ride_ids('driver_email=max.driver@example.com'), [self.ride.id])
+        self.assertEqual(self.ride_ids('driver_email=jane*'), [])
+
+    def test_substring_search(self):
+        self.assertEqual(self.ride_ids('rider_email_contains=RIDER@exa'), [self.ride.id])
+        self.assertEqual(self.ride_ids('driver_email_contains=rider'), [])
+        self.assertEqual(self.ride_ids('driver_name=muster'), [self.ride.id])
+        self.assertEqual(self.ride_ids('driver_name=max%20muster'), [self.ride.id])
+        self.assertEqual(self.ride_ids('driver_name=max%20doe'), [])
+        self.assertEqual(self.ride_ids('rider_name=jan%20doe'), [self.ride.id])
+
+    def test_search_follows_user_writes(self):
+        self.driver.email = 'Moritz@Example.com'
+        self.driver.last_name = 'Schmidt'
+        self.driver.save(update_fields=['email', 'last_name'])
+
+        self.assertEqual(self.ride_ids('driver_email=moritz@example.com'), [self.ride.id])
+        self.assertEqual(self.ride_ids('driver_name=schmid'), [self.ride.id])
+        self.assertEqual(self.ride_ids('driver_name=muster'), [])
+
+        # Writes that skip save() still reach the search index (triggers)
+        User.objects.filter(pk=self.driver.pk).update(first_name='Friedrich')
+        self.assertEqual(self.ride_ids('driver_name=friedr'), [self.ride.id])
+
+    def test_invalid_search(self):
+        for query in ['driver_name=ma', 'driver_name=max%20mu', 'rider_email=*']:
+            response = self.client.get(f'/api/rides/?{query}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_rebuild_user_search(self):
+        from django.core.management import call_command
+        from django.db import connection
+
+        if connection.vendor != 'sqlite':
+            self.skipTest('The user_search table is SQLite only')
+        with connection.cursor() as cursor:
+            cursor.execute('DROP TRIGGER user_search_update')
+        User.objects.filter(pk=self.driver.pk).update(last_name='Schmidt')
+        self.assertEqual(self.ride_ids('driver_name=schmid'), [])
+
+        call_command('rebuild_user_search', stdout=StringIO())
+        self.assertEqual(self.ride_ids('driver_name=schmid'), [self.ride.id])
+
+
+class RideEventArchiveTestCase(TransactionTestCase):
+    """
+    TransactionTestCase: SQLite can't create the partition tables inside the
+    transaction a TestCase wraps every test in.
+    """
+    def setUp(self):
+        from datetime import timedelta
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        self.ride = Ride.objects.create(
+            status='dropoff',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=0, pickup_longitude=0,
+            dropoff_latitude=0, dropoff_longitude=0,
+            pickup_time=timezone.now()
+        )
+        self.now = timezone.now()
+        self.old = self.now - timedelta(days=200)
+        self.older = self.now - timedelta(days=240)
+        for description, created_at in [
+            ('Status changes to pickup', self.older),
+            ('Location update', self.older),
+            ('Location update', self.old),
+            ('Status change to dropoff', self.old + timedelta(hours=2)),
+            ('Location update', self.now - timedelta(days=1)),
+        ]:
+            RideEvent.objects.create(id_ride=self.ride, description=description, created_at=created_at)
+
+    def tearDown(self):
+        from django.db import connection
+        from .archive import get_partitions
+
+        # Partition tables aren't in the app registry, so the flush won't empty them
+        with connection.schema_editor() as schema_editor:
+            for model in get_partitions():
+                schema_editor.delete_model(model)
+
+    def test_archive_moves_old_non_trip_events(self):
+        from django.core.management import call_command
+        from .archive import all_events, month_key
+        from .models import RideEvent, RideEventArchive
+
+        self.ride.refresh_from_db()
+        duration = self.ride.duration_seconds
+        out = StringIO()
+        call_command('archive_ride_events', days=90, batch_size=1, stdout=out)
+        self.assertIn('Archived 2 ride events', out.getvalue())
+
+        # Pickup/dropoff stay hot, so ride timing and the report are unchanged
+        self.assertEqual(
+            sorted(RideEvent.objects.values_list('description', flat=True)),
+            ['Location update', 'Status change to dropoff', 'Status changes to pickup']
+        )
+        self.ride.refresh_from_db()
+        self.assertEqual(self.ride.duration_seconds, duration)
+        self.assertEqual(
+            {archive.month: archive.row_count for archive in RideEventArchive.objects.all()},
+            {month_key(self.old): 1, month_key(self.older): 1}
+        )
+
+        events = list(all_events().order_by('-created_at', '-id'))
+        self.assertEqual(len(events), 5)
+        self.assertTrue(all(isinstance(event, RideEvent) for event in events))
+        self.assertEqual({event.id_ride_id for event in events}, {self.ride.id})
+        self.assertEqual(all_events(since=self.old).count(), 3)  # skips the older partition
+
+        # Rerunning finds nothing left to move
+        call_command('archive_ride_events', days=90, stdout=StringIO())
+        self.assertEqual(all_events().count(), 5)
+
+    def test_archived_list_and_export(self):
+        import json
+        from django.core.management import call_command
+
+        call_command('archive_ride_events', stdout=StringIO())
+        response = self.client.get('/api/ride-events/')
+        self.assertEqual(response.json()['count'], 3)
+
+        response = self.client.get('/api/ride-events/?archived=true')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 5)
+        created = [event['created_at'] for event in response.json()['results']]
+        self.assertEqual(created, sorted(created, reverse=True))
+        self.assertEqual(response.json()['results'][-1]['id_ride'], self.ride.id)
+
+        after = (self.old - self.older) / 2 + self.older
+        response = self.client.get(
+            '/api/ride-events/', {'archived': 'true', 'ride': self.ride.id, 'created_after': after.isoformat()}
+        )
+        self.assertEqual(response.json()['count'], 3)
+        response = self.client.get('/api/ride-events/', {'archived': 'true', 'ride': self.ride.id + 1})
+        self.assertEqual(response.json()['count'], 0)
+        response = self.client.get('/api/ride-events/?archived=maybe')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        response = self.client.get('/api/ride-events/export/?archived=true')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        ids = [row['id'] for row in rows]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(ids, sorted(ids))
+        response = self.client.get(f'/api/ride-events/export/?archived=true&since={ids[1]}')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], ids[2:])
+
+    def test_archived_events_outlive_their_ride(self):
+        from django.core.management import call_command
+        from .archive import all_events
+
+        call_command('archive_ride_events', stdout=StringIO())
+        ride_id = self.ride.id
+        self.ride.delete()
+        self.assertEqual(list(all_events().values_list('id_ride', flat=True)), [ride_id, ride_id])
+
+
+class RendererTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        ride = Ride.objects.create(
+            status='pickup',
+            id_rider=self.admin,
+            id_driver=self.admin,
+            pickup_latitude=37.774929, pickup_longitude=-122.419416,
+            dropoff_latitude=37.8, dropoff_longitude=-122.4,
+            pickup_time=timezone.now()
+        )
+        RideEvent.objects.create(id_ride=ride, description='Status changes to pickup \u2028 \u2713')
+
+    def test_fast_json_matches_drf_json(self):
+        from datetime import datetime, timedelta, timezone as dt_timezone
+        from decimal import Decimal
+        from django.utils.translation import gettext_lazy
+        from rest_framework.renderers import JSONRenderer
+        from .renderers import FastJSONRenderer
+
+        data = {
+            'floats': [0.0, -0.0, 0.1 + 0.2, 37.774929, 1e15, 1e16, 1.5e300, 1e-4, 1e-5, 2.5e-7, 123.0],
+            'datetimes': [
+                datetime(2026, 1, 10, 8, 0, tzinfo=dt_timezone.utc),
+                datetime(2026, 1, 10, 8, 0, 0, 123456, tzinfo=dt_timezone(timedelta(hours=2))),
+                datetime(2026, 1, 10, 8, 0),
+                datetime(2026, 1, 10).date(),
+            ],
+            'decimal': Decimal('1.10'),
+            'text': ['\u00e9 \u2713 \u2028 \u2029 "quoted"', gettext_lazy('Not found.')],
+            'ints': [2 ** 63 - 1, True, None],
+        }
+        for value in [data, {**data, 'floats': [1.0, 2.5]}, {1: 'non-string key'}, [2 ** 70]]:
+            self.assertEqual(FastJSONRenderer().render(value), JSONRenderer().render(value))
+        self.assertEqual(
+            FastJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    def test_api_bytes_unchanged(self):
+        bodies = []
+        for backend in ('json', 'orjson'):
+            with override_settings(RIDES_JSON_RENDERER=backend):
+                response = self.client.get('/api/rides/', headers={'Cache-Control': 'no-cache'})
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response['Content-Type'], 'application/json')
+                bodies.append(response.content)
+        self.assertEqual(bodies[0], bodies[1])
+        self.assertIn(b'\\u2028', bodies[1])
+
+    def test_msgpack(self):
+        from .renderers import msgpack
+
+        if msgpack is None:
+            self.skipTest('msgpack is not installed')
+
+        expected = self.client.get('/api/rides/').json()
+        response = self.client.get('/api/rides/', headers={'Accept': 'application/msgpack'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+
+        # Errors are negotiated the same way
+        response = self.client.get('/api/rides/?format=msgpack&events_limit=0')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('events_limit', msgpack.unpackb(response.content))
+
+
+@override_settings(RIDES_COMPRESSION_MIN_SIZE=200)
+class CompressionTestCase(TestCase):
+    def setUp(self):
+        from django.utils import timezone
+        from .models import RideEvent
+
+        self.client = APIClient()
+        self.admin = User.objects.create_user(
+            username='admin',
+            email='admin@test.com',
+            password='password',
+            role='admin'
+        )
+        self.client.force_authenticate(user=self.admin)
+        for _ in range(3):
+            ride = Ride.objects.create(
+                status='pickup',
+                id_rider=self.admin,
+                id_driver=self.admin,
+                pickup_latitude=37.77, pickup_longitude=-122.41,
+                dropoff_latitude=37.8, dropoff_longitude=-122.4,
+                pickup_time=timezone.now()
+            )
+            RideEvent.objects.create(id_ride=ride, description='Status changes to pickup')
+
+    def test_negotiation(self):
+        from django.test import RequestFactory
+        from .compression import choose_encoding, parse_accept_encoding
+
+        self.assertEqual(parse_accept_encoding('gzip, br;q=0.5, *;q=0'), {'gzip': 1.0, 'br': 0.5, '*': 0.0})
+
+        def choose(header, encodings=('zstd', 'br', 'gzip')):
+            with override_settings(RIDES_COMPRESSION_ENCODINGS=list(encodings)):
+                return choose_encoding(RequestFactory().get('/', HTTP_ACCEPT_ENCODING=header))
+
+        self.assertEqual(choose('gzip, deflate'), 'gzip')
+        self.assertEqual(choose('gzip;q=1, br;q=0.5', encodings=['br', 'gzip']), 'gzip')
+        self.assertIsNone(choose('gzip;q=0'))
+        self.assertIsNone(choose('identity'))
+        self.assertIsNone(choose(''))
+        self.assertEqual(choose('*', encodings=['gzip']), 'gzip')
+        self.assertIsNone(choose('gzip', encodings=[]))
+
+    def test_cached_list_is_compressed_once(self):
+        import gzip
+        from unittest import mock
+        from . import response_cache
+
+        plain = self.client.get('/api/rides/')
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertIn('Accept-Encoding', plain['Vary'])
+
+        with override_settings(RIDES_COMPRESSION_ENCODINGS=['gzip']), \
+                mock.patch.object(response_cache, 'compress', wraps=response_cache.compress) as compress:
+            first = self.client.get('/api/rides/', headers={'Accept-Encoding': 'gzip'})
+            second = self.client.get('/api/rides/', headers={'Accept-Encoding': 'gzip'})
+            third = self.client.get('/api/rides/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(compress.call_count, 1)  # stored on the entry by the first gzip request
+        for response in (first, second, third):
+            self.assertEqual(response['Content-Encoding'], 'gzip')
+            self.assertEqual(gzip.decompress(response.content), plain.content)
+            self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+            self.assertEqual(int(response['Content-Length']), len(response.content))
+        self.assertEqual([first['X-Cache'], second['X-Cache']], ['HIT', 'HIT'])
+
+        response = self.client.get('/api/rides/', headers={'Accept-Encoding': 'gzip', 'If-None-Match': first['ETag']})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_small_and_uncacheable_responses(self):
+        import gzip
+
+        # Below RIDES_COMPRESSION_MIN_SIZE
+        response = self.client.get('/api/rides/?fields=id', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response)
+
+        # Not response-cached: compressed by CompressionMiddleware
+        plain = self.client.get('/api/ride-events/')
+        response = self.client.get('/api/ride-events/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+    def test_browsable_api_not_compressed(self):
+        # HTML pages hold csrfmiddlewaretoken next to the reflected URL (BREACH)
+        self.client.force_authenticate(user=None)
+        self.client.force_login(self.admin)
+        response = self.client.get('/api/rides/?x=1', headers={'Accept': 'text/html', 'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/html'))
+        self.assertIn(b'csrfmiddlewaretoken', response.content)
+        self.assertNotIn('Content-Encoding', response)
+
+    def test_streamed_export(self):
+        import zlib
+
+        plain = b''.join(self.client.get('/api/rides/export/').streaming_content)
+        response = self.client.get('/api/rides/export/', headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertFalse(response.has_header('Content-Length'))
+
+        # Every chunk decodes on arrival (flushed), and together they are the full body
+        decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        body = b''
+        for chunk in response.streaming_content:
+            body += decoder.decompress(chunk)
+        self.assertEqual(body, plain)
+
+    def test_brotli_and_zstd(self):
+        from .compression import brotli, zstandard
+
+        plain = self.client.get('/api/ride-events/').content
+        if brotli is not None:
+            response = self.client.get('/api/ride-events/', headers={'Accept-Encoding': 'br'})
+            self.assertEqual(response['Content-Encoding'], 'br')
+            self.assertEqual(brotli.decompress(response.content), plain)
+        if zstandard is not None:
+            response = self.client.get('/api/ride-events/', headers={'Accept-Encoding': 'zstd, br, gzip'})
+            self.assertEqual(response['Content-Encoding'], 'zstd')
+            self.assertEqual(zstandard.ZstdDecompressor().decompressobj().decompress(response.content), plain)
+        if brotli is None and zstandard is None:
+            self.skipTest('Neither brotli nor zstandard is installed')
@@ -1,7 +1,8 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
 from .views import UserViewSet, RideViewSet, RideEventViewSet
-from .views import trip_duration_report
+from .views import trip_duration_report, metrics
+from . import async_views
 
 # DRF Router automatically creates all CRUD routes
 router = DefaultRouter()
@@ -10,6 +11,16 @@ router.register(r'rides', RideViewSet, basename='ride')
 router.register(r'ride-events', RideEventViewSet, basename='ride-event')
 
 urlpatterns = [
+    # Before the router, whose rides/<pk>/ route would match 'changes'
+    path('rides/changes/', async_views.ride_changes, name='ride-changes'),
+    path('rides/changes/stream/', async_views.ride_changes_stream, name='ride-changes-stream'),
     path('', include(router.urls)),
     path('reports/trip-duration/', trip_duration_report, name='trip-duration-report'),
+    path('metrics/', metrics, name='metrics'),
+
+    # Async (ASGI) versions of the read endpoints, see async_views.py
+    path('async/rides/', async_views.async_ride_list, name='async-ride-list'),
+    path('async/rides/<int:pk>/', async_views.async_ride_detail, name='async-ride-detail'),
+    path('async/reports/trip-duration/', async_views.async_trip_duration_report,
+         name='async-trip-duration-report'),
 ]
\ No newline at end of file
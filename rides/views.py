@@ -1,29 +1,75 @@
 from django.shortcuts import render
+from django.http import HttpResponse
 
 from rest_framework import viewsets, status
+from rest_framework.exceptions import ValidationError
 from rest_framework.authentication import SessionAuthentication, BasicAuthentication
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import JSONParser
 from django_filters import rest_framework as filters
+from django_filters.rest_framework import DjangoFilterBackend
 from django.utils import timezone
-from django.db.models import Prefetch, F, ExpressionWrapper, FloatField
-from django.db.models.functions import Power, Sqrt
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Prefetch, Q, Subquery, Sum, Value, Window
+from django.db.models.functions import Coalesce, Concat, RowNumber
 from datetime import timedelta
-from math import radians, cos
+import math
 
-from .models import User, Ride, RideEvent
+from .models import User, Ride, RideChange, RideEvent, TripDurationRollup
 from .serializers import (
     UserSerializer, 
     RideSerializer, 
     RideCreateUpdateSerializer,
-    RideEventSerializer
+    RideEventSerializer,
+    RideEventBulkItemSerializer,
+    FastRideSerializer
 )
 from .permissions import IsAdminRole
+from .pagination import RidePagination
+from .geo import bounding_box, cells_in_box, haversine_km
+from .middleware import SerializerTimingMixin
+from .metrics import registry
+from .exports import export_response, parse_since
+from .renderers import NDJSONRenderer, CSVRenderer
+from .parsers import NDJSONParser
+from .response_cache import bump_versions, versioned_cache
+from .changes import ride_event_change
+from . import archive, rollups, search
 
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.response import Response
-from django.db import connection
 
-class UserViewSet(viewsets.ModelViewSet):
+# Flat columns for the streaming exports (see exports.py)
+RIDE_EXPORT_COLUMNS = [
+    'id', 'status', 'id_rider', 'id_driver',
+    'pickup_latitude', 'pickup_longitude',
+    'dropoff_latitude', 'dropoff_longitude',
+    'pickup_time',
+]
+EVENT_EXPORT_COLUMNS = ['id', 'id_ride', 'description', 'created_at']
+
+TRIP_DURATION_REPORT_TITLE = 'Trips > 1 Hour by Month and Driver'
+
+
+def parse_datetime_param(name, value):
+    """
+    Parse an ISO 8601 query parameter; naive values are in the current time zone.
+    """
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError({name: 'Must be an ISO 8601 datetime.'})
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+class UserViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     """
     ViewSet for User CRUD operations.
     
@@ -39,25 +85,55 @@ class RideFilter(filters.FilterSet):
     FilterSet for Ride - like Laravel's query scopes or Spatie Query Builder.
     """
     status = filters.CharFilter(field_name='status', lookup_expr='exact')
-    rider_email = filters.CharFilter(field_name='id_rider__email', lookup_expr='icontains')
+    # Rider/driver search (search.py): emails match exactly, or by prefix with a trailing *;
+    # *_email_contains and *_name match substrings through the user search index
+    rider_email = filters.CharFilter(field_name='id_rider', method='filter_email')
+    driver_email = filters.CharFilter(field_name='id_driver', method='filter_email')
+    rider_email_contains = filters.CharFilter(field_name='id_rider', method='filter_email_contains')
+    driver_email_contains = filters.CharFilter(field_name='id_driver', method='filter_email_contains')
+    rider_name = filters.CharFilter(field_name='id_rider', method='filter_name')
+    driver_name = filters.CharFilter(field_name='id_driver', method='filter_name')
+    # Delta polling: rides changed (or whose events changed) at or after this time
+    updated_since = filters.IsoDateTimeFilter(field_name='updated_at', lookup_expr='gte')
     
     class Meta:
         model = Ride
-        fields = ['status', 'rider_email']
+        fields = [
+            'status', 'rider_email', 'driver_email', 'rider_email_contains', 'driver_email_contains',
+            'rider_name', 'driver_name', 'updated_since'
+        ]
+    
+    # Like whereIn('id_rider', User::select('id')->where(...)): the user index
+    # finds the users, the ride's id_rider/id_driver index their rides
+    def filter_email(self, queryset, name, value):
+        return queryset.filter(**{f'{name}__in': search.email_users(value).values('id')})
+    
+    def filter_email_contains(self, queryset, name, value):
+        return queryset.filter(**{f'{name}__in': search.search_users(['email'], value).values('id')})
+    
+    def filter_name(self, queryset, name, value):
+        return queryset.filter(**{f'{name}__in': search.search_users(['first_name', 'last_name'], value).values('id')})
 
 
-class RideViewSet(viewsets.ModelViewSet):
+class RideViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     """
     ViewSet for Ride CRUD with optimized queries.
     
     Key performance features:
     1. Uses select_related for FK relationships (rider, driver) - 1 JOIN query
-    2. Uses Prefetch for RideEvents with filtered queryset - 1 additional query
+    2. Uses Prefetch for RideEvents with filtered queryset - 1 additional query,
+       capped per ride with ROW_NUMBER() (?events_since=, ?events_limit=), or
+       only a per-ride count with ?events=count (no extra query)
     3. Total: 2 queries (+ 1 for pagination count)
+    4. ?cursor= switches to keyset pagination: no count query, no OFFSET scan
+    5. list/retrieve responses are cached until a ride, event or user changes
+    6. ?fields= / ?expand= drop the JOINs, the events query and the columns
+       the response doesn't need
     """
     permission_classes = [IsAuthenticated, IsAdminRole]
+    pagination_class = RidePagination
     filterset_class = RideFilter
-    ordering_fields = ['pickup_time']
+    ordering_fields = ['pickup_time', 'updated_at']
     ordering = ['-pickup_time']
     
     def get_queryset(self):
@@ -68,48 +144,224 @@ class RideViewSet(viewsets.ModelViewSet):
         Ride::with(['rider', 'driver'])
             ->with(['rideEvents' => fn($q) => $q->where('created_at', '>=', now()->subDay())])
         """
-        # Calculate 24 hours ago
-        twenty_four_hours_ago = timezone.now() - timedelta(hours=24)
-        
         # Prefetch only today's ride events (performance requirement)
         todays_events_prefetch = Prefetch(
             'ride_events',
-            queryset=RideEvent.objects.filter(created_at__gte=twenty_four_hours_ago),
+            queryset=self.get_events_queryset(),
             to_attr='todays_events'  # This creates a new attribute on the Ride object
         )
         
-        queryset = Ride.objects.select_related(
-            'id_rider',  # Like with('rider') - JOINs the user table
-            'id_driver'  # Like with('driver') - JOINs same user table
-        ).prefetch_related(
-            todays_events_prefetch  # Separate query for events
-        )
+        # Like with('rider', 'driver') - JOINs the user table, for the nested users only
+        related = self.get_expanded_users()
+        queryset = Ride.objects.select_related(*related) if related else Ride.objects.all()
+        if self.get_events_params()[2]:
+            # ?events=count: like withCount() - a correlated COUNT instead of the rows
+            if self.wants_field('todays_ride_events_count'):
+                queryset = queryset.annotate(todays_events_count=self.get_events_count())
+        elif self.wants_expanded('todays_ride_events'):
+            queryset = queryset.prefetch_related(
+                todays_events_prefetch  # Separate query for events
+            )
+        
+        if self.get_field_params() != (None, None):
+            # Sparse response: like ->select([...]) - load only what it shows
+            queryset = queryset.only(*self.get_ride_columns(), *(
+                f'{name}__{column}' for name in related for column in FastRideSerializer.user_columns
+            ))
         
         # Handle distance-based sorting if lat/lng provided
+        self.distance_sort = False
         lat = self.request.query_params.get('lat')
         lng = self.request.query_params.get('lng')
         sort_by = self.request.query_params.get('sort_by')
         
         if lat and lng and sort_by == 'distance':
-            lat = float(lat)
-            lng = float(lng)
+            lat, lng, radius_km = self.get_distance_params(lat, lng)
             
-            # Haversine-like distance calculation in database
-            # This calculates approximate distance using Euclidean formula
-            # Good enough for sorting purposes
-            lat_diff = F('pickup_latitude') - lat
-            lng_diff = F('pickup_longitude') - lng
+            # Optional radius: prune by indexed grid cell + bounding box first,
+            # so the exact distance is only computed for nearby candidates
+            if radius_km is not None:
+                min_lat, max_lat, min_lng, max_lng = bounding_box(lat, lng, radius_km)
+                queryset = queryset.filter(pickup_latitude__range=(min_lat, max_lat))
+                if min_lng is not None:
+                    queryset = queryset.filter(pickup_longitude__range=(min_lng, max_lng))
+                
+                cells = cells_in_box(min_lat, max_lat, min_lng, max_lng)
+                if cells is not None:
+                    queryset = queryset.filter(pickup_cell__in=cells)
             
-            # Simplified distance formula (works for sorting)
-            distance = ExpressionWrapper(
-                Sqrt(Power(lat_diff, 2) + Power(lng_diff, 2)),
-                output_field=FloatField()
-            )
+            # Great-circle (haversine) distance in km, exposed as distance_km
+            queryset = queryset.annotate(distance_km=haversine_km(lat, lng))
+            if radius_km is not None:
+                queryset = queryset.filter(distance_km__lte=radius_km)
             
-            queryset = queryset.annotate(distance=distance).order_by('distance')
+            self.distance_sort = True
+            queryset = queryset.order_by('distance_km', 'id')
         
         return queryset
     
+    def get_field_params(self):
+        """
+        Parse ?fields= and ?expand= on list/retrieve into (fields, expand).
+        
+        Either is None when not given: every field, every relation nested.
+        Relations left out of ?expand= render as ids (todays_ride_events is dropped).
+        """
+        if hasattr(self, '_field_params'):
+            return self._field_params
+        
+        self._field_params = (None, None)
+        if getattr(self, 'request', None) is not None and getattr(self, 'action', None) in ['list', 'retrieve']:
+            self._field_params = (
+                self.parse_field_names('fields', RideSerializer.Meta.fields),
+                self.parse_field_names('expand', RideSerializer.expandable_fields),
+            )
+        return self._field_params
+    
+    def parse_field_names(self, param, allowed):
+        value = self.request.query_params.get(param)
+        if value is None:
+            return None
+        names = [name.strip() for name in value.split(',') if name.strip()]
+        unknown = [name for name in names if name not in allowed]
+        if unknown:
+            raise ValidationError({param: f'Unknown field(s): {", ".join(unknown)}. Choose from: {", ".join(allowed)}.'})
+        return names
+    
+    def wants_field(self, name):
+        fields = self.get_field_params()[0]
+        return fields is None or name in fields
+    
+    def wants_expanded(self, name):
+        """
+        Whether the response nests relation `name` (user object, event list).
+        """
+        expand = self.get_field_params()[1]
+        return self.wants_field(name) and (expand is None or name in expand)
+    
+    def get_expanded_users(self):
+        return [name for name in ['id_rider', 'id_driver'] if self.wants_expanded(name)]
+    
+    def get_ride_columns(self):
+        """
+        Ride columns to load: the requested ones plus id, pickup_time and
+        updated_at, which pagination cursors and Last-Modified read.
+        """
+        return [
+            column for column in FastRideSerializer.ride_columns
+            if column in ['id', 'pickup_time', 'updated_at'] or self.wants_field(column)
+        ]
+    
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'], context['expand'] = self.get_field_params()
+        return context
+    
+    def get_events_params(self):
+        """
+        Parse ?events_since=, ?events_limit= and ?events=count into (since, limit, count_only).
+        
+        Defaults: the last 24 hours, the newest RIDES_EVENTS_LIMIT events per ride.
+        """
+        if hasattr(self, '_events_params'):
+            return self._events_params
+        
+        request = getattr(self, 'request', None)
+        params = request.query_params if request is not None else {}
+        
+        since = params.get('events_since')
+        if since:
+            since = parse_datetime_param('events_since', since)
+        else:
+            since = timezone.now() - timedelta(hours=24)
+        
+        max_limit = settings.RIDES_EVENTS_MAX_LIMIT
+        limit = params.get('events_limit')
+        if limit:
+            try:
+                limit = int(limit)
+            except ValueError:
+                limit = 0
+            if not 1 <= limit <= max_limit:
+                raise ValidationError({'events_limit': f'Must be an integer between 1 and {max_limit}.'})
+        else:
+            limit = settings.RIDES_EVENTS_LIMIT
+        
+        events = params.get('events')
+        if events not in (None, '', 'count'):
+            raise ValidationError({'events': 'Only "count" is supported.'})
+        
+        self._events_params = (since, limit, events == 'count')
+        return self._events_params
+    
+    def get_events_queryset(self):
+        """
+        Events shown in todays_ride_events: the newest `limit` per ride since `since`.
+        
+        ROW_NUMBER() per ride keeps it one query per page however chatty a ride
+        is; Django numbers the rows in a subquery that already has the page's
+        id_ride IN (...) filter, so only those rides' events are ranked.
+        """
+        since, limit, _ = self.get_events_params()
+        return RideEvent.objects.filter(created_at__gte=since).annotate(
+            event_rank=Window(
+                RowNumber(),
+                partition_by=F('id_ride'),
+                order_by=[F('created_at').desc(), F('id').desc()]
+            )
+        ).filter(event_rank__lte=limit)
+    
+    def get_events_count(self):
+        """
+        Expression counting each ride's events since `since` (uncapped), for ?events=count.
+        """
+        since = self.get_events_params()[0]
+        events = RideEvent.objects.filter(
+            id_ride=OuterRef('pk'), created_at__gte=since
+        ).order_by().values('id_ride').annotate(count=Count('id')).values('count')
+        return Coalesce(Subquery(events), 0)
+    
+    def get_distance_params(self, lat, lng):
+        """
+        Parse ?lat=, ?lng= and the optional ?radius_km= for distance sorting.
+        """
+        radius_km = self.request.query_params.get('radius_km')
+        try:
+            lat = float(lat)
+            lng = float(lng)
+            radius_km = float(radius_km) if radius_km else None
+        except ValueError:
+            raise ValidationError('lat, lng and radius_km must be numbers.')
+        # float() also parses 'nan' and 'inf'
+        if not all(math.isfinite(value) for value in (lat, lng, radius_km or 0)):
+            raise ValidationError('lat, lng and radius_km must be numbers.')
+        
+        if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+            raise ValidationError('lat/lng out of range.')
+        if radius_km is not None and radius_km <= 0:
+            raise ValidationError({'radius_km': 'Must be greater than 0.'})
+        return lat, lng, radius_km
+    
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        
+        # OrderingFilter replaces any order_by() with the default -pickup_time,
+        # so re-apply the distance sort after the filter backends have run
+        if getattr(self, 'distance_sort', False):
+            queryset = queryset.order_by('distance_km', 'id')
+        return queryset
+    
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        GET /api/rides/export/ - stream every matching ride (NDJSON, or ?format=csv).
+        
+        Accepts the RideFilter params and ?since=<last id> for incremental pulls.
+        Flat rows (user ids, no nested objects or events), ordered by id.
+        """
+        queryset = DjangoFilterBackend().filter_queryset(request, Ride.objects.all(), self)
+        return export_response(request, queryset, RIDE_EXPORT_COLUMNS, 'rides')
+    
     def get_serializer_class(self):
         """
         Use different serializers for read vs write operations.
@@ -118,49 +370,286 @@ class RideViewSet(viewsets.ModelViewSet):
         """
         if self.action in ['create', 'update', 'partial_update']:
             return RideCreateUpdateSerializer
+        if self.use_fast_serializer():
+            return FastRideSerializer
         return RideSerializer
+    
+    def use_fast_serializer(self):
+        """
+        ?serializer=fast selects FastRideSerializer for list/retrieve.
+        """
+        return (
+            self.action in ['list', 'retrieve']
+            and self.request.query_params.get('serializer') == 'fast'
+        )
+    
+    @versioned_cache('ride', 'ride_event', 'user')
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        return self.set_last_modified(Response(serializer.data), [instance])
+    
+    # Last-Modified of a page can't see rides that left it (filter no longer
+    # matches, deleted), so only the ETag decides 304s for lists
+    @versioned_cache('ride', 'ride_event', 'user', use_last_modified=False)
+    def list(self, request, *args, **kwargs):
+        self.page_rides = None
+        if not self.use_fast_serializer():
+            response = super().list(request, *args, **kwargs)
+            return self.set_last_modified(response, self.page_rides)
+        
+        # Fast path: paginate plain .values() rows instead of model instances
+        queryset = self.get_fast_rows(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            self.attach_related(page)
+            serializer = self.get_serializer(page, many=True)
+            return self.set_last_modified(self.get_paginated_response(serializer.data), page)
+        
+        rows = list(queryset)
+        self.attach_related(rows)
+        serializer = self.get_serializer(rows, many=True)
+        return self.set_last_modified(Response(serializer.data), rows)
+    
+    def paginate_queryset(self, queryset):
+        # Remembered for the list's Last-Modified header
+        self.page_rides = super().paginate_queryset(queryset)
+        return self.page_rides
+    
+    def set_last_modified(self, response, rides):
+        """
+        Set Last-Modified to the newest updated_at among instances or .values() rows.
+        """
+        timestamps = [
+            ride['updated_at'] if isinstance(ride, dict) else ride.updated_at
+            for ride in rides or []
+        ]
+        if timestamps:
+            response['Last-Modified'] = http_date(max(timestamps).timestamp())
+        return response
+    
+    def get_fast_rows(self, queryset):
+        """
+        Turn the ride queryset into .values() rows for FastRideSerializer.
+        
+        Same filters and ordering, but no model instantiation and no user
+        JOINs: those would also end up in the pagination COUNT(*), which
+        Django cannot trim for .values() querysets.
+        """
+        columns = self.get_ride_columns()
+        for annotation in ['distance_km', 'todays_events_count']:
+            if annotation in queryset.query.annotations:
+                columns.append(annotation)
+        return queryset.select_related(None).prefetch_related(None).values(*columns)
+    
+    def attach_related(self, rows):
+        """
+        Replace user ids with user rows and add todays_events: at most 2 queries per page.
+        """
+        if not rows:
+            return
+        users, events = self.get_related_querysets(rows)
+        self.merge_related(
+            rows, None if users is None else list(users), None if events is None else list(events)
+        )
+    
+    def get_related_querysets(self, rows):
+        """
+        The users and todays_events rows for a page, unevaluated (see async_views.py).
+        
+        Either is None when the response doesn't nest it (?expand=, ?fields=); events
+        also with ?events=count, where the rows already carry todays_events_count.
+        """
+        users = events = None
+        related = self.get_expanded_users()
+        if related:
+            user_ids = {row[name] for row in rows for name in related}
+            users = User.objects.filter(id__in=user_ids).values(*FastRideSerializer.user_columns)
+        if not self.get_events_params()[2] and self.wants_expanded('todays_ride_events'):
+            events = self.get_events_queryset().filter(
+                id_ride__in=[row['id'] for row in rows]
+            ).values(*FastRideSerializer.event_columns)
+        return users, events
+    
+    def merge_related(self, rows, users, events):
+        if users is not None:
+            users = {user['id']: user for user in users}
+            related = self.get_expanded_users()
+            for row in rows:
+                for name in related:
+                    row[name] = users[row[name]]
+        
+        if events is None:
+            return
+        events_by_ride = {row['id']: [] for row in rows}
+        for event in events:
+            events_by_ride[event['id_ride']].append(event)
+        for row in rows:
+            row['todays_events'] = events_by_ride[row['id']]
 
 
-class RideEventViewSet(viewsets.ModelViewSet):
+class RideEventViewSet(SerializerTimingMixin, viewsets.ModelViewSet):
     """
     ViewSet for RideEvent CRUD operations.
     """
     queryset = RideEvent.objects.select_related('id_ride')
     serializer_class = RideEventSerializer
     permission_classes = [IsAuthenticated, IsAdminRole]
+    bulk_max_events = 10000
+    bulk_batch_size = 1000
+    
+    def wants_archived(self):
+        """
+        ?archived=true: include events moved to the archive tables (see archive.py).
+        """
+        archived = self.request.query_params.get('archived', '').lower()
+        if archived not in ('', 'true', 'false', '1', '0'):
+            raise ValidationError({'archived': 'Must be true or false.'})
+        return archived in ('true', '1')
+    
+    def get_archive_params(self):
+        """
+        Parse ?ride=, ?created_after= and ?created_before= into (Q, since, until) for archive.all_events().
+        """
+        params = self.request.query_params
+        q = Q()
+        ride = params.get('ride')
+        if ride:
+            try:
+                q &= Q(id_ride=int(ride))
+            except ValueError:
+                raise ValidationError({'ride': 'Must be a ride id.'})
+        
+        bounds = []
+        for name in ('created_after', 'created_before'):
+            value = params.get(name)
+            bounds.append(parse_datetime_param(name, value) if value else None)
+        return q, *bounds
+    
+    def get_queryset(self):
+        """
+        Hot events, or with ?archived=true hot and archived events as one UNION ALL
+        (newest first; no select_related, the serializer only needs id_ride's id).
+        """
+        if self.action == 'list' and self.wants_archived():
+            q, since, until = self.get_archive_params()
+            return archive.all_events(q, since, until).order_by('-created_at', '-id')
+        return super().get_queryset()
+    
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request):
+        """
+        GET /api/ride-events/export/ - stream every event (NDJSON, or ?format=csv).
+        
+        ?since=<last id> returns only events added after a previous pull.
+        ?archived=true also streams archived events (archive ids never change).
+        """
+        if not self.wants_archived():
+            return export_response(request, RideEvent.objects.all(), EVENT_EXPORT_COLUMNS, 'ride_events')
+        
+        # A union can't be filtered afterwards, so apply the watermark to every part
+        since = parse_since(request)
+        events = archive.all_events(Q(id__gt=since) if since is not None else None)
+        return export_response(request, events, EVENT_EXPORT_COLUMNS, 'ride_events', filter_since=False)
+    
+    @action(detail=False, methods=['post'], parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        POST /api/ride-events/bulk/ - insert many events in one request.
+        
+        Body: a JSON array of {id_ride, description, created_at?} objects, or the
+        same objects as NDJSON (Content-Type: application/x-ndjson).
+        Invalid items are reported by index; the valid ones are still written,
+        with one bulk INSERT inside a single transaction.
+        """
+        items = request.data
+        if not isinstance(items, list):
+            raise ValidationError('Expected a list of events.')
+        if len(items) > self.bulk_max_events:
+            raise ValidationError(f'At most {self.bulk_max_events} events per request.')
+        
+        item_serializer = RideEventBulkItemSerializer()
+        valid, errors = [], []
+        for index, item in enumerate(items):
+            try:
+                valid.append((index, item_serializer.run_validation(item)))
+            except ValidationError as exc:
+                errors.append({'index': index, 'errors': exc.detail})
+        
+        # One lookup for every referenced ride instead of one per item
+        ride_ids = {data['id_ride'] for _, data in valid}
+        existing = set(Ride.objects.filter(id__in=ride_ids).order_by().values_list('id', flat=True))
+        
+        events = []
+        for index, data in valid:
+            if data['id_ride'] not in existing:
+                errors.append({'index': index, 'errors': {'id_ride': [f"Ride {data['id_ride']} does not exist."]}})
+                continue
+            event = RideEvent(
+                id_ride_id=data['id_ride'],
+                description=data['description'],
+                event_type=RideEvent.classify(data['description']),  # bulk_create skips save()
+            )
+            if 'created_at' in data:
+                event.created_at = data['created_at']
+            events.append(event)
+        
+        with transaction.atomic():
+            # bulk_create skips the rollup signals, so maintain it explicitly
+            trip_rides = {e.id_ride_id for e in events if e.event_type in rollups.TRIP_EVENT_TYPES}
+            state = rollups.snapshot(trip_rides) if trip_rides else {}
+            RideEvent.objects.bulk_create(events, batch_size=self.bulk_batch_size)
+            if state:
+                rollups.apply_snapshot(state)
+            # Same as the touch_ride signal receiver, once for the whole batch
+            Ride.objects.filter(id__in={e.id_ride_id for e in events}).update(updated_at=timezone.now())
+            RideChange.objects.bulk_create(
+                [ride_event_change(event) for event in events], batch_size=self.bulk_batch_size
+            )
+            bump_versions('ride_event')
+        
+        errors.sort(key=lambda error: error['index'])
+        return Response(
+            {'created': len(events), 'failed': len(errors), 'errors': errors},
+            status=status.HTTP_201_CREATED if events or not errors else status.HTTP_400_BAD_REQUEST
+        )
+
+
+def trip_duration_rows():
+    """
+    The report rows as an unevaluated queryset (also used by async_views.py).
+    """
+    return TripDurationRollup.objects.filter(
+        trip_count__gt=0
+    ).values(
+        'month',
+        driver=Concat('id_driver__first_name', Value(' '), 'id_driver__last_name')
+    ).annotate(
+        trip_count=Sum('trip_count')
+    ).order_by('month', 'driver')
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated, IsAdminRole])
 def trip_duration_report(request):
     """
-    Raw SQL report: Trips taking more than 1 hour, grouped by Month and Driver.
-    """
-
-    sql = """
-    SELECT 
-        strftime('%Y-%m', pickup_event.created_at) as month,
-        u.first_name || ' ' || u.last_name as driver,
-        COUNT(*) as trip_count
-    FROM ride r
-    JOIN user u ON r.id_driver = u.id
-    JOIN ride_event pickup_event ON pickup_event.id_ride = r.id 
-        AND pickup_event.description = 'Status changes to pickup'
-    JOIN ride_event dropoff_event ON dropoff_event.id_ride = r.id 
-        AND dropoff_event.description = 'Status change to dropoff'
-    WHERE (
-        strftime('%s', substr(replace(dropoff_event.created_at, 'T', ' '), 1, 19)) - 
-        strftime('%s', substr(replace(pickup_event.created_at, 'T', ' '), 1, 19))
-    ) > 3600
-    GROUP BY month, driver
-    ORDER BY month, driver
-    """   
-    
-    with connection.cursor() as cursor:
-        cursor.execute(sql)
-        columns = [col[0] for col in cursor.description]
-        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+    Report: Trips taking more than 1 hour, grouped by Month and Driver.
     
+    Reads the TripDurationRollup table (kept up to date on every pickup/dropoff
+    event write, see rollups.py), so the cost is O(months x drivers) instead
+    of a self-join over every ride_event row.
+    """
     return Response({
-        'report': 'Trips > 1 Hour by Month and Driver',
-        'data': rows
-    })
\ No newline at end of file
+        'report': TRIP_DURATION_REPORT_TITLE,
+        'data': list(trip_duration_rows())
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated, IsAdminRole])
+def metrics(request):
+    """
+    Per-view request metrics (query count, SQL/serialization time, response size)
+    in Prometheus text format. Collected by RequestStatsMiddleware.
+    """
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')